@@ -0,0 +1,287 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+from datetime import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import tracemalloc
+
+import numpy as np
+
+# Escalas padrão (número de apps com histórico de preços)
+DEFAULT_SCALES = [1000, 10000, 100000]
+DEFAULT_DATA_DIR = 'benchmark_data'
+DEFAULT_OUTPUT = 'benchmark_results.json'
+
+# Etapas medidas, na ordem de run_complete_analysis
+STAGES = [
+    'load_application_data',
+    'load_price_history_sample',
+    'data_cleaning',
+    'data_transformation',
+    'feature_engineering',
+    'data_splitting',
+    'generate_visualizations',
+    'save_processed_data',
+]
+
+# Período coberto pelos arquivos reais de PriceHistory/
+FIRST_DATE = np.datetime64('2019-04-07')
+LAST_DATE = np.datetime64('2020-08-13')
+# Promoções gerais da Steam: (mês, dia de início, duração em dias)
+STOREWIDE_SALES = [(1, 23, 5), (6, 25, 14), (10, 28, 5), (11, 26, 6), (12, 19, 15)]
+# Preços base e descontos típicos da loja
+PRICE_TIERS = np.array([0.99, 1.99, 2.99, 4.99, 6.99, 9.99, 14.99, 19.99, 24.99, 29.99, 39.99, 59.99])
+PRICE_TIER_WEIGHTS = np.array([4, 4, 6, 12, 8, 16, 12, 12, 8, 6, 6, 6], dtype=np.float64)
+DISCOUNT_TIERS = np.array([10, 15, 20, 25, 30, 33, 40, 50, 60, 66, 75, 80, 85, 90])
+APP_TYPES = np.array(['game', 'demo', 'advertising', 'mod', 'dlc'])
+APP_TYPE_WEIGHTS = np.array([0.92, 0.02, 0.02, 0.02, 0.02])
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+# Fração de apps de applicationInformation.csv sem arquivo de preços (como no dataset real)
+APPS_WITHOUT_PRICES = 0.25
+
+
+def generate_dataset(data_path, n_apps, seed=0):
+    """Gerar applicationInformation.csv e PriceHistory/ sintéticos com ``n_apps`` históricos.
+
+    Segue o esquema Date/Initialprice/Finalprice/Discount dos arquivos
+    reais, com promoções gerais sazonais, promoções de publisher, mudanças
+    permanentes de preço, jogos gratuitos, linhas incompletas e apps com
+    poucas observações. Um dataset já gerado com a mesma escala e semente é
+    reaproveitado.
+    """
+    marker = os.path.join(data_path, 'dataset.json')
+    spec = {'n_apps': n_apps, 'seed': seed}
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f) == spec:
+                return data_path
+
+    rng = np.random.default_rng(seed)
+    price_dir = os.path.join(data_path, 'PriceHistory')
+    os.makedirs(price_dir, exist_ok=True)
+    for name in os.listdir(price_dir):
+        os.remove(os.path.join(price_dir, name))
+
+    n_info = int(n_apps / (1 - APPS_WITHOUT_PRICES))
+    appids = np.sort(rng.choice(np.arange(10, 10 * n_info + 10, 10), n_info, replace=False))
+    free_to_play = rng.random(n_info) < 0.15
+    _write_app_info(os.path.join(data_path, 'applicationInformation.csv'), appids, free_to_play, rng)
+
+    dates = np.arange(FIRST_DATE, LAST_DATE + 1)
+    date_strings = np.datetime_as_string(dates).tolist()
+    storewide = _storewide_sale_mask(dates)
+    with_prices = np.sort(rng.choice(n_info, n_apps, replace=False))
+    for i in with_prices:
+        lines = _price_history_lines(rng, len(dates), storewide, free_to_play[i])
+        start = len(dates) - len(lines)
+        body = ''.join(f'{date_strings[start + j]},{line}\n' for j, line in enumerate(lines))
+        with open(os.path.join(price_dir, f'{appids[i]}.csv'), 'w', newline='') as f:
+            f.write('Date,Initialprice,Finalprice,Discount\n' + body)
+
+    with open(marker, 'w') as f:
+        json.dump(spec, f)
+    return data_path
+
+
+def _write_app_info(file_path, appids, free_to_play, rng):
+    types = rng.choice(APP_TYPES, len(appids), p=APP_TYPE_WEIGHTS)
+    days = rng.integers(1, 29, len(appids))
+    months = rng.integers(0, 12, len(appids))
+    years = rng.integers(6, 20, len(appids))
+    missing_date = rng.random(len(appids)) < 0.03
+    missing_f2p = rng.random(len(appids)) < 0.06
+    with open(file_path, 'w', encoding='latin-1', newline='') as f:
+        f.write('appid,type,name,releasedate,freetoplay\n')
+        for i, app_id in enumerate(appids.tolist()):
+            release = '' if missing_date[i] else f'{days[i]}-{MONTH_NAMES[months[i]]}-{years[i]:02d}'
+            f2p = '' if missing_f2p[i] else str(int(free_to_play[i]))
+            f.write(f'{app_id},{types[i]},Jogo Sintetico {app_id},{release},{f2p}\n')
+
+
+def _storewide_sale_mask(dates):
+    """Dias de cada promoção geral (uma linha por evento e ano)"""
+    day = dates.astype('datetime64[D]')
+    masks = []
+    for year in range(FIRST_DATE.astype(object).year, LAST_DATE.astype(object).year + 1):
+        for month, start_day, duration in STOREWIDE_SALES:
+            start = np.datetime64(f'{year}-{month:02d}-{start_day:02d}')
+            masks.append((day >= start) & (day < start + duration))
+    return np.array(masks)
+
+
+def _price_history_lines(rng, n_days, storewide, free):
+    """Linhas 'Initialprice,Finalprice,Discount' de um app, do primeiro ao último dia"""
+    # A maioria dos apps cobre o período inteiro; alguns começam depois ou têm poucos dias
+    n_rows = n_days if rng.random() < 0.8 else int(rng.integers(1, n_days))
+    if free:
+        return ['0.0,0.0,0'] * n_rows
+
+    base_price = rng.choice(PRICE_TIERS, p=PRICE_TIER_WEIGHTS / PRICE_TIER_WEIGHTS.sum())
+    initial = np.full(n_days, base_price)
+    if rng.random() < 0.15:
+        # Mudança permanente de preço (corte ou aumento para o nível vizinho)
+        change_day = rng.integers(1, n_days)
+        tier = np.searchsorted(PRICE_TIERS, base_price) + rng.choice([-1, 1])
+        initial[change_day:] = PRICE_TIERS[np.clip(tier, 0, len(PRICE_TIERS) - 1)]
+
+    discount = np.zeros(n_days, dtype=np.int64)
+    depth = rng.choice(DISCOUNT_TIERS)
+    for event in storewide[rng.random(len(storewide)) < 0.6]:
+        discount[event] = depth
+    # Promoções de publisher/semanais
+    for start in np.flatnonzero(rng.random(n_days) < 1 / 60):
+        discount[start:start + rng.integers(3, 15)] = rng.choice(DISCOUNT_TIERS)
+
+    final = np.round(initial * (100 - discount) / 100, 2)
+    lines = [f'{i},{f},{d}' for i, f, d in zip(initial.tolist(), final.tolist(), discount.tolist())]
+    lines = lines[n_days - n_rows:]
+    # Algumas linhas incompletas, como nos arquivos reais
+    for j in np.flatnonzero(rng.random(n_rows) < 0.001):
+        lines[j] = ',,'
+    return lines
+
+
+class TracemallocHook:
+    """Hook de etapa que registra o pico de memória Python/NumPy (tracemalloc) de cada etapa"""
+
+    def __init__(self):
+        self.peaks = {}
+
+    def before_stage(self, analysis, stage):
+        tracemalloc.reset_peak()
+
+    def after_stage(self, analysis, stage, error=None):
+        self.peaks[stage] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+
+
+def run_scale(data_path, output_dir, use_cache=False, workers=1, trace_memory=True):
+    """Executar as etapas de SteamGameAnalysis sobre um dataset, medindo cada uma.
+
+    Roda em processo próprio (ver run_benchmarks) para que a memória de uma
+    escala não contamine a próxima. As medidas vêm dos hooks de etapa
+    (StageMetricsRecorder e, opcionalmente, o pico do tracemalloc).
+    """
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    from stage_metrics import StageMetricsRecorder
+    from steam_data_processing import SteamGameAnalysis
+
+    os.makedirs(output_dir, exist_ok=True)
+    os.chdir(output_dir)
+    recorder = StageMetricsRecorder()
+    hooks = [recorder]
+    if trace_memory:
+        memory_hook = TracemallocHook()
+        hooks.append(memory_hook)
+        tracemalloc.start()
+    analyzer = SteamGameAnalysis(data_path, use_cache=use_cache, workers=workers, quiet=True, hooks=hooks)
+
+    try:
+        for stage in STAGES:
+            with contextlib.redirect_stdout(io.StringIO()):
+                analyzer.run_stage(stage)
+    finally:
+        analyzer.close()
+        if trace_memory:
+            tracemalloc.stop()
+
+    results = []
+    for record in recorder.records:
+        result = {key: value for key, value in record.items() if key not in ('run_id', 'status')}
+        result['peak_traced_mb'] = memory_hook.peaks[record['stage']] if trace_memory else None
+        results.append(result)
+    return {
+        'apps': int(analyzer.price_store.n_apps),
+        'games_with_features': len(analyzer.features_data),
+        'stages': results,
+        'total_wall_s': round(sum(result['wall_s'] for result in results), 4),
+    }
+
+
+def run_benchmarks(scales, data_dir=DEFAULT_DATA_DIR, output=DEFAULT_OUTPUT, use_cache=False, workers=1,
+                   trace_memory=True, seed=0):
+    """Gerar (se preciso) os datasets de cada escala, medir as etapas e gravar o JSON de resultados"""
+    report = {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'settings': {'use_cache': use_cache, 'workers': workers, 'trace_memory': trace_memory, 'seed': seed},
+        'results': [],
+    }
+    for n_apps in scales:
+        data_path = os.path.abspath(os.path.join(data_dir, f'apps_{n_apps}'))
+        print(f"Gerando dataset sintético com {n_apps} apps em {data_path}...")
+        generate_dataset(data_path, n_apps, seed=seed)
+
+        print(f"Medindo etapas com {n_apps} apps...")
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(
+                run_scale, data_path, os.path.join(data_path, 'output'), use_cache, workers, trace_memory
+            ).result()
+        result['scale'] = n_apps
+        report['results'].append(result)
+        for stage in result['stages']:
+            print(f"  {stage['stage']:<28} {stage['wall_s']:>9.3f}s  pico {stage['peak_traced_mb']} MB  "
+                  f"RSS {stage['peak_rss_mb']} MB")
+
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados salvos em {output}")
+    return report
+
+
+def compare_results(baseline_path, current_path):
+    """Comparar tempos por etapa de dois arquivos de resultados (razão atual / base)"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(current_path) as f:
+        current = json.load(f)
+    baseline_stages = {
+        (result['scale'], stage['stage']): stage for result in baseline['results'] for stage in result['stages']
+    }
+    print(f"Base: {baseline['commit']}  Atual: {current['commit']}")
+    for result in current['results']:
+        for stage in result['stages']:
+            before = baseline_stages.get((result['scale'], stage['stage']))
+            if before is None:
+                continue
+            ratio = stage['wall_s'] / before['wall_s'] if before['wall_s'] else float('inf')
+            print(f"  {result['scale']:>7} apps  {stage['stage']:<28} {before['wall_s']:>9.3f}s -> "
+                  f"{stage['wall_s']:>9.3f}s ({ratio:.2f}x)")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark das etapas de SteamGameAnalysis com dados sintéticos')
+    parser.add_argument('--apps', type=int, nargs='+', default=DEFAULT_SCALES,
+                        help='Escalas (número de apps) a medir (padrão: 1000 10000 100000)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Diretório dos datasets sintéticos')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Arquivo JSON de resultados')
+    parser.add_argument('--workers', type=int, default=1, help='Processos para as etapas por app')
+    parser.add_argument('--use-cache', action='store_true', help='Usar o cache binário de preços (medir carga quente)')
+    parser.add_argument('--no-tracemalloc', action='store_true', help='Não medir o pico de memória com tracemalloc')
+    parser.add_argument('--seed', type=int, default=0, help='Semente do gerador sintético')
+    parser.add_argument('--compare', metavar='BASELINE', help='Comparar --output com um resultado anterior')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(args.compare, args.output)
+    else:
+        run_benchmarks(args.apps, args.data_dir, args.output, use_cache=args.use_cache, workers=args.workers,
+                       trace_memory=not args.no_tracemalloc, seed=args.seed)
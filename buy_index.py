@@ -0,0 +1,162 @@
+import argparse
+import os
+
+import numpy as np
+
+INDEX_FILENAME = 'buy_index.npy'
+# Percentis guardados da distribuição histórica de Finalprice e de Discount
+PERCENTILES = np.linspace(0, 100, 11)
+# Até este percentil de preço (ou no mínimo histórico) a recomendação é comprar
+BUY_PERCENTILE = 25
+
+INDEX_DTYPE = np.dtype([
+    ('appid', np.int64),
+    ('last_date', np.int32),
+    ('latest_price', np.float32),
+    ('latest_initial_price', np.float32),
+    ('latest_discount', np.uint8),
+    ('min_price', np.float32),
+    ('price_breakpoints', np.float32, len(PERCENTILES)),
+    ('discount_breakpoints', np.uint8, len(PERCENTILES)),
+    ('best_discount_month', np.int8),
+])
+
+
+def build_buy_index(store, features):
+    """Índice compacto por appid a partir do store transformado e das features.
+
+    Inclui apenas os apps presentes em ``features`` (os que passaram pela
+    limpeza e têm metadados). Cada registro guarda o último preço, o mínimo
+    histórico, os percentis de preço e de desconto e o mês típico do maior
+    desconto.
+    """
+    app_ids = np.asarray(features['app_id'], dtype=np.int64)
+    best_months = np.asarray(features['best_discount_month'], dtype=np.int8)
+    order = np.argsort(app_ids, kind='stable')
+    app_ids, best_months = app_ids[order], best_months[order]
+
+    positions = np.searchsorted(store.appids, app_ids)
+    starts = store.offsets[positions]
+    counts = store.offsets[positions + 1] - starts
+    last_rows = starts + counts - 1
+
+    final = np.asarray(store.columns['Finalprice'], dtype=np.float32)
+    discount = np.asarray(store.columns['Discount'])
+
+    index = np.zeros(len(app_ids), dtype=INDEX_DTYPE)
+    index['appid'] = app_ids
+    index['last_date'] = store.columns['Date'][last_rows]
+    index['latest_price'] = final[last_rows]
+    index['latest_initial_price'] = store.columns['Initialprice'][last_rows]
+    index['latest_discount'] = discount[last_rows]
+    index['min_price'] = np.minimum.reduceat(final, store.offsets[:-1])[positions] if len(app_ids) else 0
+    index['price_breakpoints'] = _grouped_percentiles(store, final, positions)
+    index['discount_breakpoints'] = np.round(_grouped_percentiles(store, discount, positions))
+    index['best_discount_month'] = best_months
+    return index
+
+
+def save_buy_index(index, path=INDEX_FILENAME):
+    """Gravar o índice de forma atômica"""
+    tmp_path = path + '.tmp.npy'
+    np.save(tmp_path, index)
+    os.replace(tmp_path, path)
+
+
+def load_buy_index(path=INDEX_FILENAME):
+    """Abrir o índice com memory mapping (sem ler o arquivo inteiro)"""
+    return np.load(path, mmap_mode='r')
+
+
+def query_buy_index(index, appids):
+    """Percentil do preço atual e recomendação para um ou mais appids.
+
+    Retorna uma lista de dicionários na ordem de ``appids``; apps fora do
+    índice vêm com ``found=False``.
+    """
+    appids = np.atleast_1d(np.asarray(appids, dtype=np.int64))
+    positions = np.minimum(np.searchsorted(index['appid'], appids), max(len(index) - 1, 0))
+    found = (index['appid'][positions] == appids) if len(index) else np.zeros(len(appids), dtype=bool)
+    records = index[positions[found]]
+    percentiles = price_percentiles(records)
+
+    results = []
+    matches = iter(zip(records, percentiles))
+    for app_id, app_found in zip(appids.tolist(), found.tolist()):
+        if not app_found:
+            results.append({'appid': app_id, 'found': False})
+            continue
+        record, percentile = next(matches)
+        latest_price = float(record['latest_price'])
+        good_buy = percentile <= BUY_PERCENTILE or latest_price <= record['min_price']
+        results.append({
+            'appid': app_id,
+            'found': True,
+            'latest_price': latest_price,
+            'latest_discount': int(record['latest_discount']),
+            'min_price': float(record['min_price']),
+            'price_percentile': float(percentile),
+            'best_discount_month': int(record['best_discount_month']),
+            'recommendation': 'comprar' if good_buy else 'aguardar',
+        })
+    return results
+
+
+def price_percentiles(records):
+    """Percentil (0-100) do último preço na distribuição histórica de cada app.
+
+    Interpola entre os percentis guardados; preços empatados com vários
+    percentis (ex.: o preço cheio, que domina o histórico) ficam no meio do
+    intervalo empatado, como o ``kind='mean'`` de percentileofscore.
+    """
+    breakpoints = records['price_breakpoints'].astype(np.float64)
+    price = records['latest_price'].astype(np.float64)[:, None]
+    below = _interpolated_rank(breakpoints, price, (breakpoints < price).sum(axis=1))
+    at_or_below = _interpolated_rank(breakpoints, price, (breakpoints <= price).sum(axis=1))
+    return (below + at_or_below) / 2
+
+
+def _interpolated_rank(breakpoints, price, count):
+    """Percentil entre os breakpoints ``count - 1`` e ``count`` de cada linha"""
+    rows = np.arange(len(breakpoints))
+    lower = np.clip(count - 1, 0, len(PERCENTILES) - 1)
+    upper = np.minimum(count, len(PERCENTILES) - 1)
+    low_value, high_value = breakpoints[rows, lower], breakpoints[rows, upper]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = np.where(high_value > low_value, (price[:, 0] - low_value) / (high_value - low_value), 0)
+    rank = PERCENTILES[lower] + np.clip(fraction, 0, 1) * (PERCENTILES[1] - PERCENTILES[0])
+    return np.where(count == 0, 0, np.where(count == len(PERCENTILES), 100, rank))
+
+
+def _grouped_percentiles(store, values, positions):
+    """Percentis (interpolação linear, como np.percentile) de ``values`` por app"""
+    counts = store.counts()
+    app_index = np.repeat(np.arange(store.n_apps), counts)
+    sorted_values = np.asarray(values, dtype=np.float64)[np.lexsort((values, app_index))]
+
+    starts = store.offsets[positions][:, None]
+    rank = (counts[positions][:, None] - 1) * PERCENTILES / 100
+    below = np.floor(rank).astype(np.int64)
+    above = np.ceil(rank).astype(np.int64)
+    low_value = sorted_values[starts + below]
+    high_value = sorted_values[starts + above]
+    return low_value + (high_value - low_value) * (rank - below)
+
+
+def format_result(result):
+    """Linha de texto de uma resposta de query_buy_index"""
+    if not result['found']:
+        return f"{result['appid']}: não encontrado no índice"
+    return (f"{result['appid']}: {result['recommendation'].upper()} - preço atual ${result['latest_price']:.2f} "
+            f"(percentil {result['price_percentile']:.0f}, mínimo ${result['min_price']:.2f}, "
+            f"desconto {result['latest_discount']}%, melhor mês {result['best_discount_month']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Consultar se agora é um bom momento para comprar')
+    parser.add_argument('appids', type=int, nargs='+', help='appids a consultar')
+    parser.add_argument('--index', default=INDEX_FILENAME, help=f'arquivo do índice (padrão: {INDEX_FILENAME})')
+    args = parser.parse_args()
+
+    for result in query_buy_index(load_buy_index(args.index), args.appids):
+        print(format_result(result))
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from compact_types import to_datetime64, widen_prices
+
+SUMMARY_FILENAME = 'steam_games_analysis.png'
+CHARTS_DIRNAME = 'price_charts'
+MANIFEST_NAME = 'manifest.json'
+# Mudar ao alterar o desenho dos gráficos, para invalidar os já gerados
+CHART_VERSION = 1
+# Pontos por série após a decimação (pares mínimo/máximo)
+MAX_POINTS = 1000
+CHART_DPI = 100
+
+
+def minmax_decimate(x, y, max_points=MAX_POINTS):
+    """Reduzir uma série a no máximo ``max_points`` pontos preservando picos e vales.
+
+    A série é dividida em ``max_points // 2`` blocos contíguos e de cada um
+    ficam o primeiro mínimo e o primeiro máximo, na ordem original; assim uma
+    promoção de um único dia continua visível no gráfico.
+    """
+    n = len(y)
+    if n <= max_points:
+        return x, y
+    starts = np.linspace(0, n, max_points // 2, endpoint=False).astype(np.int64)
+    bucket = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+    positions = np.arange(n)
+    first_min = np.minimum.reduceat(np.where(y == np.minimum.reduceat(y, starts)[bucket], positions, n), starts)
+    first_max = np.minimum.reduceat(np.where(y == np.maximum.reduceat(y, starts)[bucket], positions, n), starts)
+    keep = np.unique(np.concatenate([first_min, first_max]))
+    return x[keep], y[keep]
+
+
+def app_fingerprint(app_id, dates, *series, name=None):
+    """Hash dos dados de um gráfico (e da versão do desenho)"""
+    digest = hashlib.sha1(f'{CHART_VERSION}:{MAX_POINTS}:{CHART_DPI}:{app_id}:{name}'.encode())
+    for values in (dates,) + series:
+        digest.update(np.ascontiguousarray(values).tobytes())
+    return digest.hexdigest()
+
+
+def load_manifest(output_dir):
+    """Impressões digitais dos gráficos já gerados, por appid"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return {int(app_id): fingerprint for app_id, fingerprint in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, fingerprints):
+    tmp_path = os.path.join(output_dir, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump({str(app_id): fingerprint for app_id, fingerprint in fingerprints.items()}, f)
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_NAME))
+
+
+def render_store_charts(store, output_dir=CHARTS_DIRNAME, fingerprints=None, names=None):
+    """Gerar ``<appid>.png`` para cada app do store cujos dados mudaram.
+
+    Pode ser aplicada a fragmentos do store em paralelo (ShardedExecutor.map_store).
+    Retorna um DataFrame com appid, impressão digital e se o gráfico foi
+    redesenhado.
+    """
+    fingerprints = fingerprints or {}
+    names = names or {}
+    os.makedirs(output_dir, exist_ok=True)
+
+    dates = store.columns['Date']
+    initial, final, discount = (store.columns[name] for name in ('Initialprice', 'Finalprice', 'Discount'))
+    chart = None
+    rows = []
+    for i, app_id in enumerate(store.appids.tolist()):
+        app_rows = slice(int(store.offsets[i]), int(store.offsets[i + 1]))
+        name = names.get(app_id)
+        fingerprint = app_fingerprint(app_id, dates[app_rows], initial[app_rows], final[app_rows],
+                                      discount[app_rows], name=name)
+        path = os.path.join(output_dir, f'{app_id}.png')
+        rendered = fingerprints.get(app_id) != fingerprint or not os.path.exists(path)
+        if rendered:
+            # Uma única figura por fragmento, reaproveitada entre os apps
+            chart = chart or PriceChart()
+            chart.render(path, app_id, dates[app_rows], initial[app_rows], final[app_rows],
+                         discount[app_rows], name=name)
+        rows.append((app_id, fingerprint, rendered))
+    return pd.DataFrame(rows, columns=['appid', 'fingerprint', 'rendered'])
+
+
+class PriceChart:
+    """Figura do histórico de um app (preços acima, desconto abaixo), sem janela.
+
+    A figura, os eixos e as linhas são criados uma vez; cada app só troca os
+    dados, os limites e os rótulos das datas antes de salvar, o que evita
+    refazer layout e localizadores de data a cada gráfico.
+    """
+
+    def __init__(self):
+        from matplotlib.figure import Figure
+
+        _apply_style()
+        self.figure = Figure(figsize=(8, 4.5))
+        self.price_ax, self.discount_ax = self.figure.subplots(
+            2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1]}
+        )
+        self.initial_line, = self.price_ax.plot([], [], drawstyle='steps-post', linestyle='--', label='Preço inicial')
+        self.final_line, = self.price_ax.plot([], [], drawstyle='steps-post', label='Preço final')
+        self.discount_line, = self.discount_ax.plot([], [], drawstyle='steps-post')
+        self.price_ax.set_ylabel('Preço ($)')
+        self.price_ax.legend(loc='upper right')
+        self.discount_ax.set_ylabel('Desconto (%)')
+        self.discount_ax.set_ylim(0, 100)
+        self.figure.subplots_adjust(left=0.09, right=0.98, top=0.92, bottom=0.1, hspace=0.08)
+
+    def render(self, path, app_id, dates, initial, final, discount, name=None):
+        days = np.asarray(dates, dtype=np.int64)
+        top = 0
+        for line, values in ((self.initial_line, widen_prices(initial)), (self.final_line, widen_prices(final))):
+            x, y = minmax_decimate(days, values)
+            line.set_data(x, y)
+            top = max(top, y.max() if len(y) else 0)
+        self.discount_line.set_data(*minmax_decimate(days, np.asarray(discount, dtype=np.float64)))
+
+        first, last = (int(days[0]), int(days[-1])) if len(days) else (0, 1)
+        self.discount_ax.set_xlim(first, max(last, first + 1))
+        self.price_ax.set_ylim(0, top * 1.08 or 1)
+        ticks = _month_ticks(first, last)
+        self.discount_ax.set_xticks(ticks)
+        self.discount_ax.set_xticklabels(np.datetime_as_string(to_datetime64(ticks), unit='M'))
+        self.price_ax.set_title(f'{name} ({app_id})' if name else f'App {app_id}')
+        self.figure.savefig(path, dpi=CHART_DPI)
+
+
+def _month_ticks(first, last, max_ticks=8):
+    """Inícios de mês entre dois dias, espaçados para no máximo ``max_ticks`` rótulos"""
+    months = np.arange(to_datetime64(first).astype('datetime64[M]') + 1,
+                       to_datetime64(last).astype('datetime64[M]') + 1)
+    step = max(1, -(-len(months) // max_ticks))
+    return months[::step].astype('datetime64[D]').astype(np.int64)
+
+
+def render_summary_chart(features_data, path=SUMMARY_FILENAME, dpi=300, show=False):
+    """Painel resumo de 6 gráficos; só abre uma janela (pyplot) com ``show=True``"""
+    _apply_style()
+    if show:
+        import matplotlib.pyplot as plt
+        fig = plt.figure(figsize=(18, 12))
+    else:
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=(18, 12))
+    axes = fig.subplots(2, 3)
+    fig.suptitle('Análise Exploratória - Dados de Jogos Steam', fontsize=16)
+
+    # 1. Distribuição de preços inicial
+    axes[0, 0].hist(features_data['avg_initial_price'], bins=50, alpha=0.7)
+    axes[0, 0].set_title('Distribuição de Preços Iniciais')
+    axes[0, 0].set_xlabel('Preço Médio Inicial')
+    axes[0, 0].set_ylabel('Frequência')
+
+    # 2. Frequência de desconto vs Preço
+    axes[0, 1].scatter(features_data['avg_initial_price'],
+                       features_data['discount_frequency'], alpha=0.6)
+    axes[0, 1].set_title('Preço vs Frequência de Desconto')
+    axes[0, 1].set_xlabel('Preço Médio Inicial')
+    axes[0, 1].set_ylabel('Frequência de Desconto')
+
+    # 3. Distribuição de descontos máximos
+    axes[0, 2].hist(features_data['max_discount'], bins=30, alpha=0.7)
+    axes[0, 2].set_title('Distribuição de Descontos Máximos')
+    axes[0, 2].set_xlabel('Desconto Máximo (%)')
+    axes[0, 2].set_ylabel('Frequência')
+
+    # 4. Análise temporal - Ano de lançamento
+    release_year_counts = features_data['release_year'].value_counts().sort_index()
+    axes[1, 0].plot(release_year_counts.index, release_year_counts.values)
+    axes[1, 0].set_title('Jogos por Ano de Lançamento')
+    axes[1, 0].set_xlabel('Ano de Lançamento')
+    axes[1, 0].set_ylabel('Número de Jogos')
+
+    # 5. Correlação entre características
+    corr_features = ['avg_initial_price', 'discount_frequency', 'max_discount', 'price_volatility']
+    corr_matrix = features_data[corr_features].corr()
+    im = axes[1, 1].imshow(corr_matrix, cmap='coolwarm', aspect='auto')
+    axes[1, 1].set_title('Matriz de Correlação')
+    axes[1, 1].set_xticks(range(len(corr_features)))
+    axes[1, 1].set_yticks(range(len(corr_features)))
+    axes[1, 1].set_xticklabels(corr_features, rotation=45)
+    axes[1, 1].set_yticklabels(corr_features)
+    fig.colorbar(im, ax=axes[1, 1])
+
+    # 6. Target variable distribution
+    target_counts = features_data['good_buy_time'].value_counts()
+    axes[1, 2].bar(['Momento Ruim', 'Bom Momento'], target_counts.values)
+    axes[1, 2].set_title('Distribuição da Variável Target')
+    axes[1, 2].set_ylabel('Número de Jogos')
+
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    if show:
+        plt.show()
+    return path
+
+
+def _apply_style():
+    """Estilo dos gráficos (também nos processos do pool, que não herdam rcParams)"""
+    import matplotlib
+    import seaborn as sns
+
+    matplotlib.style.use('seaborn-v0_8')
+    sns.set_palette("husl")
@@ -0,0 +1,227 @@
+from collections import namedtuple
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import sys
+
+import numpy as np
+
+from price_store import PriceStore
+
+CHECKPOINT_DIRNAME = '.checkpoints'
+CHECKPOINT_VERSION = 1
+
+# reads/writes: atributos de SteamGameAnalysis usados e produzidos pela etapa;
+# params: argumentos da etapa que entram na chave; inputs: arquivos de dados
+# lidos (relativos a data_path); helpers e modules: código além do método da
+# etapa que altera o resultado; files: arquivos gerados no diretório atual
+# (nomes com {param} só contam quando o parâmetro é passado)
+Stage = namedtuple('Stage', 'name reads writes params inputs helpers modules files')
+# Parâmetros que só abrem janelas: ficam fora da chave e, ativados, a etapa nunca é pulada
+INTERACTIVE_PARAMS = ['show']
+
+PIPELINE = [
+    Stage('load_application_data', [], ['app_info'], [], ['applicationInformation.csv'],
+          ['_read_app_info'], ['compact_types'], []),
+    Stage('load_price_history_sample', [], ['price_store'], ['sample_size'], ['PriceHistory'],
+          ['_read_csv_files'], ['price_store', 'compact_types'], []),
+    Stage('data_cleaning', ['app_info', 'price_store'], ['app_info', 'price_store'], [], [],
+          ['_clean_app_info'], ['price_store'], []),
+    Stage('data_transformation', ['app_info', 'price_store'], ['app_info', 'price_store'], [], [],
+          ['_transform_app_info'], ['price_store', 'compact_types'], []),
+    Stage('feature_engineering', ['app_info', 'price_store'], ['features_data', 'storewide_sales'], [], [],
+          [], ['price_features', 'sale_matrix', 'compact_types'], []),
+    Stage('data_splitting', ['features_data'], ['features_data', 'datasets'], ['test_size', 'val_size'], [],
+          ['_create_target_variable'], [], []),
+    Stage('generate_visualizations', ['app_info', 'price_store', 'features_data'], [], ['charts_dir', 'show'], [],
+          [], ['charts'], ['steam_games_analysis.png', '{charts_dir}/manifest.json']),
+    Stage('save_processed_data', ['app_info', 'price_store', 'features_data', 'storewide_sales'], [], [], [],
+          [], ['buy_index', 'sale_matrix', 'similarity_index'],
+          ['processed_application_info.csv', 'engineered_features.csv', 'buy_index.npy', 'sale_matrix/discount.npy',
+           'similarity_index/vectors.npy', 'processing_summary.txt']),
+]
+
+
+def pipeline_until(until=None):
+    """Etapas de PIPELINE até ``until`` (inclusive); todas se None"""
+    names = [stage.name for stage in PIPELINE]
+    return PIPELINE if until is None else PIPELINE[:names.index(until) + 1]
+
+
+class StageCheckpoints:
+    """Executa as etapas da análise como um DAG memoizado em disco.
+
+    A chave de cada etapa é um hash do código da etapa, dos seus parâmetros
+    e das chaves das etapas que produziram os atributos que ela lê (ou da
+    assinatura dos arquivos de entrada, para as etapas de carga). Etapas
+    com checkpoint de mesma chave são puladas; o estado salvo só é
+    restaurado quando uma etapa posterior precisa ser executada. Assim uma
+    execução interrompida retoma da última etapa concluída.
+    """
+
+    def __init__(self, directory=CHECKPOINT_DIRNAME):
+        self.directory = os.path.abspath(directory)
+
+    def run(self, analysis, until=None, **params):
+        """Executar o pipeline até ``until`` pulando etapas inalteradas.
+
+        Ao final, o objeto de análise tem o estado mais recente de cada
+        atributo produzido; retorna os datasets da divisão (None se ela não
+        fizer parte das etapas executadas).
+        """
+        keys = {}
+        producers = {}
+        loaded = {}
+        for stage in pipeline_until(until):
+            stage_params = {name: params[name] for name in stage.params if name in params}
+            upstream = {attribute: producers[attribute] for attribute in stage.reads}
+            key_params = {name: value for name, value in stage_params.items() if name not in INTERACTIVE_PARAMS}
+            key = self._stage_key(analysis, stage, key_params, {a: keys[p] for a, p in upstream.items()})
+            keys[stage.name] = key
+            interactive = any(stage_params.get(name) for name in INTERACTIVE_PARAMS)
+
+            if not interactive and self._is_valid(stage, key):
+                print(f"Etapa {stage.name}: checkpoint reaproveitado")
+            else:
+                # Restaurar apenas o estado que a etapa lê e ainda não está em memória
+                for attribute, producer in upstream.items():
+                    if loaded.get(attribute) != producer:
+                        self._restore(analysis, producer, loaded, [attribute])
+                analysis.run_stage(stage.name, **stage_params)
+                self._save(analysis, stage, key, _stage_files(stage, stage_params))
+                loaded.update({attribute: stage.name for attribute in stage.writes})
+            producers.update({attribute: stage.name for attribute in stage.writes})
+
+        for attribute, producer in producers.items():
+            if loaded.get(attribute) != producer:
+                self._restore(analysis, producer, loaded, [attribute])
+        return analysis.datasets
+
+    def _stage_key(self, analysis, stage, params, upstream_keys):
+        digest = hashlib.sha1()
+        digest.update(json.dumps({
+            'version': CHECKPOINT_VERSION,
+            'stage': stage.name,
+            'params': params,
+            'upstream': upstream_keys,
+        }, sort_keys=True, default=str).encode())
+        for name in [stage.name] + stage.helpers:
+            digest.update(inspect.getsource(getattr(type(analysis), name)).encode())
+        for module_name in stage.modules:
+            with open(sys.modules[module_name].__file__, 'rb') as f:
+                digest.update(f.read())
+        for name in stage.inputs:
+            digest.update(_input_signature(os.path.join(analysis.data_path, name)).encode())
+        return digest.hexdigest()
+
+    def _stage_dir(self, stage_name):
+        return os.path.join(self.directory, stage_name)
+
+    def _read_meta(self, stage_name):
+        try:
+            with open(os.path.join(self._stage_dir(stage_name), 'meta.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _is_valid(self, stage, key):
+        meta = self._read_meta(stage.name)
+        if meta is None or meta['key'] != key:
+            return False
+        # Arquivos gerados pela etapa devem continuar como foram gravados
+        return all(_file_signature(name) == signature for name, signature in meta['files'].items())
+
+    def _save(self, analysis, stage, key, files):
+        """Gravar o estado produzido pela etapa, trocando o checkpoint anterior"""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_dir = self._stage_dir(stage.name) + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        state = {}
+        for attribute in stage.writes:
+            value = getattr(analysis, attribute)
+            if isinstance(value, PriceStore):
+                _save_store(os.path.join(tmp_dir, attribute), value)
+            else:
+                state[attribute] = value
+        with open(os.path.join(tmp_dir, 'state.pkl'), 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        meta = {'key': key, 'files': {name: _file_signature(name) for name in files}}
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+        stage_dir = self._stage_dir(stage.name)
+        shutil.rmtree(stage_dir, ignore_errors=True)
+        os.replace(tmp_dir, stage_dir)
+
+    def _restore(self, analysis, stage_name, loaded, attributes):
+        """Carregar no objeto de análise os atributos salvos por uma etapa.
+
+        Só os atributos pedidos: os demais que a etapa gravou podem já ter
+        sido substituídos por uma etapa posterior.
+        """
+        stage_dir = self._stage_dir(stage_name)
+        with open(os.path.join(stage_dir, 'state.pkl'), 'rb') as f:
+            state = pickle.load(f)
+        for attribute in attributes:
+            if attribute not in state:
+                state[attribute] = _load_store(os.path.join(stage_dir, attribute))
+            setattr(analysis, attribute, state[attribute])
+            loaded[attribute] = stage_name
+
+
+def _stage_files(stage, params):
+    """Arquivos gerados pela etapa com estes parâmetros"""
+    given = {name: value for name, value in params.items() if value is not None}
+    files = []
+    for name in stage.files:
+        try:
+            files.append(name.format(**given))
+        except KeyError:
+            # Saída opcional cujo parâmetro não foi passado (ex.: charts_dir)
+            continue
+    return files
+
+
+def _input_signature(path):
+    """Tamanho e mtime de um arquivo, ou de todos os arquivos de um diretório"""
+    if not os.path.isdir(path):
+        return json.dumps(_file_signature(path))
+    digest = hashlib.sha1()
+    for entry in sorted(os.scandir(path), key=lambda e: e.name):
+        if entry.is_file():
+            stat = entry.stat()
+            digest.update(f'{entry.name}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode())
+    return digest.hexdigest()
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _save_store(directory, store):
+    os.makedirs(directory)
+    with open(os.path.join(directory, 'columns.json'), 'w') as f:
+        json.dump(list(store.columns), f)
+    np.save(os.path.join(directory, 'appids.npy'), store.appids)
+    np.save(os.path.join(directory, 'offsets.npy'), store.offsets)
+    for name, values in store.columns.items():
+        np.save(os.path.join(directory, 'col_' + name + '.npy'), values)
+
+
+def _load_store(directory):
+    """PriceStore salvo por _save_store, aberto com memory mapping"""
+    def load(name):
+        return np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+
+    with open(os.path.join(directory, 'columns.json')) as f:
+        columns = {name: load('col_' + name) for name in json.load(f)}
+    return PriceStore(load('appids'), load('offsets'), columns)
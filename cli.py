@@ -0,0 +1,235 @@
+import argparse
+import os
+
+# Só bibliotecas leves aqui: pandas, matplotlib e sklearn são importados pelos
+# subcomandos que precisam deles (query usa apenas NumPy)
+from buy_index import INDEX_FILENAME
+from dataset_split import CHUNK_ROWS, SPLIT_DIRNAME
+from similarity_index import SIMILARITY_DIRNAME
+from window_dataset import HORIZON, LOOKBACK, WINDOW_DIRNAME
+
+DEFAULT_DATA_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def _analysis(args):
+    from steam_data_processing import SteamGameAnalysis
+    return SteamGameAnalysis(args.data_path, use_cache=not args.no_cache, workers=args.workers, quiet=args.quiet)
+
+
+def _run_until(args, stage, **params):
+    """Executar o pipeline até ``stage`` (com checkpoints, salvo --no-checkpoints).
+
+    As métricas das etapas executadas são acrescentadas a stage_metrics.jsonl,
+    como em run_complete_analysis.
+    """
+    from stage_metrics import METRICS_FILENAME, StageMetricsRecorder
+    analysis = _analysis(args)
+    recorder = StageMetricsRecorder()
+    analysis.hooks.append(recorder)
+    if args.no_checkpoints:
+        params['checkpoint_dir'] = None
+    try:
+        analysis.run_pipeline(until=stage, **params)
+    finally:
+        analysis.close()
+        recorder.write(METRICS_FILENAME)
+    return analysis
+
+
+def cmd_run(args):
+    params = {'checkpoint_dir': None} if args.no_checkpoints else {}
+    datasets = _analysis(args).run_complete_analysis(**params)
+    if datasets:
+        print(f"\nDatasets criados:")
+        print(f"  Treino: {datasets['X_train'].shape}")
+        print(f"  Validação: {datasets['X_val'].shape}")
+        print(f"  Teste: {datasets['X_test'].shape}")
+        print(f"\nFeatures disponíveis: {len(datasets['feature_names'])}")
+        print("Dados prontos para modelagem!")
+
+
+def cmd_load(args):
+    analysis = _run_until(args, 'load_price_history_sample', sample_size=args.sample_size)
+    print(f"{len(analysis.app_info)} aplicações; histórico de preços de {analysis.price_store.n_apps} apps "
+          f"({len(analysis.price_store)} registros)")
+
+
+def cmd_features(args):
+    if args.incremental:
+        _analysis(args).run_incremental_update()
+        return
+    if args.streaming:
+        _analysis(args).run_streaming_analysis(max_memory_mb=args.max_memory_mb)
+        return
+    analysis = _run_until(args, 'feature_engineering', sample_size=args.sample_size)
+    analysis.save_features(args.output)
+    print(f"Features de {len(analysis.features_data)} jogos salvas em {args.output}")
+
+
+def cmd_split(args):
+    if args.out_of_core:
+        _analysis(args).run_out_of_core_split(args.features, args.output_dir, args.test_size, args.val_size,
+                                              args.chunk_rows)
+        return
+    analysis = _run_until(args, 'data_splitting', test_size=args.test_size, val_size=args.val_size)
+    for name in ('X_train', 'X_val', 'X_test'):
+        print(f"  {name}: {analysis.datasets[name].shape}")
+
+
+def cmd_windows(args):
+    analysis = _run_until(args, 'data_transformation', sample_size=args.sample_size)
+    analysis.build_window_dataset(args.output_dir, args.lookback, args.horizon)
+
+
+def cmd_plot(args):
+    _run_until(args, 'generate_visualizations', charts_dir=args.charts_dir, show=args.show)
+
+
+def cmd_query(args):
+    from buy_index import format_result, load_buy_index, query_buy_index
+    for result in query_buy_index(load_buy_index(args.index), args.appids):
+        print(format_result(result))
+
+
+def cmd_sales(args):
+    import numpy as np
+    from sale_matrix import SALE_MATRIX_DIRNAME, load_price_matrix
+    matrix = load_price_matrix(args.matrix or SALE_MATRIX_DIRNAME)
+    sales = matrix.storewide_sales()
+    print(f"{len(sales)} promoções gerais em {matrix.n_days} dias de {len(matrix.appids)} apps")
+    for app_id in args.appids:
+        if app_id not in matrix.appids:
+            print(f"{app_id}: não encontrado na matriz")
+    appids = [app_id for app_id in args.appids if app_id in matrix.appids]
+    discounts = {app_id: matrix.sale_discounts(app_id, sales) for app_id in appids}
+    for i, sale in enumerate(sales.itertuples()):
+        print(f"{sale.start:%Y-%m-%d} a {sale.end:%Y-%m-%d} ({sale.days} dias): "
+              f"até {sale.peak_rate:.0%} dos apps em desconto")
+        for app_id in appids:
+            discount = discounts[app_id][i]
+            if np.isnan(discount):
+                print(f"  {app_id}: sem coleta")
+            else:
+                print(f"  {app_id}: " + (f"até {discount:.0f}% de desconto" if discount else "sem desconto"))
+
+
+def cmd_update(args):
+    from price_updater import FileSource, HttpSource, PriceUpdater
+    source = FileSource(args.source_dir) if args.source_dir else HttpSource(args.source_url, args.pool_size)
+    updater = PriceUpdater(source, os.path.join(args.data_path, 'PriceHistory'), concurrency=args.concurrency,
+                           rate=args.rate, retries=args.retries)
+    stats = updater.run(args.appids)
+    print(f"{stats['new_rows']} linhas novas em {stats['updated_apps']} de {stats['apps']} apps")
+    if stats['missing']:
+        print(f"Sem dados na fonte: {len(stats['missing'])} apps")
+    for app_id, error in stats['failed'].items():
+        print(f"Falha em {app_id}: {error}")
+
+
+def cmd_similar(args):
+    from similarity_index import SimilarityIndex
+    index = SimilarityIndex.load(args.index)
+    neighbours, scores = index.similar_to(args.appids, args.k)
+    for app_id, app_neighbours, app_scores in zip(args.appids, neighbours, scores):
+        if app_id not in index:
+            print(f"{app_id}: não encontrado no índice")
+            continue
+        print(f"{app_id}: " + ', '.join(f"{n} ({score:.2f})" for n, score in zip(app_neighbours, app_scores)))
+
+
+def build_parser():
+    data = argparse.ArgumentParser(add_help=False)
+    data.add_argument('--data-path', default=os.environ.get('PRYZOR_DATA_PATH', DEFAULT_DATA_PATH),
+                      help='Diretório com applicationInformation.csv e PriceHistory/ '
+                           '(padrão: $PRYZOR_DATA_PATH ou o diretório do repositório)')
+    common = argparse.ArgumentParser(add_help=False, parents=[data])
+    common.add_argument('--workers', type=int, default=1, help='Processos para as etapas por app (padrão: 1)')
+    common.add_argument('--quiet', action='store_true', help='Omitir as impressões exploratórias')
+    common.add_argument('--no-cache', action='store_true', help='Ler os CSVs sem o cache binário de preços')
+    common.add_argument('--no-checkpoints', action='store_true',
+                        help='Executar as etapas ignorando os checkpoints salvos')
+
+    parser = argparse.ArgumentParser(description='Pryzor: processamento e consulta de preços de jogos Steam')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', parents=[common], help='Executar a análise completa (todas as etapas)')
+    run.set_defaults(func=cmd_run)
+
+    load = subparsers.add_parser('load', parents=[common], help='Carregar aplicações e histórico de preços')
+    load.add_argument('--sample-size', type=int, help='Carregar apenas os N primeiros arquivos de preços')
+    load.set_defaults(func=cmd_load)
+
+    features = subparsers.add_parser('features', parents=[common], help='Gerar engineered_features.csv')
+    features.add_argument('--sample-size', type=int, help='Usar apenas os N primeiros arquivos de preços')
+    features.add_argument('--output', default='engineered_features.csv', help='Arquivo de saída')
+    mode = features.add_mutually_exclusive_group()
+    mode.add_argument('--incremental', action='store_true', help='Ler só os dias novos desde a última execução')
+    mode.add_argument('--streaming', action='store_true', help='Processar em blocos com memória limitada')
+    features.add_argument('--max-memory-mb', type=int, default=256, help='Limite do modo streaming (padrão: 256)')
+    features.set_defaults(func=cmd_features)
+
+    split = subparsers.add_parser('split', parents=[common], help='Dividir em treino, validação e teste')
+    split.add_argument('--test-size', type=float, default=0.2)
+    split.add_argument('--val-size', type=float, default=0.1)
+    split.add_argument('--out-of-core', action='store_true',
+                       help='Dividir por hash do app_id lendo o CSV de features em blocos e gravar arrays float32')
+    split.add_argument('--features', default='engineered_features.csv', help='CSV de features do modo --out-of-core')
+    split.add_argument('--output-dir', default=SPLIT_DIRNAME,
+                       help=f'Diretório dos arrays do modo --out-of-core (padrão: {SPLIT_DIRNAME})')
+    split.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS,
+                       help=f'Linhas por bloco no modo --out-of-core (padrão: {CHUNK_ROWS})')
+    split.set_defaults(func=cmd_split)
+
+    windows = subparsers.add_parser('windows', parents=[common], help='Gerar amostras diárias com janelas de preços')
+    windows.add_argument('--sample-size', type=int, help='Usar apenas os N primeiros arquivos de preços')
+    windows.add_argument('--lookback', type=int, default=LOOKBACK,
+                         help=f'Dias de histórico por amostra (padrão: {LOOKBACK})')
+    windows.add_argument('--horizon', type=int, default=HORIZON,
+                         help=f'Dias à frente para procurar um preço menor (padrão: {HORIZON})')
+    windows.add_argument('--output-dir', default=WINDOW_DIRNAME,
+                         help=f'Diretório dos arrays gerados (padrão: {WINDOW_DIRNAME})')
+    windows.set_defaults(func=cmd_windows)
+
+    plot = subparsers.add_parser('plot', parents=[common], help='Gerar steam_games_analysis.png')
+    plot.add_argument('--charts-dir', help='Também gerar um gráfico de preços por jogo neste diretório')
+    plot.add_argument('--show', action='store_true', help='Abrir o painel resumo em uma janela (matplotlib)')
+    plot.set_defaults(func=cmd_plot)
+
+    query = subparsers.add_parser('query', help='Consultar se agora é um bom momento para comprar')
+    query.add_argument('appids', type=int, nargs='+', help='appids a consultar')
+    query.add_argument('--index', default=INDEX_FILENAME, help=f'Arquivo do índice (padrão: {INDEX_FILENAME})')
+    query.set_defaults(func=cmd_query)
+
+    sales = subparsers.add_parser('sales', help='Promoções gerais detectadas na matriz (dia x app) de descontos')
+    sales.add_argument('appids', type=int, nargs='*', help='appids cujo desconto em cada promoção é exibido')
+    sales.add_argument('--matrix', help='Diretório da matriz (padrão: o gravado pela análise completa)')
+    sales.set_defaults(func=cmd_sales)
+
+    update = subparsers.add_parser('update', parents=[data], help='Buscar os dias novos de PriceHistory/ em uma fonte')
+    source = update.add_mutually_exclusive_group(required=True)
+    source.add_argument('--source-url', help='URL base que serve <appid>.csv (aceita ?since=AAAA-MM-DD)')
+    source.add_argument('--source-dir', help='Diretório com <appid>.csv atualizados')
+    update.add_argument('--appids', type=int, nargs='+', help='appids a atualizar (padrão: os que já têm CSV)')
+    update.add_argument('--concurrency', type=int, default=16, help='Buscas simultâneas (padrão: 16)')
+    update.add_argument('--pool-size', type=int, default=8, help='Conexões HTTP abertas (padrão: 8)')
+    update.add_argument('--rate', type=float, help='Máximo de requisições por segundo à fonte')
+    update.add_argument('--retries', type=int, default=3, help='Novas tentativas em falhas temporárias (padrão: 3)')
+    update.set_defaults(func=cmd_update)
+
+    similar = subparsers.add_parser('similar', help='Jogos com perfil de desconto parecido')
+    similar.add_argument('appids', type=int, nargs='+', help='appids a consultar')
+    similar.add_argument('-k', type=int, default=10, help='Vizinhos por jogo (padrão: 10)')
+    similar.add_argument('--index', default=SIMILARITY_DIRNAME,
+                         help=f'Diretório do índice (padrão: {SIMILARITY_DIRNAME})')
+    similar.set_defaults(func=cmd_similar)
+    return parser
+
+
+def main(argv=None):
+    """Ponto de entrada da CLI (também usado por ``python steam_data_processing.py``)"""
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Formato de releasedate em applicationInformation.csv (ex.: 21-Dec-17)
+RELEASE_DATE_FORMAT = '%d-%b-%y'
+
+
+def parse_release_dates(values):
+    """Converter releasedate em uma única chamada vetorizada; datas inválidas viram NaT"""
+    return pd.to_datetime(values, format=RELEASE_DATE_FORMAT, errors='coerce')
+
+
+def compact_app_info(app_info):
+    """app_info com tipos compactos: appid int32, type categórico e freetoplay float32"""
+    app_info = app_info.copy()
+    appid = app_info['appid']
+    if appid.notna().all() and appid.between(0, np.iinfo(np.int32).max).all():
+        app_info['appid'] = appid.astype(np.int32)
+    app_info['type'] = app_info['type'].astype('category')
+    app_info['freetoplay'] = app_info['freetoplay'].astype(np.float32)
+    return app_info
+
+
+def day_numbers(dates):
+    """Datas como número de dias desde 1970-01-01 (int32)"""
+    return np.asarray(dates).astype('datetime64[D]').astype(np.int32)
+
+
+def to_datetime64(days):
+    """Inverso de day_numbers"""
+    return np.asarray(days).astype(np.int64).astype('datetime64[D]')
+
+
+def compact_price_columns(long_df):
+    """Colunas do histórico de preços em tipos compactos.
+
+    Date vira int32 (dias), preços float32 e Discount uint8 quando todos os
+    valores são inteiros entre 0 e 255. Linhas com valores ausentes devem ter
+    sido removidas antes, pois esses tipos não representam NaN.
+    """
+    columns = {}
+    for name in long_df.columns:
+        values = long_df[name].to_numpy()
+        if name == 'Date':
+            values = day_numbers(values)
+        elif name in ('Initialprice', 'Finalprice'):
+            values = values.astype(np.float32)
+        elif name == 'Discount':
+            integral = np.array_equal(values, np.round(values)) if len(values) else True
+            in_range = not len(values) or (values.min() >= 0 and values.max() <= 255)
+            values = values.astype(np.uint8 if integral and in_range else np.float32)
+        columns[name] = values
+    return columns
+
+
+def widen_prices(values):
+    """Preços float32 de volta a float64, arredondados aos centavos.
+
+    Os preços da Steam têm duas casas decimais e float32 os guarda com erro
+    bem menor que meio centavo, então o arredondamento recupera o mesmo
+    float64 que a leitura direta do CSV produziria.
+    """
+    values = np.asarray(values)
+    if values.dtype == np.float32:
+        return np.round(values.astype(np.float64), 2)
+    return values.astype(np.float64, copy=False)
+
+
+def format_memory_saving(table_name, before_bytes, after_bytes):
+    """Linha de relatório com a memória economizada por uma tabela"""
+    saved = before_bytes - after_bytes
+    ratio = before_bytes / after_bytes if after_bytes else float('inf')
+    return (f"Memória de {table_name}: {before_bytes / 2**20:.2f} MB -> {after_bytes / 2**20:.2f} MB "
+            f"(economia de {saved / 2**20:.2f} MB, {ratio:.1f}x menor)")
@@ -0,0 +1,155 @@
+import json
+import os
+import pickle
+
+import numpy as np
+
+# pandas é importado só pelas funções que leem CSV, para que a CLI possa
+# importar as constantes deste módulo sem carregá-lo
+
+SPLIT_DIRNAME = 'split_data'
+SPLIT_NAMES = ('train', 'val', 'test')
+# Semente do hash; trocá-la sorteia uma divisão nova
+SPLIT_SEED = 42
+# Colunas que definem o target (medianas globais, ver _create_target_variable)
+TARGET_COLUMNS = ['discount_frequency', 'avg_discount', 'max_savings']
+CHUNK_ROWS = 100_000
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def hash_unit_interval(app_ids, seed=SPLIT_SEED):
+    """Número em [0, 1) derivado só do app_id (splitmix64), igual em qualquer máquina"""
+    with np.errstate(over='ignore'):
+        z = np.asarray(app_ids, dtype=np.int64).astype(np.uint64) + np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9) & _MASK64
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB) & _MASK64
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) / 2.0**53
+
+
+def assign_splits(app_ids, labels, test_size=0.2, val_size=0.1, seed=SPLIT_SEED):
+    """Índice em SPLIT_NAMES (0 treino, 1 validação, 2 teste) de cada app, estratificado por ``labels``.
+
+    Dentro de cada classe os apps são ordenados pelo hash do app_id e
+    cortados nas proporções de treino/validação/teste, como em
+    train_test_split(stratify=...): cada split recebe a mesma taxa de
+    cada classe (a menos do arredondamento). A divisão é reprodutível e
+    um app novo desloca no máximo um app da sua classe por fronteira.
+    """
+    app_ids = np.asarray(app_ids, dtype=np.int64)
+    labels = np.asarray(labels)
+    splits = np.zeros(len(app_ids), dtype=np.int8)
+    u = hash_unit_interval(app_ids, seed)
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        # Empates de hash (improváveis) desempatados pelo app_id
+        members = members[np.lexsort((app_ids[members], u[members]))]
+        n = len(members)
+        train_stop = int(round(n * (1 - test_size - val_size)))
+        val_stop = int(round(n * (1 - test_size)))
+        splits[members[train_stop:val_stop]] = 1
+        splits[members[val_stop:]] = 2
+    return splits
+
+
+def iter_csv_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Leitor de blocos reiterável (cada passada relê o CSV do início)"""
+    import pandas as pd
+    return lambda: pd.read_csv(path, chunksize=chunk_rows)
+
+
+def _numeric_features(chunk):
+    return [column for column in chunk.select_dtypes(include=[np.number]).columns if column != 'good_buy_time']
+
+
+def write_hash_split(make_chunks, target_fn, output_dir=SPLIT_DIRNAME, test_size=0.2, val_size=0.1,
+                     seed=SPLIT_SEED):
+    """Dividir e normalizar features bloco a bloco, gravando arrays float32 em disco.
+
+    ``make_chunks`` devolve um iterador novo de DataFrames de features a cada
+    chamada; ``target_fn`` recebe um DataFrame com TARGET_COLUMNS de todos
+    os jogos e devolve o target. A 1ª passada guarda só as colunas do
+    target e os app_ids, para calcular o target e a divisão estratificada
+    (assign_splits); a 2ª ajusta o StandardScaler (partial_fit, só com as
+    linhas de treino); a 3ª normaliza e grava cada split em
+    ``X_<split>.npy``, ``y_<split>.npy`` e ``app_id_<split>.npy``, todos
+    mapeados em memória. Só um bloco de features fica em memória por vez.
+    """
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+
+    feature_names = None
+    target_parts = []
+    for chunk in make_chunks():
+        if feature_names is None:
+            feature_names = _numeric_features(chunk)
+        target_parts.append(chunk[['app_id'] + TARGET_COLUMNS])
+    if feature_names is None:
+        raise ValueError('Nenhuma feature para dividir')
+
+    target_data = pd.concat(target_parts, ignore_index=True)
+    del target_parts
+    target = np.asarray(target_fn(target_data[TARGET_COLUMNS]), dtype=np.int8)
+    splits = assign_splits(target_data['app_id'].to_numpy(), target, test_size, val_size, seed)
+    counts = np.bincount(splits, minlength=len(SPLIT_NAMES))
+    del target_data
+
+    scaler = StandardScaler()
+    row = 0
+    for chunk in make_chunks():
+        train = chunk.loc[splits[row:row + len(chunk)] == 0, feature_names].to_numpy(dtype=np.float64)
+        if len(train):
+            scaler.partial_fit(train)
+        row += len(chunk)
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    def create(prefix, name, dtype, *shape):
+        return np.lib.format.open_memmap(os.path.join(output_dir, f'{prefix}_{name}.npy'), mode='w+',
+                                         dtype=dtype, shape=shape)
+
+    arrays = {}
+    for code, name in enumerate(SPLIT_NAMES):
+        rows = int(counts[code])
+        arrays[name] = (create('X', name, np.float32, rows, len(feature_names)),
+                        create('y', name, np.int8, rows), create('app_id', name, np.int64, rows))
+    written = np.zeros(len(SPLIT_NAMES), dtype=np.int64)
+    row = 0
+    for chunk in make_chunks():
+        scaled = scaler.transform(chunk[feature_names].to_numpy(dtype=np.float64)).astype(np.float32)
+        chunk_target = target[row:row + len(chunk)]
+        chunk_splits = splits[row:row + len(chunk)]
+        for code, name in enumerate(SPLIT_NAMES):
+            mask = chunk_splits == code
+            start, stop = written[code], written[code] + mask.sum()
+            X, y, app_ids = arrays[name]
+            X[start:stop] = scaled[mask]
+            y[start:stop] = chunk_target[mask]
+            app_ids[start:stop] = chunk['app_id'].to_numpy()[mask]
+            written[code] = stop
+        row += len(chunk)
+
+    for split_arrays in arrays.values():
+        for values in split_arrays:
+            values.flush()
+    del arrays
+    with open(os.path.join(output_dir, 'scaler.pkl'), 'wb') as f:
+        pickle.dump(scaler, f, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(os.path.join(output_dir, 'split.json'), 'w') as f:
+        json.dump({'feature_names': feature_names, 'seed': seed, 'test_size': test_size,
+                   'val_size': val_size, 'counts': dict(zip(SPLIT_NAMES, counts.tolist()))}, f, indent=2)
+    return load_hash_split(output_dir)
+
+
+def load_hash_split(output_dir=SPLIT_DIRNAME):
+    """Datasets no formato de data_splitting, com os X abertos por memory mapping"""
+    with open(os.path.join(output_dir, 'split.json')) as f:
+        meta = json.load(f)
+    with open(os.path.join(output_dir, 'scaler.pkl'), 'rb') as f:
+        datasets = {'scaler': pickle.load(f), 'feature_names': meta['feature_names']}
+    for name in SPLIT_NAMES:
+        datasets[f'X_{name}'] = np.load(os.path.join(output_dir, f'X_{name}.npy'), mmap_mode='r')
+        datasets[f'y_{name}'] = np.load(os.path.join(output_dir, f'y_{name}.npy'), mmap_mode='r')
+        datasets[f'app_id_{name}'] = np.load(os.path.join(output_dir, f'app_id_{name}.npy'), mmap_mode='r')
+    return datasets
@@ -0,0 +1,406 @@
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from compact_types import day_numbers
+from price_features import (
+    MONTHLY_DISCOUNT_COLUMNS, ROLLING_WINDOWS, SEQUENCE_ADDITIVE_COLUMNS, SEQUENCE_CARRY_COLUMNS,
+    finalize_sequence_features, join_app_metadata, rolling_min_prices, sequence_aggregates,
+)
+from price_store import PRICE_COLUMNS, parse_price_rows
+from sale_matrix import DISCOUNT_RUN_COLUMNS, detect_storewide_sales, discount_runs, storewide_sale_features
+
+STATE_FILENAME = '.feature_state.npz'
+STATE_VERSION = 3
+MONTHS = range(1, 13)
+
+# Agregados por app que se combinam somando
+ADDITIVE_COLUMNS = [
+    'n_rows', 'sum_initial', 'sum_final', 'sum_discount',
+    'discount_days', 'sum_savings_discounted',
+] + [f'month_sum_{m:02d}' for m in MONTHS] + [f'month_count_{m:02d}' for m in MONTHS]
+MIN_COLUMNS = ['min_initial', 'min_final']
+MAX_COLUMNS = ['max_initial', 'max_final', 'max_discount', 'max_savings']
+# M2 de Initialprice e co-momento (posição, Initialprice), combinados pela fórmula de Chan
+MOMENT_COLUMNS = ['m2_initial', 'comoment_initial']
+# Estado ao fim do histórico (episódio em andamento, aumentos pendentes...),
+# substituído pelo valor do lote, que já o combina com o estado anterior
+CARRY_COLUMNS = [column for column in SEQUENCE_CARRY_COLUMNS if column != 'last_date']
+# Mínimas móveis até a última data, recalculadas com as linhas recentes do arquivo
+ROLLING_COLUMNS = [f'min_price_last_{window}_days' for window in ROLLING_WINDOWS]
+# Manifesto do que já foi processado em cada arquivo
+MANIFEST_COLUMNS = ['last_date', 'byte_offset', 'file_mtime', 'tail_crc']
+# Bytes finais do trecho já processado usados para detectar arquivos reescritos
+TAIL_BYTES = 256
+# Leitura inicial das linhas anteriores ao trecho novo (para as mínimas móveis)
+CONTEXT_BYTES = 8192
+
+
+def default_state_path(data_path):
+    """Arquivo de estado do modo incremental, ao lado de PriceHistory/"""
+    return os.path.join(data_path, STATE_FILENAME)
+
+
+class IncrementalFeatureState:
+    """Agregados combináveis das features de preço, por appid.
+
+    Guarda, para cada app, somas, mínimos/máximos, momentos centrais e o
+    manifesto (última data e posição em bytes já lidas do CSV), além dos
+    trechos de Discount constante (sale_matrix.discount_runs) de onde saem
+    as promoções gerais. Uma atualização lê apenas as linhas acrescentadas
+    desde a última execução e as combina com os agregados existentes.
+    """
+
+    def __init__(self, aggregates=None, runs=None):
+        if aggregates is None:
+            aggregates = pd.DataFrame(
+                columns=(ADDITIVE_COLUMNS + SEQUENCE_ADDITIVE_COLUMNS + MIN_COLUMNS + MAX_COLUMNS
+                         + MOMENT_COLUMNS + CARRY_COLUMNS + ROLLING_COLUMNS + MANIFEST_COLUMNS),
+                index=pd.Index([], dtype=np.int64, name='appid'), dtype=np.float64,
+            )
+        if runs is None:
+            runs = pd.DataFrame(columns=DISCOUNT_RUN_COLUMNS, dtype=np.float64)
+        self.aggregates = aggregates
+        self.runs = runs
+
+    @classmethod
+    def load(cls, path):
+        """Carregar o estado salvo (ou um estado vazio se não existir ou for de outra versão)"""
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path) as saved:
+            if int(saved['version']) != STATE_VERSION:
+                return cls()
+            columns = [str(name) for name in saved['columns']]
+            aggregates = pd.DataFrame(
+                saved['values'], columns=columns,
+                index=pd.Index(saved['appids'], name='appid'),
+            )
+            runs = pd.DataFrame(saved['runs'], columns=DISCOUNT_RUN_COLUMNS)
+        return cls(aggregates, runs)
+
+    def save(self, path):
+        """Salvar o estado de forma atômica"""
+        tmp_path = path + '.tmp.npz'
+        np.savez(
+            tmp_path,
+            version=STATE_VERSION,
+            appids=self.aggregates.index.to_numpy(dtype=np.int64),
+            columns=np.array(self.aggregates.columns, dtype=str),
+            values=self.aggregates.to_numpy(dtype=np.float64),
+            runs=self.runs.to_numpy(dtype=np.float64).reshape(-1, len(DISCOUNT_RUN_COLUMNS)),
+        )
+        os.replace(tmp_path, path)
+
+    def update(self, price_dir, encoding='latin-1'):
+        """Ler as linhas novas de PriceHistory/ e combiná-las aos agregados.
+
+        Arquivos truncados, reescritos (detectados pelo CRC do fim do trecho
+        já lido) ou com datas fora de ordem são reprocessados do início. As
+        linhas dos últimos dias já processados são relidas apenas para
+        recalcular as mínimas móveis. Retorna contagens da atualização.
+        """
+        state = self.aggregates
+        known = dict(zip(state.index, state[['byte_offset', 'file_mtime', 'tail_crc']].itertuples(index=False)))
+        chunks, appids, manifest, resets = [], [], {}, []
+        context_chunks, context_appids = [], []
+        for entry in sorted(os.scandir(price_dir), key=lambda e: e.name):
+            if not entry.name.endswith('.csv') or not entry.is_file():
+                continue
+            app_id = int(entry.name.replace('.csv', ''))
+            stat = entry.stat()
+            mtime = float(stat.st_mtime_ns)
+            start, known_mtime, tail_crc = known.get(app_id, (0, None, None))
+            if start == stat.st_size and mtime == known_mtime:
+                continue
+            body, end, crc = _read_new_rows(entry.path, int(start), stat.st_size, tail_crc, encoding)
+            if body is None:
+                # Conteúdo já processado mudou: recomeçar o app do zero
+                body, end, crc = _read_new_rows(entry.path, 0, stat.st_size, None, encoding)
+                resets.append(app_id)
+            elif start:
+                context_chunks.append(_read_context_rows(entry.path, int(start)))
+                context_appids.append(app_id)
+            if body is None:
+                print(f"Erro ao carregar {entry.path}: cabeçalho inesperado")
+                continue
+            chunks.append(body)
+            appids.append(app_id)
+            manifest[app_id] = (end, mtime, crc)
+
+        removed = state.index.difference(pd.Index(
+            [int(name.replace('.csv', '')) for name in os.listdir(price_dir) if name.endswith('.csv')]
+        ))
+        state = state.drop(index=removed.union(pd.Index(resets)).intersection(state.index))
+        runs = self.runs[self.runs['appid'].isin(state.index)]
+
+        rows = _clean_new_rows(chunks, appids, encoding)
+
+        # Datas anteriores à última já processada exigem recomputar o app inteiro
+        last_date = state['last_date'].reindex(rows['appid']).to_numpy()
+        out_of_order = np.unique(rows['appid'].to_numpy()[day_numbers(rows['Date']) <= last_date])
+        if len(out_of_order):
+            state = state.drop(index=out_of_order)
+            runs = runs[~runs['appid'].isin(out_of_order)]
+            rows = rows[~rows['appid'].isin(out_of_order)]
+            full_chunks = []
+            for app_id in out_of_order:
+                path = os.path.join(price_dir, f'{app_id}.csv')
+                body, end, crc = _read_new_rows(path, 0, os.path.getsize(path), None, encoding)
+                manifest[app_id] = (end, manifest[app_id][1], crc)
+                full_chunks.append(body)
+            rows = pd.concat([rows, _clean_new_rows(full_chunks, list(out_of_order), encoding)])
+            rows = rows.sort_values(['appid', 'Date'], kind='stable')
+
+        context = _clean_new_rows(context_chunks, context_appids, encoding)
+        context = context[context['appid'].isin(state.index)]
+        batch = _batch_aggregates(rows, state, context)
+        self.aggregates = _merge_aggregates(state, batch)
+        # Trechos novos só se somam aos antigos (um trecho cortado entre lotes conta os mesmos dias)
+        new_runs = discount_runs(rows['appid'], day_numbers(rows['Date']), rows['Discount'])
+        self.runs = pd.concat([runs, new_runs.astype(np.float64)], ignore_index=True)
+
+        # Manifesto: posição em bytes de todos os arquivos lidos, mesmo sem linhas válidas
+        manifest = pd.DataFrame(
+            list(manifest.values()), index=list(manifest), columns=['byte_offset', 'file_mtime', 'tail_crc'],
+            dtype=np.float64,
+        )
+        manifest = manifest[manifest.index.isin(self.aggregates.index)]
+        self.aggregates.loc[manifest.index, manifest.columns] = manifest.to_numpy()
+        return {
+            'new_rows': len(rows),
+            'updated_apps': int(rows['appid'].nunique()),
+            'reset_apps': len(set(resets) | set(out_of_order)),
+            'removed_apps': len(removed),
+        }
+
+    def features(self, app_info, min_rows=10):
+        """Montar as features de engineered_features.csv a partir dos agregados"""
+        agg = self.aggregates
+        agg = agg[agg['n_rows'] > min_rows]
+        n = agg['n_rows']
+        discount_days = agg['discount_days']
+
+        month_sum = agg[[f'month_sum_{m:02d}' for m in MONTHS]].to_numpy()
+        month_count = agg[[f'month_count_{m:02d}' for m in MONTHS]].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            monthly = np.where(month_count > 0, month_sum / month_count, np.nan)
+        months = np.asarray(MONTHS)
+        # Todo app com mais de min_rows linhas tem ao menos um mês observado;
+        # nanargmax/nanargmin devolvem a primeira ocorrência, como idxmax/idxmin
+        best_month = months[np.nanargmax(monthly, axis=1)] if len(agg) else months[:0]
+        worst_month = months[np.nanargmin(monthly, axis=1)] if len(agg) else months[:0]
+        seasonal = np.zeros(len(agg))
+        several_months = (month_count > 0).sum(axis=1) > 1
+        seasonal[several_months] = np.nanvar(monthly[several_months], axis=1, ddof=1)
+
+        time_m2 = n * (n ** 2 - 1) / 12
+        with np.errstate(divide='ignore', invalid='ignore'):
+            trend = agg['comoment_initial'] / np.sqrt(time_m2 * agg['m2_initial'])
+        constant = (agg['min_initial'] == agg['max_initial']) | (n < 2) | ~np.isfinite(trend)
+        trend = trend.where(~constant, 0).clip(-1, 1)
+
+        stats = pd.DataFrame({
+            'avg_initial_price': agg['sum_initial'] / n,
+            'min_initial_price': agg['min_initial'],
+            'max_initial_price': agg['max_initial'],
+            'price_volatility': np.sqrt(agg['m2_initial'] / (n - 1)),
+
+            'avg_final_price': agg['sum_final'] / n,
+            'min_final_price': agg['min_final'],
+            'max_final_price': agg['max_final'],
+
+            'avg_discount': agg['sum_discount'] / n,
+            'max_discount': agg['max_discount'].astype(np.int64),
+            'discount_frequency': discount_days / n,
+            'total_discount_days': discount_days.astype(np.int64),
+
+            'total_observation_days': n.astype(np.int64),
+            'price_trend': trend,
+            'seasonal_discount_pattern': seasonal,
+
+            'best_discount_month': best_month,
+            'worst_discount_month': worst_month,
+
+            'max_savings': agg['max_savings'],
+            'avg_savings_when_discounted': (agg['sum_savings_discounted'] / discount_days).where(discount_days > 0, 0),
+        }, index=agg.index)
+        # Meses sem coleta: desconto médio do app, como em compute_price_features
+        monthly = np.where(month_count > 0, monthly, stats['avg_discount'].to_numpy()[:, None])
+        stats = stats.join(pd.DataFrame(monthly, index=agg.index, columns=MONTHLY_DISCOUNT_COLUMNS))
+        stats = stats.join(finalize_sequence_features(agg, agg[ROLLING_COLUMNS], discount_days))
+        features = join_app_metadata(stats, app_info)
+
+        # Promoções gerais detectadas com os mesmos apps do modo em lote
+        runs = self.runs[self.runs['appid'].isin(agg.index)]
+        sales = detect_storewide_sales(runs)
+        return features.join(storewide_sale_features(runs, sales), on='app_id')
+
+
+def _read_new_rows(file_path, start, size, tail_crc, encoding):
+    """Ler o trecho do CSV a partir de ``start`` até a última quebra de linha.
+
+    Retorna ``(conteúdo, nova posição, CRC do novo fim)``; ``conteúdo`` é None
+    se o trecho já processado não confere com ``tail_crc`` ou se o cabeçalho
+    for inesperado.
+    """
+    with open(file_path, 'rb') as f:
+        if start == 0:
+            header = f.readline()
+            if header.decode(encoding).strip().split(',') != PRICE_COLUMNS:
+                return None, 0, None
+            tail = header
+            start = len(header)
+        else:
+            if start > size:
+                return None, 0, None
+            f.seek(max(0, start - TAIL_BYTES))
+            tail = f.read(start - f.tell())
+            if zlib.crc32(tail) != tail_crc:
+                return None, 0, None
+        body = f.read(size - start)
+    # Uma linha ainda sendo escrita fica para a próxima atualização
+    body = body[:body.rfind(b'\n') + 1]
+    new_tail = body[-TAIL_BYTES:] if len(body) >= TAIL_BYTES else (tail + body)[-TAIL_BYTES:]
+    return body, start + len(body), zlib.crc32(new_tail)
+
+
+def _read_context_rows(file_path, start):
+    """Linhas completas imediatamente anteriores a ``start``.
+
+    Cada data tem no máximo uma linha, então as últimas max(ROLLING_WINDOWS)
+    linhas cobrem as janelas das mínimas móveis; o trecho lido dobra até
+    conter essas linhas ou chegar ao cabeçalho.
+    """
+    size = CONTEXT_BYTES
+    with open(file_path, 'rb') as f:
+        while True:
+            position = max(0, start - size)
+            f.seek(position)
+            data = f.read(start - position)
+            if position == 0 or data.count(b'\n') > max(ROLLING_WINDOWS):
+                break
+            size *= 2
+    # Descartar o cabeçalho ou a linha cortada no início do trecho
+    return data[data.find(b'\n') + 1:]
+
+
+def _clean_new_rows(chunks, appids, encoding):
+    """Linhas novas tipadas, sem valores ausentes, ordenadas por (appid, Date)"""
+    if not chunks:
+        return pd.DataFrame({
+            'appid': pd.Series(dtype=np.int64), 'Date': pd.Series(dtype='datetime64[ns]'),
+            'Initialprice': pd.Series(dtype=np.float64), 'Finalprice': pd.Series(dtype=np.float64),
+            'Discount': pd.Series(dtype=np.float64),
+        })
+    rows = parse_price_rows(chunks, appids, encoding=encoding)
+    rows['Date'] = pd.to_datetime(rows['Date'], errors='coerce')
+    rows = rows.dropna()
+    return rows.sort_values(['appid', 'Date'], kind='stable')
+
+
+def _batch_aggregates(rows, state, context):
+    """Agregados por app das linhas de um lote (posições relativas ao lote).
+
+    ``state`` fornece o estado final de cada app para continuar as features
+    sequenciais; ``context`` traz linhas já processadas, usadas só nas
+    mínimas móveis.
+    """
+    if rows.empty:
+        return IncrementalFeatureState().aggregates.drop(columns=['byte_offset', 'file_mtime', 'tail_crc'])
+    appid = rows['appid']
+    grouped = rows.groupby('appid', sort=True)
+    initial = rows['Initialprice'].astype(np.float64)
+    discount = rows['Discount'].astype(np.float64)
+    discounted = discount > 0
+    savings = initial - rows['Finalprice']
+    month = rows['Date'].dt.month
+
+    n = grouped.size().astype(np.float64)
+    mean_initial = grouped['Initialprice'].transform('mean')
+    centered_initial = initial - mean_initial
+    centered_time = grouped.cumcount() - (grouped['Initialprice'].transform('size') - 1) / 2
+
+    batch = pd.DataFrame({
+        'n_rows': n,
+        'sum_initial': initial.groupby(appid).sum(),
+        'sum_final': grouped['Finalprice'].sum(),
+        'sum_discount': discount.groupby(appid).sum(),
+        'discount_days': discounted.groupby(appid).sum(),
+        'sum_savings_discounted': savings.where(discounted, 0).groupby(appid).sum(),
+        'min_initial': grouped['Initialprice'].min(),
+        'min_final': grouped['Finalprice'].min(),
+        'max_initial': grouped['Initialprice'].max(),
+        'max_final': grouped['Finalprice'].max(),
+        'max_discount': discount.groupby(appid).max(),
+        'max_savings': savings.groupby(appid).max(),
+        'm2_initial': (centered_initial ** 2).groupby(appid).sum(),
+        'comoment_initial': (centered_time * centered_initial).groupby(appid).sum(),
+        'last_date': pd.Series(day_numbers(rows['Date']), index=rows.index).groupby(appid).max(),
+    }).astype(np.float64)
+
+    by_month = pd.DataFrame({'appid': appid, 'month': month, 'Discount': discount})
+    by_month = by_month.groupby(['appid', 'month'])['Discount'].agg(['sum', 'count']).unstack('month')
+    for m in MONTHS:
+        for how in ('sum', 'count'):
+            column = by_month[(how, m)] if (how, m) in by_month.columns else 0
+            batch[f'month_{how}_{m:02d}'] = pd.Series(column, index=by_month.index).reindex(batch.index).fillna(0)
+
+    # Features sequenciais continuando do estado salvo de cada app
+    app_index = np.searchsorted(batch.index, appid.to_numpy())
+    carry = state.reindex(batch.index)
+    sequence = sequence_aggregates(
+        app_index, len(batch), day_numbers(rows['Date']), initial.to_numpy(), discounted.to_numpy(),
+        carry=carry[SEQUENCE_CARRY_COLUMNS].reset_index(drop=True),
+    )
+    sequence.index = batch.index
+    for column in SEQUENCE_ADDITIVE_COLUMNS + CARRY_COLUMNS:
+        batch[column] = sequence[column]
+
+    recent = pd.concat([context[context['appid'].isin(batch.index)], rows])
+    recent = recent.sort_values(['appid', 'Date'], kind='stable')
+    rolling = rolling_min_prices(
+        np.searchsorted(batch.index, recent['appid'].to_numpy()), len(batch),
+        day_numbers(recent['Date']), recent['Finalprice'].to_numpy(dtype=np.float64),
+    )
+    rolling.index = batch.index
+    return batch.join(rolling)
+
+
+def _merge_aggregates(state, batch):
+    """Combinar agregados existentes (a) com os de um lote posterior (b)"""
+    index = state.index.union(batch.index)
+    a = state.reindex(index)
+    b = batch.reindex(index)
+    n_a = a['n_rows'].fillna(0)
+    n_b = b['n_rows'].fillna(0)
+    n = n_a + n_b
+
+    merged = pd.DataFrame(index=index)
+    for column in ADDITIVE_COLUMNS + SEQUENCE_ADDITIVE_COLUMNS:
+        merged[column] = a[column].fillna(0) + b[column].fillna(0)
+    for column in MIN_COLUMNS:
+        merged[column] = np.fmin(a[column], b[column])
+    for column in MAX_COLUMNS:
+        merged[column] = np.fmax(a[column], b[column])
+
+    # Fórmula de Chan; as posições do lote começam em n_a, logo a distância
+    # entre as posições médias dos dois trechos é n / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = (n_a * n_b / n).fillna(0)
+        delta = (b['sum_initial'] / n_b - a['sum_initial'] / n_a).fillna(0)
+    merged['m2_initial'] = a['m2_initial'].fillna(0) + b['m2_initial'].fillna(0) + delta ** 2 * weight
+    merged['comoment_initial'] = (
+        a['comoment_initial'].fillna(0) + b['comoment_initial'].fillna(0) + (n / 2) * delta * weight
+    )
+
+    in_batch = index.isin(batch.index)
+    for column in CARRY_COLUMNS + ROLLING_COLUMNS:
+        merged[column] = b[column].where(in_batch, a[column])
+
+    merged['last_date'] = np.fmax(a['last_date'], b['last_date'])
+    for column in ['byte_offset', 'file_mtime', 'tail_crc']:
+        merged[column] = a[column]
+    return merged
@@ -0,0 +1,192 @@
+from concurrent.futures import ProcessPoolExecutor
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore
+
+# Alinhamento de cada array dentro do bloco de memória compartilhada
+ALIGNMENT = 64
+# Em Linux, /dev/shm mantém os blocos em RAM
+SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+# Fragmentos por worker, para equilibrar apps com históricos de tamanhos diferentes
+SHARDS_PER_WORKER = 4
+# Arquivo vazio criado por cada worker no diretório compartilhado: worker-<pid>
+WORKER_PREFIX = 'worker-'
+
+
+class ShardedExecutor:
+    """Pool de processos que divide o trabalho por apps e junta o resultado em ordem.
+
+    Os arrays do PriceStore trafegam entre processos por memória compartilhada
+    (arquivos mapeados em memória, em /dev/shm quando disponível); só
+    parâmetros pequenos e DataFrames de resultado passam por pickle. Como
+    cada app é processado de forma independente e os fragmentos são juntados
+    na ordem dos appids, o resultado não depende do número de workers.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._directory = tempfile.mkdtemp(prefix='pryzor-', dir=SHARED_DIR)
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=_register_worker,
+                                         initargs=(self._directory,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._pool.shutdown()
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    def pids(self):
+        """PIDs dos workers já iniciados (o pool os cria sob demanda)"""
+        return sorted(int(name[len(WORKER_PREFIX):]) for name in os.listdir(self._directory)
+                      if name.startswith(WORKER_PREFIX))
+
+    def submit(self, func, *args, **kwargs):
+        """Executar ``func`` em um dos workers; retorna um Future"""
+        return self._pool.submit(func, *args, **kwargs)
+
+    def read_csv_files(self, file_paths):
+        """PriceStore.read_csv_files com os arquivos divididos entre os workers"""
+        file_paths = list(file_paths)
+        n_shards = min(len(file_paths), self.workers * SHARDS_PER_WORKER) or 1
+        shards = [chunk.tolist() for chunk in np.array_split(np.asarray(file_paths, dtype=object), n_shards)]
+        descriptors = list(self._pool.map(_read_shard, shards, [self._directory] * len(shards)))
+        return PriceStore.concat([_import_store(descriptor) for descriptor in descriptors])
+
+    def map_store(self, func, store, **shared):
+        """Aplicar ``func`` a fragmentos de apps do store.
+
+        ``func`` recebe um PriceStore (e os argumentos ``shared``) e devolve
+        um PriceStore ou um DataFrame; os resultados são concatenados na ordem
+        dos fragmentos. ``shared`` são argumentos iguais para todos os
+        fragmentos (ex.: app_info): serializados uma vez em um arquivo do
+        diretório compartilhado e lidos uma vez por worker, em vez de irem
+        junto com cada tarefa.
+        """
+        if not store.n_apps:
+            return func(store, **shared)
+        descriptor = _export_store(store, self._directory)
+        shared_path = _export_object(shared, self._directory)
+        try:
+            bounds = _shard_bounds(store, self.workers * SHARDS_PER_WORKER)
+            tasks = [
+                self._pool.submit(_map_shard, descriptor, start, stop, func, self._directory, shared_path)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            ]
+            results = [task.result() for task in tasks]
+        finally:
+            _release(descriptor)
+            _release({'path': shared_path})
+        if isinstance(results[0], dict):
+            return PriceStore.concat([_import_store(result) for result in results])
+        return pd.concat(results, ignore_index=True)
+
+
+def _shard_bounds(store, n_shards):
+    """Limites (em índices de app) de fragmentos com número parecido de linhas"""
+    targets = np.linspace(0, len(store), min(n_shards, store.n_apps) + 1)
+    bounds = np.searchsorted(store.offsets, targets)
+    bounds[0], bounds[-1] = 0, store.n_apps
+    return np.unique(bounds)
+
+
+def _read_shard(file_paths, directory):
+    return _export_store(PriceStore.read_csv_files(file_paths), directory)
+
+
+def _map_shard(descriptor, start, stop, func, directory, shared_path):
+    arrays = _attach(descriptor)
+    result = func(_view_store(arrays, start, stop), **_load_object(shared_path))
+    if isinstance(result, PriceStore):
+        return _export_store(result, directory)
+    # Desvincular o resultado do arquivo mapeado antes de devolvê-lo
+    return result.copy(deep=True)
+
+
+def _register_worker(directory):
+    """Inicializador do pool: anunciar o PID do worker no diretório compartilhado"""
+    open(os.path.join(directory, f'{WORKER_PREFIX}{os.getpid()}'), 'w').close()
+
+
+# Último objeto lido por _load_object neste worker (um map_store por vez)
+_loaded_object = (None, None)
+
+
+def _export_object(value, directory):
+    """Gravar ``value`` com pickle no diretório compartilhado; retorna o caminho"""
+    fd, path = tempfile.mkstemp(suffix='.pkl', dir=directory)
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _load_object(path):
+    """Objeto gravado por _export_object, lido só na primeira tarefa do worker"""
+    global _loaded_object
+    if _loaded_object[0] != path:
+        with open(path, 'rb') as f:
+            _loaded_object = (path, pickle.load(f))
+    return _loaded_object[1]
+
+
+def _view_store(arrays, start, stop):
+    """PriceStore sem cópia com os apps ``start:stop`` dos arrays compartilhados"""
+    offsets = arrays['offsets'][start:stop + 1]
+    rows = slice(int(offsets[0]), int(offsets[-1]))
+    columns = {name[4:]: values[rows] for name, values in arrays.items() if name.startswith('col_')}
+    return PriceStore(arrays['appids'][start:stop], offsets - offsets[0], columns)
+
+
+def _export_store(store, directory):
+    """Copiar os arrays do store para um novo bloco de memória compartilhada"""
+    arrays = {'appids': store.appids, 'offsets': store.offsets}
+    arrays.update({'col_' + name: np.asarray(values) for name, values in store.columns.items()})
+
+    layout = []
+    size = 0
+    for name, values in arrays.items():
+        layout.append((name, values.dtype.str, values.shape, size))
+        size += -(-values.nbytes // ALIGNMENT) * ALIGNMENT
+
+    fd, path = tempfile.mkstemp(suffix='.bin', dir=directory)
+    os.close(fd)
+    block = np.memmap(path, dtype=np.uint8, mode='w+', shape=max(size, 1))
+    for name, dtype, shape, offset in layout:
+        np.ndarray(shape, dtype=dtype, buffer=block, offset=offset)[...] = arrays[name]
+    block.flush()
+    del block
+    return {'path': path, 'layout': layout}
+
+
+def _attach(descriptor):
+    """Views (sem cópia) dos arrays de um bloco compartilhado"""
+    block = np.memmap(descriptor['path'], dtype=np.uint8, mode='r')
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=block, offset=offset)
+        for name, dtype, shape, offset in descriptor['layout']
+    }
+
+
+def _import_store(descriptor):
+    """Copiar um store do bloco compartilhado para a memória do processo e liberar o bloco"""
+    arrays = {name: values.copy() for name, values in _attach(descriptor).items()}
+    _release(descriptor)
+    columns = {name[4:]: values for name, values in arrays.items() if name.startswith('col_')}
+    return PriceStore(arrays['appids'], arrays['offsets'], columns)
+
+
+def _release(descriptor):
+    try:
+        os.remove(descriptor['path'])
+    except OSError:
+        # No Windows o arquivo ainda mapeado é removido junto com o diretório em close()
+        pass
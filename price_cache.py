@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from price_store import PriceStore
+
+CACHE_DIRNAME = '.price_cache'
+CACHE_VERSION = 2
+MANIFEST_NAME = 'manifest.json'
+
+
+def default_cache_dir(price_dir):
+    """Diretório do cache, ao lado de PriceHistory/"""
+    return os.path.join(os.path.dirname(os.path.abspath(price_dir)), CACHE_DIRNAME)
+
+
+def file_digest(file_path):
+    """Hash do conteúdo de um arquivo"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_price_store(price_dir, cache_dir=None, read_csv_files=PriceStore.read_csv_files, file_names=None):
+    """Carregar PriceHistory/ a partir do cache binário, reprocessando só o que mudou.
+
+    Um arquivo é considerado inalterado quando tamanho e mtime coincidem com
+    o manifesto; se só o mtime mudou, o hash do conteúdo decide. Os arrays são
+    abertos com memory mapping (sem cópia). ``read_csv_files`` permite trocar
+    o leitor dos arquivos alterados (ex.: pelo do pool de processos).
+    ``file_names`` (ex.: uma amostra) restringe a verificação, o parser e o
+    store devolvido a esses arquivos; os demais ficam no cache como estão.
+    Retorna ``(store, stats)``.
+    """
+    cache_dir = cache_dir or default_cache_dir(price_dir)
+    manifest = _read_manifest(cache_dir)
+    cached_files = manifest['files'] if manifest else {}
+
+    if file_names is None:
+        file_names = sorted(entry.name for entry in os.scandir(price_dir)
+                            if entry.name.endswith('.csv') and entry.is_file())
+        kept_files = {}
+        selected = None
+    else:
+        selected = set(file_names)
+        kept_files = {name: info for name, info in cached_files.items() if name not in selected}
+
+    current_files = {}
+    changed = []
+    for name in file_names:
+        path = os.path.join(price_dir, name)
+        stat = os.stat(path)
+        info = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        previous = cached_files.get(name)
+        if previous is not None and previous['size'] == info['size']:
+            if previous['mtime_ns'] == info['mtime_ns']:
+                current_files[name] = previous
+                continue
+            # Mtime diferente: o conteúdo pode ser o mesmo (ex.: arquivo copiado)
+            info['sha1'] = file_digest(path)
+            if info['sha1'] == previous['sha1']:
+                current_files[name] = info
+                continue
+        info.setdefault('sha1', file_digest(path))
+        current_files[name] = info
+        changed.append(name)
+
+    removed = [name for name in cached_files if name not in current_files and name not in kept_files]
+    stats = {
+        'parsed_files': len(changed),
+        'cached_files': len(current_files) - len(changed),
+        'removed_files': len(removed),
+    }
+    all_files = dict(kept_files, **current_files)
+
+    if manifest and not changed and not removed:
+        if all_files != cached_files:
+            # Apenas mtimes atualizados
+            _write_manifest(cache_dir, dict(manifest, files=all_files))
+        return _select_files(_open_store(cache_dir, manifest), selected), stats
+
+    stores = []
+    if manifest:
+        stale = {_file_appid(name) for name in changed + removed}
+        cached = _open_store(cache_dir, manifest)
+        stores.append(cached.select_apps(~np.isin(cached.appids, list(stale))))
+    stores.append(read_csv_files([os.path.join(price_dir, name) for name in changed]))
+
+    store = PriceStore.concat(stores)
+    manifest = _write_store(cache_dir, store, all_files)
+    return _select_files(_open_store(cache_dir, manifest), selected), stats
+
+
+def _select_files(store, file_names):
+    """Apps dos arquivos em ``file_names`` (todos se None)"""
+    if file_names is None:
+        return store
+    return store.select_apps(np.isin(store.appids, [_file_appid(name) for name in file_names]))
+
+
+def _file_appid(file_name):
+    return int(file_name.replace('.csv', ''))
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != CACHE_VERSION:
+        return None
+    if not os.path.isdir(os.path.join(cache_dir, manifest.get('generation', ''))):
+        return None
+    return manifest
+
+
+def _write_manifest(cache_dir, manifest):
+    tmp_path = os.path.join(cache_dir, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(cache_dir, MANIFEST_NAME))
+
+
+def _open_store(cache_dir, manifest):
+    generation_dir = os.path.join(cache_dir, manifest['generation'])
+
+    def load(name):
+        return np.load(os.path.join(generation_dir, name + '.npy'), mmap_mode='r')
+
+    columns = {name: load('col_' + name) for name in manifest['columns']}
+    return PriceStore(load('appids'), load('offsets'), columns)
+
+
+def _write_store(cache_dir, store, files):
+    """Gravar uma nova geração do cache e trocar o manifesto de forma atômica"""
+    os.makedirs(cache_dir, exist_ok=True)
+    generation = uuid.uuid4().hex
+    generation_dir = os.path.join(cache_dir, generation)
+    os.makedirs(generation_dir)
+
+    np.save(os.path.join(generation_dir, 'appids.npy'), store.appids)
+    np.save(os.path.join(generation_dir, 'offsets.npy'), store.offsets)
+    for name, values in store.columns.items():
+        np.save(os.path.join(generation_dir, 'col_' + name + '.npy'), values)
+
+    manifest = {
+        'version': CACHE_VERSION,
+        'generation': generation,
+        'columns': list(store.columns),
+        'files': files,
+    }
+    _write_manifest(cache_dir, manifest)
+
+    # Remover gerações antigas (no Windows, arquivos ainda mapeados ficam para a próxima vez)
+    for entry in os.scandir(cache_dir):
+        if entry.is_dir() and entry.name != generation:
+            shutil.rmtree(entry.path, ignore_errors=True)
+    return manifest
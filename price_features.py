@@ -0,0 +1,300 @@
+import numpy as np
+import pandas as pd
+
+from compact_types import widen_prices
+
+# Desconto médio de cada mês do ano (NaN nos meses sem observação)
+MONTHLY_DISCOUNT_COLUMNS = [f'avg_discount_month_{m:02d}' for m in range(1, 13)]
+
+# Ordem das colunas de engineered_features.csv
+FEATURE_COLUMNS = [
+    'app_id', 'game_name', 'game_type', 'is_free_to_play', 'release_year',
+    'avg_initial_price', 'min_initial_price', 'max_initial_price', 'price_volatility',
+    'avg_final_price', 'min_final_price', 'max_final_price',
+    'avg_discount', 'max_discount', 'discount_frequency', 'total_discount_days',
+    'total_observation_days', 'price_trend', 'seasonal_discount_pattern',
+    'best_discount_month', 'worst_discount_month',
+    'max_savings', 'avg_savings_when_discounted',
+    'discount_episode_count', 'avg_discount_episode_length', 'max_discount_episode_length',
+    'days_since_last_discount', 'min_price_last_30_days', 'min_price_last_90_days',
+    'price_hike_count', 'avg_days_hike_to_discount',
+] + MONTHLY_DISCOUNT_COLUMNS
+
+# Janelas (em dias, terminando na última observação) das mínimas móveis de Finalprice
+ROLLING_WINDOWS = (30, 90)
+
+# Agregados sequenciais que se combinam somando entre trechos consecutivos
+SEQUENCE_ADDITIVE_COLUMNS = ['episode_count', 'price_hike_count', 'hike_gap_sum', 'hike_gap_count']
+# Estado ao fim do trecho, já combinado com o trecho anterior (``carry``)
+SEQUENCE_CARRY_COLUMNS = [
+    'max_episode_length', 'trailing_run', 'last_initial',
+    'pending_hike_count', 'pending_hike_date_sum',
+    'first_date', 'last_date', 'last_discount_date',
+]
+
+
+def compute_price_features(store, app_info):
+    """Calcular as features de preço de todos os apps de uma vez.
+
+    ``store`` deve ter passado por data_transformation (colunas 'month' e
+    'savings_amount'); ``app_info`` precisa da coluna 'release_year'. Apps sem
+    linha em app_info são descartados, como no cálculo app a app.
+    """
+    frame = store.to_frame()
+    # Preços float32 do store voltam a float64 (em centavos) antes de agregar
+    for name in ('Initialprice', 'Finalprice', 'savings_amount'):
+        frame[name] = widen_prices(frame[name].to_numpy())
+    grouped = frame.groupby('appid', sort=True)
+    discounted = frame['Discount'] > 0
+    discounted_by_app = discounted.groupby(frame['appid'], sort=True)
+
+    stats = pd.DataFrame({
+        # Estatísticas de preço
+        'avg_initial_price': grouped['Initialprice'].mean(),
+        'min_initial_price': grouped['Initialprice'].min(),
+        'max_initial_price': grouped['Initialprice'].max(),
+        'price_volatility': grouped['Initialprice'].std(),
+
+        'avg_final_price': grouped['Finalprice'].mean(),
+        'min_final_price': grouped['Finalprice'].min(),
+        'max_final_price': grouped['Finalprice'].max(),
+
+        # Estatísticas de desconto
+        'avg_discount': grouped['Discount'].mean(),
+        'max_discount': grouped['Discount'].max(),
+        'discount_frequency': discounted_by_app.mean(),
+        'total_discount_days': discounted_by_app.sum(),
+
+        # Características temporais
+        'total_observation_days': grouped.size(),
+    })
+    stats['price_trend'] = grouped_price_trend(store)
+
+    # Médias mensais de desconto: um único groupby para sazonalidade e melhores meses
+    monthly = frame.groupby(['appid', 'month'], sort=True)['Discount'].mean()
+    stats['seasonal_discount_pattern'] = monthly.groupby(level='appid').var().fillna(0)
+    stats['best_discount_month'] = _first_month_where(monthly, 'max')
+    stats['worst_discount_month'] = _first_month_where(monthly, 'min')
+    # Meses sem coleta ficam com o desconto médio do próprio app: 0 se
+    # confundiria com "observado, sem desconto"
+    monthly_columns = monthly.unstack('month').reindex(columns=range(1, 13)).set_axis(MONTHLY_DISCOUNT_COLUMNS, axis=1)
+    stats = stats.join(monthly_columns.mask(monthly_columns.isna(), stats['avg_discount'], axis=0))
+
+    # Economia potencial
+    stats['max_savings'] = grouped['savings_amount'].max()
+    stats['avg_savings_when_discounted'] = (
+        frame.loc[discounted].groupby('appid')['savings_amount'].mean()
+        .reindex(stats.index).fillna(0)
+    )
+
+    # Features sequenciais: episódios de desconto, dias desde a última
+    # promoção, mínimas móveis e intervalo entre aumento de preço e desconto
+    app_index = np.repeat(np.arange(store.n_apps), store.counts())
+    dates = store.columns['Date']
+    sequence = sequence_aggregates(
+        app_index, store.n_apps, dates, frame['Initialprice'].to_numpy(), discounted.to_numpy()
+    )
+    rolling = rolling_min_prices(app_index, store.n_apps, dates, frame['Finalprice'].to_numpy())
+    sequence.index = rolling.index = stats.index
+    stats = stats.join(finalize_sequence_features(sequence, rolling, stats['total_discount_days']))
+
+    return join_app_metadata(stats, app_info)
+
+
+def join_app_metadata(stats, app_info):
+    """Juntar estatísticas indexadas por appid aos metadados do jogo.
+
+    Usa um índice por appid em vez de filtrar app_info a cada app; apps sem
+    metadados são descartados. Retorna as colunas na ordem de FEATURE_COLUMNS.
+    """
+    metadata = app_info.drop_duplicates(subset=['appid']).set_index('appid')
+    metadata = metadata[['name', 'type', 'freetoplay', 'release_year']].rename(columns={
+        'name': 'game_name',
+        'type': 'game_type',
+        'freetoplay': 'is_free_to_play',
+    })
+    stats = stats[stats.index.isin(metadata.index)]
+    features = pd.concat([metadata.reindex(stats.index), stats], axis=1)
+    features.index.name = 'app_id'
+    features = features.reset_index()
+
+    return features[FEATURE_COLUMNS]
+
+
+def grouped_price_trend(store):
+    """Correlação entre posição temporal e Initialprice para cada app (0 se indefinida)"""
+    counts = store.counts()
+    if not len(counts):
+        return pd.Series(dtype=np.float64)
+    prices = widen_prices(store.columns['Initialprice'])
+    app_index = np.repeat(np.arange(store.n_apps), counts)
+
+    # Posição de cada linha dentro do seu app (o store já está ordenado por data)
+    position = np.arange(len(prices)) - np.repeat(store.offsets[:-1], counts)
+    centered_time = position - np.repeat((counts - 1) / 2, counts)
+
+    price_mean = np.bincount(app_index, weights=prices) / counts
+    centered_price = prices - price_mean[app_index]
+
+    covariance = np.bincount(app_index, weights=centered_time * centered_price)
+    time_variance = counts * (counts ** 2 - 1) / 12
+    price_variance = np.bincount(app_index, weights=centered_price ** 2)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trend = covariance / np.sqrt(time_variance * price_variance)
+
+    # Preço constante ou menos de duas observações: sem tendência
+    price_min = np.minimum.reduceat(prices, store.offsets[:-1])
+    price_max = np.maximum.reduceat(prices, store.offsets[:-1])
+    trend[(price_min == price_max) | (counts < 2) | ~np.isfinite(trend)] = 0
+    return pd.Series(np.clip(trend, -1, 1), index=pd.Index(store.appids, name='appid'))
+
+
+def sequence_aggregates(app_index, n_apps, dates, initial, discounted, carry=None):
+    """Agregados das features sequenciais de todos os apps, em O(linhas).
+
+    Os arrays por linha devem estar ordenados por (app, data), com
+    ``app_index`` entre 0 e ``n_apps - 1``. ``carry`` (opcional, uma linha por
+    app) traz as colunas SEQUENCE_CARRY_COLUMNS do trecho anterior do mesmo
+    histórico, permitindo processar só as linhas novas: um episódio de
+    desconto em andamento continua e aumentos pendentes podem ser resolvidos.
+    Retorna um DataFrame posicional com SEQUENCE_ADDITIVE_COLUMNS (apenas do
+    trecho) e SEQUENCE_CARRY_COLUMNS (acumuladas).
+    """
+    dates = np.asarray(dates, dtype=np.int64)
+    initial = np.asarray(initial, dtype=np.float64)
+    discounted = np.asarray(discounted, dtype=bool)
+    if carry is None:
+        carry = pd.DataFrame(np.nan, index=range(n_apps), columns=SEQUENCE_CARRY_COLUMNS)
+    carry_trailing = carry['trailing_run'].fillna(0).to_numpy()
+
+    first_row = np.ones(len(app_index), dtype=bool)
+    first_row[1:] = app_index[1:] != app_index[:-1]
+    last_row = np.roll(first_row, -1)
+    first_apps = app_index[first_row]
+
+    # Valores da linha anterior do mesmo app (ou do trecho anterior)
+    previous_discounted = np.roll(discounted, 1)
+    previous_discounted[first_row] = carry_trailing[first_apps] > 0
+    previous_initial = np.roll(initial, 1)
+    previous_initial[first_row] = carry['last_initial'].to_numpy()[first_apps]
+
+    # Codificação run-length de has_discount, segmentada por app
+    boundary = first_row | (discounted != np.roll(discounted, 1))
+    run_id = np.cumsum(boundary) - 1
+    run_length = np.bincount(run_id).astype(np.float64)
+    run_app = app_index[boundary]
+    run_flag = discounted[boundary]
+    continuing = first_row[boundary] & run_flag & (carry_trailing[run_app] > 0)
+    run_length[continuing] += carry_trailing[run_app[continuing]]
+    new_episode = run_flag & ~continuing
+
+    episode_count = _app_sums(run_app, new_episode, n_apps)
+    max_episode = carry['max_episode_length'].to_numpy(dtype=np.float64).copy()
+    np.fmax.at(max_episode, run_app[run_flag], run_length[run_flag])
+    last_run = np.append(run_app[1:] != run_app[:-1], True) if len(run_app) else run_flag
+    trailing_run = carry_trailing.copy()
+    trailing_run[run_app[last_run]] = np.where(run_flag[last_run], run_length[last_run], 0)
+
+    # Aumentos de Initialprice e o próximo início de episódio de desconto:
+    # mínimo acumulado reverso de (app, data) dos inícios, segmentado pelo app
+    hike = initial > previous_initial
+    episode_start = np.zeros(len(app_index), dtype=bool)
+    episode_start[np.flatnonzero(boundary)[new_episode]] = True
+    key_base = app_index.astype(np.int64) << 32
+    keys = np.where(episode_start, key_base + dates, np.iinfo(np.int64).max)
+    next_key = np.minimum.accumulate(keys[::-1])[::-1]
+    has_next = (next_key >> 32) == app_index
+    gap = (next_key - key_base - dates).astype(np.float64)
+
+    resolved = hike & has_next
+    pending = hike & ~has_next
+    hike_gap_sum = _app_sums(app_index, np.where(resolved, gap, 0), n_apps)
+    hike_gap_count = _app_sums(app_index, resolved, n_apps)
+    pending_count = _app_sums(app_index, pending, n_apps)
+    pending_date_sum = _app_sums(app_index, np.where(pending, dates, 0), n_apps)
+
+    # Aumentos pendentes do trecho anterior terminam no primeiro início deste trecho
+    carry_pending = carry['pending_hike_count'].fillna(0).to_numpy()
+    carry_pending_dates = carry['pending_hike_date_sum'].fillna(0).to_numpy()
+    first_start = np.full(n_apps, np.nan)
+    starts_at_first = has_next[first_row]
+    first_start[first_apps[starts_at_first]] = (next_key - key_base)[first_row][starts_at_first]
+    resolves = ~np.isnan(first_start)
+    hike_gap_sum[resolves] += carry_pending[resolves] * first_start[resolves] - carry_pending_dates[resolves]
+    hike_gap_count[resolves] += carry_pending[resolves]
+    pending_count[~resolves] += carry_pending[~resolves]
+    pending_date_sum[~resolves] += carry_pending_dates[~resolves]
+
+    last_initial = carry['last_initial'].to_numpy(dtype=np.float64).copy()
+    last_initial[app_index[last_row]] = initial[last_row]
+    first_date = carry['first_date'].to_numpy(dtype=np.float64).copy()
+    np.fmin.at(first_date, app_index, dates)
+    last_date = carry['last_date'].to_numpy(dtype=np.float64).copy()
+    np.fmax.at(last_date, app_index, dates)
+    last_discount_date = carry['last_discount_date'].to_numpy(dtype=np.float64).copy()
+    np.fmax.at(last_discount_date, app_index[discounted], dates[discounted])
+
+    return pd.DataFrame({
+        'episode_count': episode_count,
+        'price_hike_count': _app_sums(app_index, hike, n_apps),
+        'hike_gap_sum': hike_gap_sum,
+        'hike_gap_count': hike_gap_count,
+        'max_episode_length': max_episode,
+        'trailing_run': trailing_run,
+        'last_initial': last_initial,
+        'pending_hike_count': pending_count,
+        'pending_hike_date_sum': pending_date_sum,
+        'first_date': first_date,
+        'last_date': last_date,
+        'last_discount_date': last_discount_date,
+    })
+
+
+def rolling_min_prices(app_index, n_apps, dates, final):
+    """Menor Finalprice de cada app nas janelas de ROLLING_WINDOWS dias até a última observação"""
+    dates = np.asarray(dates, dtype=np.int64)
+    last_date = np.full(n_apps, np.iinfo(np.int64).min)
+    np.maximum.at(last_date, app_index, dates)
+    rolling = {}
+    for window in ROLLING_WINDOWS:
+        in_window = dates > last_date[app_index] - window
+        window_min = pd.Series(final[in_window]).groupby(app_index[in_window]).min()
+        rolling[f'min_price_last_{window}_days'] = window_min.reindex(range(n_apps)).to_numpy()
+    return pd.DataFrame(rolling)
+
+
+def finalize_sequence_features(sequence, rolling, discount_days):
+    """Features sequenciais finais a partir dos agregados (mesmo índice nos três argumentos)"""
+    episodes = sequence['episode_count']
+    never_discounted = sequence['last_discount_date'].isna()
+    days_since_discount = sequence['last_date'] - sequence['last_discount_date']
+    # Sem nenhuma promoção: pelo menos todo o período observado
+    observed_days = sequence['last_date'] - sequence['first_date'] + 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_episode = (discount_days / episodes).where(episodes > 0, 0)
+        avg_hike_gap = (sequence['hike_gap_sum'] / sequence['hike_gap_count']).where(sequence['hike_gap_count'] > 0, 0)
+    features = pd.DataFrame({
+        'discount_episode_count': episodes.astype(np.int64),
+        'avg_discount_episode_length': avg_episode,
+        'max_discount_episode_length': sequence['max_episode_length'].fillna(0).astype(np.int64),
+        'days_since_last_discount': days_since_discount.where(~never_discounted, observed_days).astype(np.int64),
+        'price_hike_count': sequence['price_hike_count'].astype(np.int64),
+        'avg_days_hike_to_discount': avg_hike_gap,
+    })
+    for window in ROLLING_WINDOWS:
+        features[f'min_price_last_{window}_days'] = rolling[f'min_price_last_{window}_days']
+    return features
+
+
+def _app_sums(app_index, weights, n_apps):
+    """Soma de ``weights`` por app, sempre float64 (bincount devolve int64 sem nenhuma linha)"""
+    return np.bincount(app_index, weights=weights, minlength=n_apps).astype(np.float64, copy=False)
+
+
+def _first_month_where(monthly, how):
+    """Primeiro mês (em ordem) com a maior/menor média de desconto de cada app"""
+    table = monthly.rename('mean_discount').reset_index()
+    extreme = table.groupby('appid')['mean_discount'].transform(how)
+    first = table[table['mean_discount'] == extreme].drop_duplicates('appid')
+    return first.set_index('appid')['month']
@@ -0,0 +1,258 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from compact_types import compact_price_columns, to_datetime64
+
+PRICE_COLUMNS = ['Date', 'Initialprice', 'Finalprice', 'Discount']
+
+# Pico de memória aproximado (bytes) por byte de CSV ao passar um bloco por
+# limpeza, transformação e features; medido em ~6.5, arredondado para cima
+MEMORY_PER_CSV_BYTE = 8
+
+
+def parse_price_rows(chunks, appids, encoding='latin-1'):
+    """Converter trechos de CSV sem cabeçalho (um por app) em um DataFrame longo.
+
+    Cada trecho deve terminar em quebra de linha. A coluna 'Date' volta como
+    texto; a conversão fica a cargo de quem chama.
+    """
+    # Linhas em branco são mantidas para que a contagem de linhas por
+    # trecho continue alinhada com o conteúdo concatenado
+    counts = [chunk.count(b'\n') for chunk in chunks]
+    long_df = pd.read_csv(
+        io.BytesIO(b''.join(chunks)), encoding=encoding, header=None,
+        names=PRICE_COLUMNS, skip_blank_lines=False
+    )
+    long_df['appid'] = np.repeat(np.asarray(appids, dtype=np.int64), counts)
+    return long_df.dropna(how='all', subset=PRICE_COLUMNS)
+
+
+class PriceStore:
+    """Histórico de preços de todos os apps em formato longo e colunar.
+
+    As linhas ficam ordenadas por (appid, Date) em arrays contíguos; as linhas
+    do app ``appids[i]`` ocupam o intervalo ``offsets[i]:offsets[i + 1]``.
+    Date é guardada como int32 (dias desde 1970-01-01), preços como float32
+    e Discount como uint8; os DataFrames gerados voltam a ter Date como data.
+    """
+
+    def __init__(self, appids, offsets, columns):
+        self.appids = np.asarray(appids, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.columns = dict(columns)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Construir o store a partir de um DataFrame longo, sem valores ausentes, com coluna 'appid'"""
+        appid = df['appid'].to_numpy(dtype=np.int64)
+        columns = compact_price_columns(df.drop(columns=['appid']))
+        # Ordenação estável: mantém a ordem original entre datas repetidas
+        order = np.lexsort((columns['Date'], appid))
+        appid = appid[order]
+        columns = {name: np.ascontiguousarray(values[order]) for name, values in columns.items()}
+        appids, starts = np.unique(appid, return_index=True)
+        offsets = np.append(starts, len(appid))
+        return cls(appids, offsets, columns)
+
+    @classmethod
+    def read_csv_files(cls, file_paths, encoding='latin-1'):
+        """Ler vários CSVs de histórico de preços com uma única chamada ao parser"""
+        chunks = []
+        appids = []
+        frames = []
+        for file_path in file_paths:
+            app_id = int(os.path.basename(file_path).replace('.csv', ''))
+            try:
+                with open(file_path, 'rb') as f:
+                    header = f.readline()
+                    body = f.read()
+            except OSError as e:
+                print(f"Erro ao carregar {file_path}: {e}")
+                continue
+            if header.decode(encoding).strip().split(',') != PRICE_COLUMNS:
+                # Esquema diferente: ler o arquivo isoladamente
+                try:
+                    price_df = pd.read_csv(file_path, encoding=encoding)
+                    frames.append(price_df.assign(appid=app_id))
+                except Exception as e:
+                    print(f"Erro ao carregar {file_path}: {e}")
+                continue
+            if body and not body.endswith(b'\n'):
+                body += b'\n'
+            chunks.append(body)
+            appids.append(app_id)
+
+        if chunks:
+            frames.insert(0, parse_price_rows(chunks, appids, encoding=encoding))
+
+        if not frames:
+            return cls.empty()
+
+        long_df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        long_df['Date'] = pd.to_datetime(long_df['Date'], errors='coerce')
+        # Os tipos compactos não representam NaN: linhas incompletas saem já na leitura
+        return cls.from_frame(long_df.dropna())
+
+    @classmethod
+    def concat(cls, stores):
+        """Juntar stores com apps distintos, mantendo a ordem por appid"""
+        stores = [store for store in stores if store.n_apps]
+        if not stores:
+            return cls.empty()
+        if len(stores) == 1:
+            return stores[0]
+        bases = np.cumsum([0] + [len(store) for store in stores[:-1]])
+        appids = np.concatenate([store.appids for store in stores])
+        counts = np.concatenate([store.counts() for store in stores])
+        starts = np.concatenate([store.offsets[:-1] + base for store, base in zip(stores, bases)])
+
+        order = np.argsort(appids, kind='stable')
+        counts = counts[order]
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        rows = np.arange(offsets[-1]) + np.repeat(starts[order] - offsets[:-1], counts)
+        columns = {
+            name: np.concatenate([store.columns[name] for store in stores])[rows]
+            for name in stores[0].columns
+        }
+        return cls(appids[order], offsets, columns)
+
+    @classmethod
+    def empty(cls):
+        """Store sem nenhum app"""
+        columns = {
+            'Date': np.array([], dtype=np.int32),
+            'Initialprice': np.array([], dtype=np.float32),
+            'Finalprice': np.array([], dtype=np.float32),
+            'Discount': np.array([], dtype=np.uint8),
+        }
+        return cls(np.array([], dtype=np.int64), np.zeros(1, dtype=np.int64), columns)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    @property
+    def n_apps(self):
+        return len(self.appids)
+
+    def memory_usage(self):
+        """Bytes ocupados pelos arrays do store"""
+        arrays = [self.appids, self.offsets] + list(self.columns.values())
+        return sum(np.asarray(values).nbytes for values in arrays)
+
+    def wide_memory_usage(self):
+        """Bytes que as mesmas colunas ocupariam com os tipos padrão de 8 bytes do pandas"""
+        return self.appids.nbytes + self.offsets.nbytes + 8 * len(self) * len(self.columns)
+
+    def dates(self):
+        """Coluna Date como datetime64[D]"""
+        return to_datetime64(self.columns['Date'])
+
+    def counts(self):
+        """Número de linhas por app"""
+        return np.diff(self.offsets)
+
+    def row_appids(self):
+        """appid de cada linha"""
+        return np.repeat(self.appids, self.counts())
+
+    def app_slice(self, app_id):
+        """Intervalo de linhas de um app"""
+        i = np.searchsorted(self.appids, app_id)
+        if i >= len(self.appids) or self.appids[i] != app_id:
+            raise KeyError(app_id)
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def app_frame(self, app_id):
+        """DataFrame com o histórico de um único app"""
+        return pd.DataFrame(self._frame_columns(self.app_slice(app_id)))
+
+    def iter_apps(self):
+        """Percorrer (appid, DataFrame) na ordem do store"""
+        for app_id in self.appids:
+            yield int(app_id), self.app_frame(app_id)
+
+    def to_frame(self):
+        """DataFrame longo com a coluna 'appid'"""
+        data = {'appid': self.row_appids()}
+        data.update(self._frame_columns(slice(None)))
+        return pd.DataFrame(data, copy=False)
+
+    def _frame_columns(self, rows):
+        columns = {name: values[rows] for name, values in self.columns.items()}
+        columns['Date'] = to_datetime64(columns['Date'])
+        return columns
+
+    def take_rows(self, row_mask):
+        """Novo store apenas com as linhas selecionadas"""
+        row_mask = np.asarray(row_mask, dtype=bool)
+        app_index = np.repeat(np.arange(self.n_apps), self.counts())
+        kept = np.bincount(app_index[row_mask], minlength=self.n_apps)
+        keep_apps = kept > 0
+        offsets = np.concatenate([[0], np.cumsum(kept[keep_apps])])
+        columns = {name: values[row_mask] for name, values in self.columns.items()}
+        return PriceStore(self.appids[keep_apps], offsets, columns)
+
+    def select_apps(self, app_mask):
+        """Novo store apenas com os apps selecionados"""
+        app_mask = np.asarray(app_mask, dtype=bool)
+        return self.take_rows(np.repeat(app_mask, self.counts()))
+
+    def with_columns(self, **new_columns):
+        """Novo store com colunas adicionadas ou substituídas"""
+        columns = dict(self.columns)
+        columns.update(new_columns)
+        return PriceStore(self.appids, self.offsets, columns)
+
+
+def plan_file_chunks(file_paths, max_memory_mb=256, max_files=None):
+    """Agrupar arquivos em blocos cujo processamento caiba em ``max_memory_mb``.
+
+    O tamanho em disco de cada arquivo estima a memória do bloco; um arquivo
+    maior que o limite sozinho forma um bloco próprio.
+    """
+    budget = max_memory_mb * 1024 * 1024
+    chunk, chunk_bytes = [], 0
+    for file_path in file_paths:
+        file_bytes = os.path.getsize(file_path) * MEMORY_PER_CSV_BYTE
+        full = max_files is not None and len(chunk) >= max_files
+        if chunk and (full or chunk_bytes + file_bytes > budget):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append(file_path)
+        chunk_bytes += file_bytes
+    if chunk:
+        yield chunk
+
+
+def clean_price_store(store, min_rows=10):
+    """Remover linhas com valores ausentes e apps com no máximo ``min_rows`` registros"""
+    # Remover linhas com valores ausentes
+    complete_rows = np.ones(len(store), dtype=bool)
+    for values in store.columns.values():
+        complete_rows &= pd.notna(values)
+    store = store.take_rows(complete_rows)
+
+    # Verificar se há dados suficientes após limpeza
+    return store.select_apps(store.counts() > min_rows)
+
+
+def transform_price_store(store):
+    """Adicionar colunas de calendário, economia absoluta e indicador de desconto"""
+    columns = store.columns
+
+    # Datas já chegam tipadas do store; extrair características temporais
+    dates = pd.DatetimeIndex(store.dates())
+
+    return store.with_columns(
+        year=dates.year.to_numpy().astype(np.int16),
+        month=dates.month.to_numpy().astype(np.int8),
+        day_of_week=dates.dayofweek.to_numpy().astype(np.int8),
+        quarter=dates.quarter.to_numpy().astype(np.int8),
+        # Calcular economia absoluta
+        savings_amount=(columns['Initialprice'] - columns['Finalprice']).astype(np.float32),
+        # Indicador de desconto binário
+        has_discount=(columns['Discount'] > 0).astype(np.int8),
+    )
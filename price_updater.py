@@ -0,0 +1,324 @@
+import asyncio
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+PRICE_HEADER = b'Date,Initialprice,Finalprice,Discount\n'
+# Bytes lidos do fim de cada CSV para achar a última data
+TAIL_BYTES = 256
+# Apps com linhas novas acumulados antes de cada gravação em lote
+BATCH_APPS = 200
+
+
+class SourceError(Exception):
+    """Falha ao buscar o histórico de um app; ``retryable`` indica se vale tentar de novo"""
+
+    def __init__(self, message, retryable=True, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class FileSource:
+    """Fonte que lê ``<appid>.csv`` de outro diretório (cópia local ou dublê em testes).
+
+    Uma fonte é qualquer objeto com ``fetch(app_id, since)`` assíncrono, que
+    devolve o CSV do app em bytes (no formato de PriceHistory, com ou sem
+    cabeçalho; linhas até ``since`` são ignoradas) ou None se o app não
+    existe na fonte, e ``close()`` assíncrono.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    async def fetch(self, app_id, since=None):
+        path = os.path.join(self.directory, f'{app_id}.csv')
+        try:
+            return await asyncio.to_thread(_read_bytes, path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            raise SourceError(f'{path}: {e}') from e
+
+    async def close(self):
+        pass
+
+
+class HttpSource:
+    """Fonte HTTP: ``GET <url>/<appid>.csv?since=AAAA-MM-DD`` com conexões reaproveitadas.
+
+    Mantém até ``pool_size`` conexões HTTP/1.1 keep-alive abertas (só com a
+    biblioteca padrão); 404 vira None, 429 e 5xx podem ser repetidos.
+    """
+
+    def __init__(self, base_url, pool_size=8, timeout=30):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.ssl = url.scheme == 'https'
+        self.path = url.path.rstrip('/')
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(pool_size)
+        self._idle = []
+
+    async def fetch(self, app_id, since=None):
+        path = f'{self.path}/{app_id}.csv' + (f'?since={since}' if since else '')
+        async with self._slots:
+            try:
+                status, headers, body = await asyncio.wait_for(self._request(path), self.timeout)
+            except (OSError, EOFError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+                raise SourceError(f'{self.host}{path}: {type(e).__name__} {e}') from e
+        if status == 404:
+            return None
+        if status == 429 or status >= 500:
+            retry_after = headers.get('retry-after')
+            raise SourceError(f'{self.host}{path}: HTTP {status}',
+                              retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+        if status != 200:
+            raise SourceError(f'{self.host}{path}: HTTP {status}', retryable=False)
+        return body
+
+    async def _request(self, path):
+        reused = bool(self._idle)
+        reader, writer = self._idle.pop() if reused else await asyncio.open_connection(
+            self.host, self.port, ssl=self.ssl or None)
+        try:
+            try:
+                writer.write(f'GET {path} HTTP/1.1\r\nHost: {self.host}\r\nConnection: keep-alive\r\n\r\n'.encode())
+                await writer.drain()
+                status_line = await reader.readline()
+            except ConnectionError:
+                if not reused:
+                    raise
+                status_line = b''
+            if not status_line and reused:
+                # O servidor fechou a conexão ociosa: tentar em outra
+                writer.close()
+                return await self._request(path)
+            version, status = status_line.split(b' ', 2)[:2]
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if 'content-length' in headers:
+                body = await reader.readexactly(int(headers['content-length']))
+            elif headers.get('transfer-encoding', '').lower() == 'chunked':
+                body = await _read_chunked(reader)
+            else:
+                body = await reader.read()
+                headers['connection'] = 'close'
+        except BaseException:
+            writer.close()
+            raise
+
+        keep_alive = version == b'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if keep_alive:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return int(status), headers, body
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+class TokenBucket:
+    """Limite de ``rate`` requisições por segundo, com rajadas de até ``burst``"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class PriceUpdater:
+    """Atualiza PriceHistory/ buscando os dias novos de muitos apps em paralelo.
+
+    ``concurrency`` tarefas asyncio consomem a fila de appids; cada busca
+    passa pelo limite de taxa da fonte e é repetida com backoff exponencial
+    e jitter em falhas temporárias. As linhas mais novas que a última data
+    de cada arquivo são acumuladas e acrescentadas aos CSVs em lotes de
+    ``batch_apps`` apps, em uma thread, sem reescrever os arquivos; assim
+    ``features --incremental`` e o cache de preços só releem o que mudou.
+    """
+
+    def __init__(self, source, price_dir, concurrency=16, rate=None, burst=None, retries=3,
+                 backoff=0.5, max_backoff=30, batch_apps=BATCH_APPS):
+        self.source = source
+        self.price_dir = price_dir
+        self.concurrency = concurrency
+        self.limiter = TokenBucket(rate, burst) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.batch_apps = batch_apps
+
+    def run(self, appids=None):
+        """Atualizar os apps (por padrão, os que já têm CSV em ``price_dir``)"""
+        return asyncio.run(self.update(appids))
+
+    async def update(self, appids=None):
+        os.makedirs(self.price_dir, exist_ok=True)
+        if appids is None:
+            appids = sorted(int(name[:-4]) for name in os.listdir(self.price_dir)
+                            if name.endswith('.csv') and name[:-4].isdigit())
+        # Um appid repetido seria buscado e acrescentado duas vezes
+        appids = list(dict.fromkeys(appids))
+        last_dates = await asyncio.to_thread(self._last_dates, appids)
+
+        queue = asyncio.Queue()
+        for app_id in appids:
+            queue.put_nowait(app_id)
+        self._pending = {}
+        self._writes = []
+        stats = {'apps': len(appids), 'updated_apps': 0, 'new_rows': 0, 'missing': [], 'failed': {}}
+        try:
+            workers = [asyncio.create_task(self._worker(queue, last_dates, stats))
+                       for _ in range(min(self.concurrency, len(appids)) or 1)]
+            await asyncio.gather(*workers)
+            self._flush()
+            await asyncio.gather(*self._writes)
+        finally:
+            await self.source.close()
+        return stats
+
+    async def _worker(self, queue, last_dates, stats):
+        while not queue.empty():
+            app_id = queue.get_nowait()
+            last_date = last_dates.get(app_id)
+            try:
+                body = await self._fetch(app_id, last_date)
+            except SourceError as e:
+                stats['failed'][app_id] = str(e)
+                continue
+            if body is None:
+                stats['missing'].append(app_id)
+                continue
+            lines = new_price_lines(body, last_date)
+            if lines:
+                self._pending[app_id] = lines
+                stats['updated_apps'] += 1
+                stats['new_rows'] += len(lines)
+                if len(self._pending) >= self.batch_apps:
+                    self._flush()
+
+    async def _fetch(self, app_id, since):
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None:
+                await self.limiter.acquire()
+            try:
+                return await self.source.fetch(app_id, since)
+            except SourceError as e:
+                if not e.retryable or attempt == self.retries:
+                    raise
+                # Backoff exponencial com jitter completo, respeitando Retry-After
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                await asyncio.sleep(max(delay, e.retry_after or 0))
+
+    def _flush(self):
+        """Passar o lote acumulado para uma thread que o acrescenta aos CSVs"""
+        if self._pending:
+            batch, self._pending = self._pending, {}
+            self._writes.append(asyncio.ensure_future(asyncio.to_thread(self._append_batch, batch)))
+
+    def _append_batch(self, batch):
+        for app_id, lines in batch.items():
+            path = os.path.join(self.price_dir, f'{app_id}.csv')
+            with open(path, 'a+b') as f:
+                size = f.seek(0, os.SEEK_END)
+                # Linha interrompida no fim do arquivo (ignorada por _last_row_date):
+                # descartá-la, a fonte devolve de novo as linhas desde a última completa
+                complete = _last_line_end(f, size)
+                if complete < size:
+                    f.truncate(complete)
+                if complete == 0:
+                    f.write(PRICE_HEADER)
+                f.write(b''.join(lines))
+
+    def _last_dates(self, appids):
+        """Última data (AAAA-MM-DD) de cada CSV; None para apps sem arquivo ou sem linhas"""
+        last_dates = {}
+        for app_id in appids:
+            path = os.path.join(self.price_dir, f'{app_id}.csv')
+            try:
+                last_dates[app_id] = _last_row_date(path)
+            except FileNotFoundError:
+                last_dates[app_id] = None
+        return last_dates
+
+
+def new_price_lines(body, last_date=None):
+    """Linhas ``Date,Initialprice,Finalprice,Discount`` posteriores a ``last_date``, terminadas em \\n"""
+    lines = []
+    for line in body.splitlines():
+        line = line.strip()
+        fields = line.split(b',')
+        if len(fields) != 4 or not fields[0][:4].isdigit():
+            # Cabeçalho, linhas vazias ou incompletas
+            continue
+        if last_date and fields[0].decode('latin-1') <= last_date:
+            continue
+        lines.append(line + b'\n')
+    return lines
+
+
+def _last_row_date(path):
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - TAIL_BYTES))
+        tail = f.read()
+    if tail and not tail.endswith(b'\n'):
+        # Última linha interrompida no meio: não confiar nela
+        tail = tail[:tail.rfind(b'\n') + 1]
+    for line in reversed(tail.splitlines()):
+        date = line.split(b',', 1)[0].strip()
+        if date[:4].isdigit():
+            return date.decode('latin-1')
+    return None
+
+
+def _last_line_end(f, size):
+    """Posição logo depois da última quebra de linha de um arquivo aberto (0 se não houver)"""
+    end = size
+    while end > 0:
+        start = max(0, end - TAIL_BYTES)
+        f.seek(start)
+        newline = f.read(end - start).rfind(b'\n')
+        if newline >= 0:
+            return start + newline + 1
+        end = start
+    return 0
+
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+async def _read_chunked(reader):
+    chunks = []
+    while True:
+        size = int((await reader.readline()).split(b';')[0], 16)
+        if size == 0:
+            await reader.readline()
+            return b''.join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readline()
@@ -0,0 +1,268 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from compact_types import to_datetime64
+
+SALE_MATRIX_DIRNAME = 'sale_matrix'
+# Discount de um (dia, app) sem coleta
+NO_OBSERVATION = 255
+# Uma promoção geral é um trecho de dias com ao menos MIN_SALE_RATE dos apps
+# observados em desconto (e ao menos SALE_RATE_FACTOR vezes a taxa mediana)
+MIN_SALE_RATE = 0.25
+SALE_RATE_FACTOR = 3
+MIN_SALE_DAYS = 2
+
+# Trechos de dias consecutivos com o mesmo Discount (ver discount_runs)
+DISCOUNT_RUN_COLUMNS = ['appid', 'start', 'stop', 'discount']
+STOREWIDE_SALE_COLUMNS = [
+    'storewide_sale_participation', 'storewide_sale_discount_share', 'avg_storewide_sale_discount',
+]
+
+
+class PriceMatrix:
+    """Discount (uint8) e Finalprice (float32) densos, uma linha por dia e uma coluna por app.
+
+    As linhas vão de ``first_date`` (dias desde 1970-01-01) até a última
+    data observada; dias sem coleta ficam com NO_OBSERVATION e NaN. Com o
+    dia como eixo externo, perguntas "entre todos os apps, neste dia" são
+    uma varredura de linhas contíguas.
+    """
+
+    def __init__(self, first_date, appids, discount, final_price):
+        self.first_date = int(first_date)
+        self.appids = appids
+        self.discount = discount
+        self.final_price = final_price
+
+    @property
+    def n_days(self):
+        return self.discount.shape[0]
+
+    def app_column(self, app_id):
+        """Coluna de um app"""
+        i = np.searchsorted(self.appids, app_id)
+        if i >= len(self.appids) or self.appids[i] != app_id:
+            raise KeyError(app_id)
+        return int(i)
+
+    def discount_rates(self):
+        """Fração dos apps observados em desconto, por dia (mesma taxa de daily_discount_rates)"""
+        observed = (self.discount != NO_OBSERVATION).sum(axis=1)
+        discounted = ((self.discount != NO_OBSERVATION) & (self.discount > 0)).sum(axis=1)
+        return discounted / np.maximum(observed, 1)
+
+    def storewide_sales(self, **thresholds):
+        """Promoções gerais detectadas nas linhas da matriz (ver detect_storewide_sales)"""
+        return detect_sales_in_rates(self.first_date, self.discount_rates(), **thresholds)
+
+    def sale_discounts(self, app_id, sales):
+        """Maior desconto de um app em cada promoção de ``sales`` (NaN nos dias sem coleta)"""
+        column = self.discount[:, self.app_column(app_id)]
+        result = np.full(len(sales), np.nan)
+        starts = sales['start'].to_numpy().astype('datetime64[D]').astype(np.int64) - self.first_date
+        for i, (start, days) in enumerate(zip(starts.tolist(), sales['days'].tolist())):
+            values = column[max(start, 0):start + days]
+            values = values[values != NO_OBSERVATION]
+            if len(values):
+                result[i] = values.max()
+        return result
+
+
+def build_price_matrix(store, directory=None):
+    """Pivotar um PriceStore na matriz (dia x app).
+
+    Com ``directory`` as matrizes são criadas direto em arquivos .npy
+    mapeados em memória (junto com appids.npy e matrix.json), sem passar
+    por um array em RAM.
+    """
+    dates = store.columns['Date']
+    first_date = int(dates.min()) if len(dates) else 0
+    n_days = int(dates.max()) - first_date + 1 if len(dates) else 0
+    shape = (n_days, store.n_apps)
+
+    if directory is None:
+        discount = np.full(shape, NO_OBSERVATION, dtype=np.uint8)
+        final_price = np.full(shape, np.nan, dtype=np.float32)
+    else:
+        os.makedirs(directory, exist_ok=True)
+        discount = np.lib.format.open_memmap(os.path.join(directory, 'discount.npy'), mode='w+',
+                                             dtype=np.uint8, shape=shape)
+        final_price = np.lib.format.open_memmap(os.path.join(directory, 'final_price.npy'), mode='w+',
+                                                dtype=np.float32, shape=shape)
+        discount[:] = NO_OBSERVATION
+        final_price[:] = np.nan
+
+    rows = dates.astype(np.int64) - first_date
+    columns = np.repeat(np.arange(store.n_apps), store.counts())
+    discount[rows, columns] = np.clip(store.columns['Discount'], 0, NO_OBSERVATION - 1)
+    final_price[rows, columns] = store.columns['Finalprice']
+    matrix = PriceMatrix(first_date, np.asarray(store.appids), discount, final_price)
+
+    if directory is not None:
+        discount.flush()
+        final_price.flush()
+        np.save(os.path.join(directory, 'appids.npy'), matrix.appids)
+        with open(os.path.join(directory, 'matrix.json'), 'w') as f:
+            json.dump({'first_date': first_date, 'shape': list(shape)}, f)
+    return matrix
+
+
+def load_price_matrix(directory=SALE_MATRIX_DIRNAME):
+    """PriceMatrix gravada por build_price_matrix, aberta com memory mapping"""
+    with open(os.path.join(directory, 'matrix.json')) as f:
+        meta = json.load(f)
+    return PriceMatrix(
+        meta['first_date'],
+        np.load(os.path.join(directory, 'appids.npy')),
+        np.load(os.path.join(directory, 'discount.npy'), mmap_mode='r'),
+        np.load(os.path.join(directory, 'final_price.npy'), mmap_mode='r'),
+    )
+
+
+def discount_runs(row_appids, dates, discount):
+    """Histórico de Discount comprimido em trechos de dias consecutivos com o mesmo valor.
+
+    Os arrays por linha devem estar ordenados por (app, data). Retorna um
+    DataFrame com DISCOUNT_RUN_COLUMNS (stop exclusivo, em dias desde
+    1970-01-01). Trechos de partes diferentes dos históricos (blocos do modo
+    streaming, lotes do modo incremental) se combinam por concatenação: as
+    contagens por dia e as features de promoções gerais só somam dias.
+    """
+    row_appids = np.asarray(row_appids, dtype=np.int64)
+    dates = np.asarray(dates, dtype=np.int64)
+    discount = np.asarray(discount, dtype=np.float64)
+    boundary = np.ones(len(dates), dtype=bool)
+    boundary[1:] = ((row_appids[1:] != row_appids[:-1]) | (dates[1:] != dates[:-1] + 1)
+                    | (discount[1:] != discount[:-1]))
+    first = np.flatnonzero(boundary)
+    last = np.append(first[1:], len(dates))[:len(first)] - 1
+    return pd.DataFrame({
+        'appid': row_appids[first],
+        'start': dates[first],
+        'stop': dates[last] + 1,
+        'discount': discount[first],
+    }, columns=DISCOUNT_RUN_COLUMNS)
+
+
+def store_discount_runs(store):
+    """discount_runs de todos os apps de um PriceStore"""
+    return discount_runs(store.row_appids(), store.columns['Date'], store.columns['Discount'])
+
+
+def daily_discount_rates(runs):
+    """``(first_date, rates)``: fração dos apps observados em desconto em cada dia.
+
+    Mesma taxa de PriceMatrix.discount_rates, acumulada a partir dos
+    trechos com diferenças nas bordas, sem montar a matriz.
+    """
+    if not len(runs):
+        return 0, np.empty(0)
+    first_date = int(runs['start'].min())
+    n_days = int(runs['stop'].max()) - first_date
+    start = runs['start'].to_numpy(dtype=np.int64) - first_date
+    stop = runs['stop'].to_numpy(dtype=np.int64) - first_date
+    discounted = (runs['discount'] > 0).to_numpy(dtype=np.float64)
+
+    def per_day(weights):
+        edges = (np.bincount(start, weights, minlength=n_days + 1)
+                 - np.bincount(stop, weights, minlength=n_days + 1))
+        return np.cumsum(edges)[:-1]
+
+    observed = per_day(np.ones(len(runs)))
+    return first_date, per_day(discounted) / np.maximum(observed, 1)
+
+
+def detect_storewide_sales(runs, min_rate=MIN_SALE_RATE, rate_factor=SALE_RATE_FACTOR,
+                           min_days=MIN_SALE_DAYS):
+    """Promoções gerais: trechos de dias em que a taxa de apps em desconto dispara.
+
+    ``runs`` vem de discount_runs. Retorna um DataFrame com start, end
+    (inclusive), days, peak_rate e mean_rate de cada trecho com ao menos
+    ``min_days`` dias.
+    """
+    first, rates = daily_discount_rates(runs)
+    return detect_sales_in_rates(first, rates, min_rate, rate_factor, min_days)
+
+
+def detect_sales_in_rates(first, rates, min_rate=MIN_SALE_RATE, rate_factor=SALE_RATE_FACTOR,
+                          min_days=MIN_SALE_DAYS):
+    """detect_storewide_sales a partir da taxa diária de apps em desconto, começando no dia ``first``"""
+    columns = ['start', 'end', 'days', 'peak_rate', 'mean_rate']
+    if not len(rates):
+        return pd.DataFrame(columns=columns)
+    threshold = max(min_rate, rate_factor * float(np.median(rates)))
+    in_sale = np.concatenate([[False], rates >= threshold, [False]])
+    edges = np.flatnonzero(np.diff(in_sale.astype(np.int8)))
+    starts, stops = edges[::2], edges[1::2]
+    keep = stops - starts >= min_days
+    starts, stops = starts[keep], stops[keep]
+
+    # reduceat sobre os pares (início, fim) de cada trecho; os índices ímpares são os intervalos entre trechos
+    bounds = np.column_stack([starts, stops]).ravel()
+    padded = np.append(rates, 0)
+    peak = np.maximum.reduceat(padded, bounds)[::2] if len(bounds) else np.empty(0)
+    total = np.add.reduceat(padded, bounds)[::2] if len(bounds) else np.empty(0)
+
+    return pd.DataFrame({
+        'start': to_datetime64(first + starts),
+        'end': to_datetime64(first + stops - 1),
+        'days': stops - starts,
+        'peak_rate': peak,
+        'mean_rate': total / (stops - starts),
+    }, columns=columns)
+
+
+def storewide_sale_features(runs, sales):
+    """Participação de cada app nas promoções gerais, indexada por appid.
+
+    - storewide_sale_participation: fração das promoções (em que o app foi
+      observado) com ao menos um dia de desconto do app
+    - storewide_sale_discount_share: fração dos dias de desconto do app que
+      caíram em promoções gerais
+    - avg_storewide_sale_discount: desconto médio do app nos dias de promoção
+
+    Cada trecho de ``runs`` é cruzado com as promoções que ele sobrepõe, sem
+    expandir os trechos em dias.
+    """
+    index = pd.Index(np.unique(runs['appid'].to_numpy(dtype=np.int64)), name='appid')
+    if not len(sales):
+        return pd.DataFrame(0.0, index=index, columns=STOREWIDE_SALE_COLUMNS)
+
+    app = np.searchsorted(index, runs['appid'].to_numpy(dtype=np.int64))
+    start = runs['start'].to_numpy(dtype=np.int64)
+    stop = runs['stop'].to_numpy(dtype=np.int64)
+    discount = runs['discount'].to_numpy(dtype=np.float64)
+    sale_start = sales['start'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    sale_stop = sale_start + sales['days'].to_numpy(dtype=np.int64)
+
+    # Pares (trecho, promoção) que se sobrepõem: as promoções são ordenadas e disjuntas
+    first_sale = np.searchsorted(sale_stop, start, side='right')
+    end_sale = np.searchsorted(sale_start, stop, side='left')
+    n_pairs = np.maximum(end_sale - first_sale, 0)
+    run = np.repeat(np.arange(len(runs)), n_pairs)
+    position = np.arange(len(run)) - np.repeat(np.cumsum(n_pairs) - n_pairs, n_pairs)
+    sale = first_sale[run] + position
+    overlap = (np.minimum(stop[run], sale_stop[sale]) - np.maximum(start[run], sale_start[sale])).astype(np.float64)
+    in_discount = discount[run] > 0
+
+    def sales_with(mask):
+        pairs = np.unique(app[run][mask] * len(sales) + sale[mask])
+        return np.bincount(pairs // len(sales), minlength=len(index))
+
+    n_apps = len(index)
+    discount_days = np.bincount(app, weights=np.where(discount > 0, stop - start, 0), minlength=n_apps)
+    sale_days = np.bincount(app[run], weights=overlap, minlength=n_apps)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        features = pd.DataFrame({
+            'storewide_sale_participation': sales_with(in_discount) / sales_with(np.ones(len(run), dtype=bool)),
+            'storewide_sale_discount_share': (
+                np.bincount(app[run], weights=np.where(in_discount, overlap, 0), minlength=n_apps) / discount_days
+            ),
+            'avg_storewide_sale_discount': (
+                np.bincount(app[run], weights=overlap * discount[run], minlength=n_apps) / sale_days
+            ),
+        }, index=index)
+    return features.fillna(0)
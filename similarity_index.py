@@ -0,0 +1,211 @@
+import json
+import os
+
+import numpy as np
+
+SIMILARITY_DIRNAME = 'similarity_index'
+# Perfil de desconto de cada jogo: médias mensais (MONTHLY_DISCOUNT_COLUMNS de
+# price_features, repetidas aqui para as consultas não importarem pandas) e o
+# comportamento geral
+PROFILE_COLUMNS = [f'avg_discount_month_{m:02d}' for m in range(1, 13)] + [
+    'discount_frequency', 'avg_discount', 'price_volatility',
+]
+# Consultas por produto de matrizes; limita a matriz de scores (lote x apps)
+QUERY_BATCH = 64
+INITIAL_CAPACITY = 1024
+# Diferença máxima entre vetores para um perfil contar como inalterado
+UNCHANGED_TOLERANCE = 1e-6
+INDEX_FILES = ('vectors.npy', 'appids.npy', 'index.json')
+
+
+class SimilarityIndex:
+    """Índice de vizinhos mais próximos pelo perfil de desconto dos jogos.
+
+    Cada perfil é padronizado (média e desvio das colunas fixados na
+    construção, para que apps adicionados depois usem a mesma escala) e
+    normalizado para norma 1; a similaridade é o cosseno, calculada para
+    um lote de consultas com um único produto de matrizes sobre a matriz
+    float32 contígua dos vetores.
+    """
+
+    def __init__(self, mean, scale, capacity=INITIAL_CAPACITY):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.vectors = np.empty((capacity, len(self.mean)), dtype=np.float32)
+        self.appids = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+        self._rows = {}
+
+    @classmethod
+    def from_features(cls, features):
+        """Construir a partir de um DataFrame com app_id e PROFILE_COLUMNS (engineered_features.csv)"""
+        profiles = profiles_from_features(features)
+        mean = profiles.mean(axis=0) if len(profiles) else np.zeros(len(PROFILE_COLUMNS))
+        scale = profiles.std(axis=0) if len(profiles) else np.ones(len(PROFILE_COLUMNS))
+        index = cls(mean, np.where(scale > 0, scale, 1), capacity=max(len(profiles), INITIAL_CAPACITY))
+        index.add(features['app_id'].to_numpy(), profiles)
+        return index
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, app_id):
+        return int(app_id) in self._rows
+
+    def normalize(self, profiles):
+        """Perfis brutos -> vetores float32 padronizados de norma 1"""
+        vectors = (np.asarray(profiles, dtype=np.float64) - self.mean) / self.scale
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+    def add(self, appids, profiles):
+        """Adicionar apps (ou atualizar o perfil dos que já estão no índice)"""
+        appids = np.asarray(appids, dtype=np.int64)
+        # Um appid repetido no lote fica com o último perfil
+        unique, last = np.unique(appids[::-1], return_index=True)
+        keep = len(appids) - 1 - last
+        appids, vectors = unique, self.normalize(np.asarray(profiles)[keep])
+
+        rows = np.array([self._rows.get(app_id, -1) for app_id in appids.tolist()], dtype=np.int64)
+        new = rows < 0
+        self._reserve(self.size + int(new.sum()))
+        self.vectors[rows[~new]] = vectors[~new]
+
+        stop = self.size + int(new.sum())
+        self.vectors[self.size:stop] = vectors[new]
+        self.appids[self.size:stop] = appids[new]
+        self._rows.update(zip(appids[new].tolist(), range(self.size, stop)))
+        self.size = stop
+
+    def changed(self, appids, profiles):
+        """Máscara dos apps de ``appids`` fora do índice ou com perfil diferente do indexado"""
+        rows = np.array([self._rows.get(app_id, -1) for app_id in np.asarray(appids).tolist()], dtype=np.int64)
+        changed = rows < 0
+        indexed = np.flatnonzero(~changed)
+        difference = np.abs(self.normalize(np.asarray(profiles)[indexed]) - self.vectors[rows[indexed]])
+        changed[indexed] = difference.max(axis=1, initial=0) > UNCHANGED_TOLERANCE
+        return changed
+
+    def _reserve(self, size):
+        """Dobrar a capacidade até caber ``size`` vetores (custo amortizado constante por add)"""
+        capacity = len(self.appids)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity = max(2 * capacity, INITIAL_CAPACITY)
+        vectors = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+        appids = np.empty(capacity, dtype=np.int64)
+        vectors[:self.size] = self.vectors[:self.size]
+        appids[:self.size] = self.appids[:self.size]
+        self.vectors, self.appids = vectors, appids
+
+    def search(self, query_vectors, k=10, exclude=None):
+        """Top-k por similaridade para cada vetor normalizado de ``query_vectors``.
+
+        Retorna ``(appids, scores)``, ambos (consultas x k), em ordem
+        decrescente de similaridade; ``exclude`` (um appid por consulta)
+        remove o próprio app do resultado. Posições sem vizinho ficam com
+        appid -1 e score NaN.
+        """
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        k = min(k, self.size - (exclude is not None))
+        n_queries = len(query_vectors)
+        result_ids = np.full((n_queries, max(k, 0)), -1, dtype=np.int64)
+        result_scores = np.full((n_queries, max(k, 0)), np.nan, dtype=np.float32)
+        if k <= 0:
+            return result_ids, result_scores
+
+        vectors, appids = self.vectors[:self.size], self.appids[:self.size]
+        for start in range(0, n_queries, QUERY_BATCH):
+            batch = slice(start, start + QUERY_BATCH)
+            scores = query_vectors[batch] @ vectors.T
+            if exclude is not None:
+                rows = np.array([self._rows.get(app_id, -1) for app_id in np.asarray(exclude[batch]).tolist()])
+                own = np.flatnonzero(rows >= 0)
+                scores[own, rows[own]] = -np.inf
+            # argpartition acha os k maiores em O(n); só eles são ordenados
+            top = np.argpartition(scores, -k, axis=1)[:, -k:]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            result_ids[batch] = appids[np.take_along_axis(top, order, axis=1)]
+            result_scores[batch] = np.take_along_axis(top_scores, order, axis=1)
+        return result_ids, result_scores
+
+    def similar_to(self, appids, k=10):
+        """Jogos com perfil de desconto mais parecido com o de cada appid.
+
+        Appids fora do índice voltam só com -1 e NaN, como em search.
+        """
+        appids = np.asarray(appids, dtype=np.int64)
+        rows = np.array([self._rows.get(app_id, -1) for app_id in appids.tolist()], dtype=np.int64)
+        found = rows >= 0
+        neighbours, scores = self.search(self.vectors[rows[found]], k, exclude=appids[found])
+        result_ids = np.full((len(appids), neighbours.shape[1]), -1, dtype=np.int64)
+        result_scores = np.full((len(appids), neighbours.shape[1]), np.nan, dtype=np.float32)
+        result_ids[found], result_scores[found] = neighbours, scores
+        return result_ids, result_scores
+
+    def save(self, directory=SIMILARITY_DIRNAME):
+        """Gravar o índice; os arquivos são escritos em temporários e trocados no fim"""
+        os.makedirs(directory, exist_ok=True)
+        paths = [os.path.join(directory, name) for name in INDEX_FILES]
+        with open(paths[0] + '.tmp', 'wb') as f:
+            np.save(f, self.vectors[:self.size])
+        with open(paths[1] + '.tmp', 'wb') as f:
+            np.save(f, self.appids[:self.size])
+        with open(paths[2] + '.tmp', 'w') as f:
+            json.dump({'columns': PROFILE_COLUMNS, 'mean': self.mean.tolist(), 'scale': self.scale.tolist(),
+                       'size': self.size}, f)
+        # index.json por último: load() confere o tamanho com os arrays
+        for path in paths:
+            os.replace(path + '.tmp', path)
+        return directory
+
+    @classmethod
+    def load(cls, directory=SIMILARITY_DIRNAME):
+        """Abrir um índice salvo, com os vetores copiados para um buffer que aceita add"""
+        with open(os.path.join(directory, 'index.json')) as f:
+            meta = json.load(f)
+        if meta['columns'] != PROFILE_COLUMNS:
+            raise ValueError(f'Índice de similaridade com colunas diferentes: {directory}')
+        appids = np.load(os.path.join(directory, 'appids.npy'))
+        vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode='r')
+        if not len(appids) == len(vectors) == meta.get('size', len(appids)):
+            raise ValueError(f'Índice de similaridade incompleto: {directory}')
+        index = cls(meta['mean'], meta['scale'], capacity=max(len(appids), INITIAL_CAPACITY))
+        index.size = len(appids)
+        index.vectors[:index.size] = vectors
+        index.appids[:index.size] = appids
+        index._rows = dict(zip(appids.tolist(), range(index.size)))
+        return index
+
+
+def profiles_from_features(features):
+    """Matriz float64 (apps x PROFILE_COLUMNS) de um DataFrame de features"""
+    return features[PROFILE_COLUMNS].to_numpy(dtype=np.float64)
+
+
+def update_similarity_index(features, directory=SIMILARITY_DIRNAME):
+    """Atualizar o índice salvo em ``directory`` com as features atuais, sem reconstruí-lo.
+
+    Apps novos são adicionados e apps com perfil alterado são atualizados
+    com add, na escala do índice salvo. Sem índice salvo, com colunas
+    diferentes ou com apps que saíram das features, o índice é reconstruído
+    com from_features. Retorna estatísticas (apps, added, updated, rebuilt).
+    """
+    app_ids = features['app_id'].to_numpy(dtype=np.int64)
+    try:
+        index = SimilarityIndex.load(directory)
+    except (OSError, ValueError):
+        index = None
+    if index is None or not np.isin(index.appids[:index.size], app_ids).all():
+        SimilarityIndex.from_features(features).save(directory)
+        return {'apps': len(app_ids), 'added': len(app_ids), 'updated': 0, 'rebuilt': True}
+
+    profiles = profiles_from_features(features)
+    changed = index.changed(app_ids, profiles)
+    added = int(sum(app_id not in index for app_id in app_ids[changed].tolist()))
+    if changed.any():
+        index.add(app_ids[changed], profiles[changed])
+        index.save(directory)
+    return {'apps': len(index), 'added': added, 'updated': int(changed.sum()) - added, 'rebuilt': False}
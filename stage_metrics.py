@@ -0,0 +1,158 @@
+from datetime import datetime
+import json
+import os
+import sys
+import time
+import uuid
+
+try:
+    import resource
+except ImportError:
+    # Windows: sem getrusage, o pico de RSS fica como None
+    resource = None
+
+METRICS_FILENAME = 'stage_metrics.jsonl'
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def peak_rss_mb():
+    """Maior RSS do processo desde o início, em MB (None se indisponível)"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return round((rss if sys.platform == 'darwin' else rss * 1024) / 2**20, 2)
+
+
+def reset_peak_rss(pid='self'):
+    """Zerar o pico de RSS (VmHWM) de um processo, para medir só o que vem depois.
+
+    Só no Linux (/proc/<pid>/clear_refs); retorna False se indisponível.
+    """
+    try:
+        with open(f'/proc/{pid}/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def process_usage(pid='self'):
+    """``(CPU em s, pico de RSS em MB)`` de um processo vivo, lidos de /proc (None se indisponível)"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # Campos depois do nome do executável (que pode ter espaços): utime e stime são o 12º e o 13º
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/status') as f:
+            hwm = next(line for line in f if line.startswith('VmHWM:'))
+    except (OSError, StopIteration):
+        return None
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, int(hwm.split()[1]) / 1024
+
+
+def children_cpu_time():
+    """CPU dos processos filhos já encerrados e aguardados"""
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+def stage_snapshot(analysis):
+    """Contagens do estado da análise usadas como entrada/saída de uma etapa"""
+    return {
+        'rows': len(analysis.price_store),
+        'apps': int(analysis.price_store.n_apps),
+        'features': analysis.features_data,
+    }
+
+
+class StageMetricsRecorder:
+    """Hook que mede cada etapa de SteamGameAnalysis.
+
+    Registra tempo de parede, tempo de CPU (``cpu_s``, do processo
+    principal mais o dos workers, também separado em ``workers_cpu_s``),
+    pico de RSS durante a etapa do processo principal (``peak_rss_mb``) e
+    a soma dos picos dos workers (``workers_peak_rss_mb``), linhas de preço
+    antes/depois e apps descartados. Os picos por etapa dependem de zerar o
+    VmHWM no Linux; fora dele ``rss_scope`` é 'process' e ``peak_rss_mb`` é
+    o pico desde o início do processo principal (workers: None). Um hook é
+    qualquer objeto com ``before_stage(analysis, stage)`` e
+    ``after_stage(analysis, stage, error)``.
+
+    Só etapas executadas por ``run_stage`` são medidas (run_complete_analysis
+    e os subcomandos da CLI que executam o pipeline); os modos streaming,
+    incremental e out-of-core não passam pelas etapas e não são medidos.
+    """
+
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex
+        self.records = []
+        self._started = {}
+
+    def before_stage(self, analysis, stage):
+        """Guardar o estado inicial da etapa.
+
+        No Linux zera o pico de RSS do processo principal e de cada worker
+        vivo escrevendo em ``/proc/<pid>/clear_refs``.
+        """
+        workers = {}
+        for pid in analysis.worker_pids():
+            usage = process_usage(pid)
+            if usage is not None:
+                workers[pid] = usage[0]
+                reset_peak_rss(pid)
+        per_stage_rss = reset_peak_rss()
+        self._started[stage] = (time.perf_counter(), time.process_time(), children_cpu_time(), workers,
+                                per_stage_rss, stage_snapshot(analysis))
+
+    def after_stage(self, analysis, stage, error=None):
+        wall, cpu, children_cpu, workers, per_stage_rss, before = self._started.pop(stage)
+        parent_cpu = time.process_time() - cpu
+        # Workers encerrados na etapa passam a contar em children_cpu_time
+        workers_cpu = children_cpu_time() - children_cpu
+        workers_rss = 0.0
+        alive = set()
+        for pid in analysis.worker_pids():
+            usage = process_usage(pid)
+            if usage is None:
+                continue
+            # Workers criados durante a etapa contam desde o início; o pico
+            # dos que já existiam foi zerado em before_stage
+            alive.add(pid)
+            workers_cpu += usage[0] - workers.get(pid, 0)
+            workers_rss += usage[1]
+        workers_cpu -= sum(baseline for pid, baseline in workers.items() if pid not in alive)
+        usage = process_usage() if per_stage_rss else None
+        if usage is not None:
+            peak_rss = round(usage[1], 2)
+        else:
+            # Sem /proc/self/status: pico desde o início do processo
+            per_stage_rss = False
+            peak_rss = peak_rss_mb()
+        after = stage_snapshot(analysis)
+        # Uma etapa que gera features descarta os apps sem linha no resultado
+        produced_features = after['features'] is not None and after['features'] is not before['features']
+        apps_out = len(after['features']) if produced_features else after['apps']
+        self.records.append({
+            'run_id': self.run_id,
+            'stage': stage,
+            'status': 'ok' if error is None else type(error).__name__,
+            'wall_s': round(time.perf_counter() - wall, 4),
+            'cpu_s': round(parent_cpu + workers_cpu, 4),
+            'workers_cpu_s': round(workers_cpu, 4),
+            'peak_rss_mb': peak_rss,
+            'workers_peak_rss_mb': round(workers_rss, 2) if per_stage_rss else None,
+            'rss_scope': 'stage' if per_stage_rss else 'process',
+            'rows_in': before['rows'],
+            'rows_out': after['rows'],
+            'apps_in': before['apps'],
+            'apps_out': apps_out,
+            'apps_dropped': max(before['apps'] - apps_out, 0),
+        })
+
+    def write(self, path=METRICS_FILENAME):
+        """Acrescentar os registros desta execução ao arquivo JSONL"""
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with open(path, 'a') as f:
+            for record in self.records:
+                f.write(json.dumps(dict(record, timestamp=timestamp)) + '\n')
+        return path
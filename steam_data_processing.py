@@ -1,35 +1,102 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
+from functools import partial
 import os
 import glob
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
 import warnings
 warnings.filterwarnings('ignore')
 
-# Configurar o estilo dos gráficos
-plt.style.use('seaborn-v0_8')
-sns.set_palette("husl")
+from buy_index import INDEX_FILENAME, build_buy_index, save_buy_index
+from charts import SUMMARY_FILENAME, load_manifest, render_store_charts, render_summary_chart, save_manifest
+from checkpoints import CHECKPOINT_DIRNAME, StageCheckpoints, pipeline_until
+from compact_types import compact_app_info, format_memory_saving, parse_release_dates
+from dataset_split import CHUNK_ROWS, SPLIT_DIRNAME, SPLIT_NAMES, TARGET_COLUMNS, iter_csv_chunks, write_hash_split
+from incremental_features import IncrementalFeatureState, default_state_path
+from parallel import ShardedExecutor
+from price_cache import load_price_store
+from price_features import compute_price_features
+from price_store import PriceStore, clean_price_store, plan_file_chunks, transform_price_store
+from sale_matrix import (
+    SALE_MATRIX_DIRNAME, build_price_matrix, detect_storewide_sales, store_discount_runs, storewide_sale_features,
+)
+from similarity_index import SIMILARITY_DIRNAME, update_similarity_index
+from stage_metrics import METRICS_FILENAME, StageMetricsRecorder
+from window_dataset import HORIZON, LOOKBACK, WINDOW_DIRNAME, build_window_dataset
+
+# matplotlib, seaborn e sklearn são importados dentro das etapas que os usam,
+# para que carregar dados, gerar features ou consultar o índice comece rápido
 
 class SteamGameAnalysis:
-    def __init__(self, data_path):
+    def __init__(self, data_path, use_cache=True, workers=1, quiet=False, hooks=None):
         self.data_path = data_path
+        self.use_cache = use_cache
+        self.workers = workers
+        self.quiet = quiet
+        self.hooks = list(hooks or [])
+        self._executor = None
         self.app_info = None
-        self.price_data = {}
+        self.price_store = PriceStore.empty()
         self.processed_data = None
         self.features_data = None
+        self.datasets = None
+        self.storewide_sales = None
+        
+    def _parallel(self):
+        """Pool de processos compartilhado pelas etapas (None no modo serial)"""
+        if self.workers > 1 and self._executor is None:
+            self._executor = ShardedExecutor(self.workers)
+        return self._executor
+        
+    def _map_price_store(self, func, **shared):
+        """Aplicar uma etapa por app ao store, dividindo os apps entre os workers se houver.
+        
+        ``shared`` (ex.: app_info) vai para cada worker uma única vez.
+        """
+        if self._parallel() is None:
+            return func(self.price_store, **shared)
+        return self._parallel().map_store(func, self.price_store, **shared)
+        
+    def run_stage(self, stage, *args, **kwargs):
+        """Executar uma etapa pelo nome, chamando before_stage/after_stage de cada hook"""
+        for hook in self.hooks:
+            hook.before_stage(self, stage)
+        error = None
+        try:
+            return getattr(self, stage)(*args, **kwargs)
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            for hook in self.hooks:
+                hook.after_stage(self, stage, error)
+        
+    def worker_pids(self):
+        """PIDs dos processos do pool (vazio no modo serial)"""
+        return [] if self._executor is None else self._executor.pids()
+        
+    def close(self):
+        """Encerrar o pool de processos, se houver"""
+        if self._executor is not None:
+            self._executor.close()
+            self._executor = None
+        
+    @property
+    def price_data(self):
+        """Visão compatível: dicionário app_id -> DataFrame do histórico de preços"""
+        return {str(app_id): price_df for app_id, price_df in self.price_store.iter_apps()}
         
     def load_application_data(self):
         """Etapa 1: Carregamento e exploração inicial dos dados"""
         print("=== ETAPA 1: EXPLORANDO ESTATÍSTICAS DESCRITIVAS ===")
         
         # Carregar dados das aplicações
-        self.app_info = pd.read_csv(os.path.join(self.data_path, 'applicationInformation.csv'), encoding='latin-1')
+        self.app_info = self._read_app_info(report_memory=True)
         
         print(f"Dimensões do dataset principal: {self.app_info.shape}")
+        if self.quiet:
+            return self.app_info
+        
         print(f"\nColunas: {list(self.app_info.columns)}")
         print(f"\nTipos de dados:")
         print(self.app_info.dtypes)
@@ -46,36 +113,60 @@ class SteamGameAnalysis:
         
         return self.app_info
     
-    def load_price_history_sample(self, sample_size=50):
-        """Carregar uma amostra dos dados de histórico de preços"""
-        print(f"\n=== CARREGANDO AMOSTRA DE {sample_size} ARQUIVOS DE PREÇOS ===")
+    def _read_app_info(self, report_memory=False):
+        """Ler applicationInformation.csv com tipos compactos"""
+        raw_app_info = pd.read_csv(os.path.join(self.data_path, 'applicationInformation.csv'), encoding='latin-1')
+        app_info = compact_app_info(raw_app_info)
+        if report_memory:
+            print(format_memory_saving(
+                'app_info', raw_app_info.memory_usage(deep=True).sum(), app_info.memory_usage(deep=True).sum()
+            ))
+        return app_info
+    
+    def load_price_history_sample(self, sample_size=None):
+        """Carregar o histórico de preços (todos os arquivos ou uma amostra) no store colunar"""
+        if sample_size is None:
+            print("\n=== CARREGANDO TODOS OS ARQUIVOS DE PREÇOS ===")
+        else:
+            print(f"\n=== CARREGANDO AMOSTRA DE {sample_size} ARQUIVOS DE PREÇOS ===")
         
-        price_files = glob.glob(os.path.join(self.data_path, 'PriceHistory', '*.csv'))
+        price_dir = os.path.join(self.data_path, 'PriceHistory')
+        price_files = sorted(glob.glob(os.path.join(price_dir, '*.csv')))
         
         # Pegar uma amostra dos arquivos
         sample_files = price_files[:sample_size]
         
-        for file_path in sample_files:
-            app_id = os.path.basename(file_path).replace('.csv', '')
-            try:
-                price_df = pd.read_csv(file_path, encoding='latin-1')
-                self.price_data[app_id] = price_df
-            except Exception as e:
-                print(f"Erro ao carregar {file_path}: {e}")
+        if self.use_cache:
+            # Cache binário: só os arquivos novos ou alterados (da amostra) passam pelo parser de CSV
+            file_names = None if sample_size is None else [os.path.basename(path) for path in sample_files]
+            self.price_store, cache_stats = load_price_store(price_dir, read_csv_files=self._read_csv_files,
+                                                             file_names=file_names)
+            print(f"Cache de preços: {cache_stats['parsed_files']} arquivos processados, "
+                  f"{cache_stats['cached_files']} reaproveitados")
+        else:
+            self.price_store = self._read_csv_files(sample_files)
                 
-        print(f"Carregados {len(self.price_data)} arquivos de preços")
+        print(f"Carregados {self.price_store.n_apps} arquivos de preços ({len(self.price_store)} registros)")
+        print(format_memory_saving(
+            'histórico de preços', self.price_store.wide_memory_usage(), self.price_store.memory_usage()
+        ))
         
         # Analisar estrutura de um arquivo exemplo
-        if self.price_data:
-            sample_key = list(self.price_data.keys())[0]
-            sample_df = self.price_data[sample_key]
+        if self.price_store.n_apps and not self.quiet:
+            sample_key = int(self.price_store.appids[0])
+            sample_df = self.price_store.app_frame(sample_key)
             print(f"\nEstrutura de dados de preço (App ID {sample_key}):")
             print(f"Dimensões: {sample_df.shape}")
             print(f"Colunas: {list(sample_df.columns)}")
             print(f"Período: {sample_df['Date'].min()} a {sample_df['Date'].max()}")
             print(sample_df.head())
             
-        return self.price_data
+        return self.price_store
+    
+    def _read_csv_files(self, file_paths):
+        if self._parallel() is None:
+            return PriceStore.read_csv_files(file_paths)
+        return self._parallel().read_csv_files(file_paths)
     
     def data_cleaning(self):
         """Etapa 2: Limpeza de dados"""
@@ -86,42 +177,20 @@ class SteamGameAnalysis:
         initial_shape = self.app_info.shape
         
         # Verificar valores ausentes
-        print(f"Valores ausentes por coluna:")
-        print(self.app_info.isnull().sum())
-        
-        # Remover linhas com informações essenciais ausentes
-        self.app_info = self.app_info.dropna(subset=['appid', 'name'])
-        
-        # Preencher valores ausentes em 'type' com 'unknown'
-        self.app_info['type'] = self.app_info['type'].fillna('unknown')
-        
-        # Preencher valores ausentes em 'releasedate' 
-        self.app_info['releasedate'] = self.app_info['releasedate'].fillna('Unknown')
+        if not self.quiet:
+            print(f"Valores ausentes por coluna:")
+            print(self.app_info.isnull().sum())
         
-        # Preencher valores ausentes em 'freetoplay' com 0 (assumindo que é pago)
-        self.app_info['freetoplay'] = self.app_info['freetoplay'].fillna(0)
-        
-        # Remover duplicatas baseadas no appid
-        self.app_info = self.app_info.drop_duplicates(subset=['appid'])
+        self._clean_app_info()
         
         print(f"Dados limpos - shape inicial: {initial_shape}, shape final: {self.app_info.shape}")
         
         # Limpar dados de preços
         print("\nLimpando dados de preços...")
-        cleaned_price_data = {}
-        
-        for app_id, price_df in self.price_data.items():
-            # Remover linhas com valores ausentes
-            cleaned_df = price_df.dropna()
-            
-            # Verificar se há dados suficientes após limpeza
-            if len(cleaned_df) > 10:  # Manter apenas se tiver pelo menos 10 registros
-                cleaned_price_data[app_id] = cleaned_df
-                
-        self.price_data = cleaned_price_data
-        print(f"Mantidos {len(self.price_data)} arquivos de preços após limpeza")
+        self.price_store = self._map_price_store(clean_price_store)
+        print(f"Mantidos {self.price_store.n_apps} arquivos de preços após limpeza")
         
-        return self.app_info, self.price_data
+        return self.app_info, self.price_store
     
     def data_transformation(self):
         """Etapa 3: Transformação de variáveis"""
@@ -130,142 +199,80 @@ class SteamGameAnalysis:
         # Transformar dados das aplicações
         print("Transformando dados das aplicações...")
         
-        # Converter releasedate para datetime
-        def parse_date(date_str):
-            if pd.isna(date_str) or date_str == 'Unknown':
-                return None
-            try:
-                return pd.to_datetime(date_str, format='%d-%b-%y')
-            except:
-                return None
-                
-        self.app_info['release_date_parsed'] = self.app_info['releasedate'].apply(parse_date)
-        
-        # Extrair ano de lançamento
-        self.app_info['release_year'] = self.app_info['release_date_parsed'].dt.year
-        
-        # Codificar variáveis categóricas
-        le_type = LabelEncoder()
-        self.app_info['type_encoded'] = le_type.fit_transform(self.app_info['type'].astype(str))
+        self._transform_app_info()
         
         # Transformar dados de preços
         print("Transformando dados de preços...")
-        transformed_price_data = {}
-        
-        for app_id, price_df in self.price_data.items():
-            df_copy = price_df.copy()
-            
-            # Converter Date para datetime
-            df_copy['Date'] = pd.to_datetime(df_copy['Date'])
-            
-            # Extrair características temporais
-            df_copy['year'] = df_copy['Date'].dt.year
-            df_copy['month'] = df_copy['Date'].dt.month
-            df_copy['day_of_week'] = df_copy['Date'].dt.dayofweek
-            df_copy['quarter'] = df_copy['Date'].dt.quarter
-            
-            # Calcular economia absoluta
-            df_copy['savings_amount'] = df_copy['Initialprice'] - df_copy['Finalprice']
-            
-            # Indicador de desconto binário
-            df_copy['has_discount'] = (df_copy['Discount'] > 0).astype(int)
-            
-            transformed_price_data[app_id] = df_copy
-            
-        self.price_data = transformed_price_data
+        self.price_store = self._map_price_store(transform_price_store)
         print("Transformações aplicadas com sucesso!")
         
-        return self.app_info, self.price_data
+        return self.app_info, self.price_store
+    
+    def _clean_app_info(self):
+        """Limpeza de app_info compartilhada pelos modos completo e incremental"""
+        # Remover linhas com informações essenciais ausentes
+        self.app_info = self.app_info.dropna(subset=['appid', 'name'])
+        
+        # Preencher valores ausentes em 'type' com 'unknown'
+        app_type = self.app_info['type']
+        if isinstance(app_type.dtype, pd.CategoricalDtype) and 'unknown' not in app_type.cat.categories:
+            app_type = app_type.cat.add_categories('unknown')
+        self.app_info['type'] = app_type.fillna('unknown')
+        
+        # Preencher valores ausentes em 'releasedate' 
+        self.app_info['releasedate'] = self.app_info['releasedate'].fillna('Unknown')
+        
+        # Preencher valores ausentes em 'freetoplay' com 0 (assumindo que é pago)
+        self.app_info['freetoplay'] = self.app_info['freetoplay'].fillna(0)
+        
+        # Remover duplicatas baseadas no appid
+        self.app_info = self.app_info.drop_duplicates(subset=['appid'])
+    
+    def _transform_app_info(self):
+        """Transformações de app_info compartilhadas pelos modos completo e incremental"""
+        # Converter releasedate para datetime ('Unknown' e datas inválidas viram NaT)
+        self.app_info['release_date_parsed'] = parse_release_dates(self.app_info['releasedate'])
+        
+        # Extrair ano de lançamento
+        self.app_info['release_year'] = self.app_info['release_date_parsed'].dt.year
+        
+        # Codificar variáveis categóricas (códigos na ordem alfabética, como o LabelEncoder)
+        self.app_info['type_encoded'] = np.unique(self.app_info['type'].astype(str), return_inverse=True)[1]
     
     def feature_engineering(self):
         """Etapa 4: Engenharia de recursos"""
         print("\n=== ETAPA 4: ENGENHARIA DE RECURSOS ===")
         
-        features_list = []
+        # Todas as estatísticas em agregações agrupadas por appid
+        self.features_data = self._map_price_store(compute_price_features, app_info=self.app_info)
         
-        for app_id, price_df in self.price_data.items():
-            # Encontrar informações do jogo
-            app_info_row = self.app_info[self.app_info['appid'] == int(app_id)]
-            
-            if len(app_info_row) == 0:
-                continue
-                
-            app_info_row = app_info_row.iloc[0]
-            
-            # Calcular estatísticas de preço
-            price_stats = {
-                'app_id': int(app_id),
-                'game_name': app_info_row['name'],
-                'game_type': app_info_row['type'],
-                'is_free_to_play': app_info_row['freetoplay'],
-                'release_year': app_info_row['release_year'],
-                
-                # Estatísticas de preço
-                'avg_initial_price': price_df['Initialprice'].mean(),
-                'min_initial_price': price_df['Initialprice'].min(),
-                'max_initial_price': price_df['Initialprice'].max(),
-                'price_volatility': price_df['Initialprice'].std(),
-                
-                'avg_final_price': price_df['Finalprice'].mean(),
-                'min_final_price': price_df['Finalprice'].min(),
-                'max_final_price': price_df['Finalprice'].max(),
-                
-                # Estatísticas de desconto
-                'avg_discount': price_df['Discount'].mean(),
-                'max_discount': price_df['Discount'].max(),
-                'discount_frequency': (price_df['Discount'] > 0).mean(),
-                'total_discount_days': (price_df['Discount'] > 0).sum(),
-                
-                # Características temporais
-                'total_observation_days': len(price_df),
-                'price_trend': self._calculate_price_trend(price_df),
-                'seasonal_discount_pattern': self._analyze_seasonal_discounts(price_df),
-                
-                # Indicadores de melhor momento para compra
-                'best_discount_month': price_df.groupby('month')['Discount'].mean().idxmax(),
-                'worst_discount_month': price_df.groupby('month')['Discount'].mean().idxmin(),
-                
-                # Economia potencial
-                'max_savings': price_df['savings_amount'].max(),
-                'avg_savings_when_discounted': price_df[price_df['Discount'] > 0]['savings_amount'].mean() if (price_df['Discount'] > 0).any() else 0
-            }
-            
-            features_list.append(price_stats)
-        
-        self.features_data = pd.DataFrame(features_list)
+        # Promoções gerais: taxa diária de apps em desconto a partir dos trechos
+        # de Discount constante de cada app, em vez de comparar apps um a um
+        runs = self._map_price_store(store_discount_runs)
+        self.storewide_sales = detect_storewide_sales(runs)
+        self.features_data = self.features_data.join(storewide_sale_features(runs, self.storewide_sales),
+                                                     on='app_id')
         
         # Tratar valores ausentes nas features criadas
         self.features_data = self.features_data.fillna(0)
         
         print(f"Features criadas para {len(self.features_data)} jogos")
         print(f"Total de features: {len(self.features_data.columns)}")
-        print("\nPrimeiras 5 linhas das features:")
-        print(self.features_data.head())
+        print(f"Promoções gerais detectadas: {len(self.storewide_sales)}")
+        if not self.quiet:
+            for sale in self.storewide_sales.itertuples():
+                print(f"  {sale.start:%Y-%m-%d} a {sale.end:%Y-%m-%d}: {sale.days} dias, "
+                      f"até {sale.peak_rate:.0%} dos apps em desconto")
+            print("\nPrimeiras 5 linhas das features:")
+            print(self.features_data.head())
         
         return self.features_data
     
-    def _calculate_price_trend(self, price_df):
-        """Calcular tendência de preço ao longo do tempo"""
-        if len(price_df) < 2:
-            return 0
-        
-        # Correlação simples entre tempo e preço
-        price_df_sorted = price_df.sort_values('Date')
-        time_numeric = range(len(price_df_sorted))
-        correlation = np.corrcoef(time_numeric, price_df_sorted['Initialprice'])[0, 1]
-        
-        return correlation if not np.isnan(correlation) else 0
-    
-    def _analyze_seasonal_discounts(self, price_df):
-        """Analisar padrões sazonais de desconto"""
-        monthly_discounts = price_df.groupby('month')['Discount'].mean()
-        seasonal_variance = monthly_discounts.var()
-        
-        return seasonal_variance if not np.isnan(seasonal_variance) else 0
-    
     def data_splitting(self, test_size=0.2, val_size=0.1):
         """Etapa 5: Divisão de dados"""
         print("\n=== ETAPA 5: DIVISÃO DE DADOS ===")
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import StandardScaler
         
         if self.features_data is None:
             print("Erro: Execute feature_engineering() primeiro")
@@ -323,88 +330,68 @@ class SteamGameAnalysis:
             'scaler': scaler,
             'feature_names': list(X.columns)
         }
+        self.datasets = datasets
         
         return datasets
     
-    def _create_target_variable(self):
-        """Criar variável target para 'melhor momento para compra'"""
+    def _create_target_variable(self, features=None):
+        """Criar variável target para 'melhor momento para compra' (de features_data, se não informado)"""
         # Critérios para definir um "bom momento para compra":
         # 1. Alta frequência de desconto
         # 2. Descontos significativos
         # 3. Preço abaixo da média
         
+        if features is None:
+            features = self.features_data
         conditions = []
         
         # Condição 1: Frequência de desconto acima da mediana
-        discount_freq_median = self.features_data['discount_frequency'].median()
-        conditions.append(self.features_data['discount_frequency'] > discount_freq_median)
+        discount_freq_median = features['discount_frequency'].median()
+        conditions.append(features['discount_frequency'] > discount_freq_median)
         
         # Condição 2: Desconto médio acima da mediana
-        avg_discount_median = self.features_data['avg_discount'].median()
-        conditions.append(self.features_data['avg_discount'] > avg_discount_median)
+        avg_discount_median = features['avg_discount'].median()
+        conditions.append(features['avg_discount'] > avg_discount_median)
         
         # Condição 3: Economia máxima acima da mediana
-        max_savings_median = self.features_data['max_savings'].median()
-        conditions.append(self.features_data['max_savings'] > max_savings_median)
+        max_savings_median = features['max_savings'].median()
+        conditions.append(features['max_savings'] > max_savings_median)
         
         # Um jogo é considerado "bom para comprar" se atender pelo menos 2 condições
         good_buy = sum(conditions) >= 2
         
         return good_buy.astype(int)
     
-    def generate_visualizations(self):
-        """Gerar visualizações dos dados processados"""
+    def generate_visualizations(self, show=False, charts_dir=None):
+        """Gerar o painel resumo e, com ``charts_dir``, um gráfico de preços por jogo.
+        
+        Os gráficos são desenhados sem janela (backend Agg), salvo com
+        ``show=True``. Com vários workers o painel e os gráficos por jogo são
+        divididos entre os processos; gráficos cujos dados não mudaram desde a
+        última execução são mantidos.
+        """
         print("\n=== GERANDO VISUALIZAÇÕES ===")
         
-        fig, axes = plt.subplots(2, 3, figsize=(18, 12))
-        fig.suptitle('Análise Exploratória - Dados de Jogos Steam', fontsize=16)
-        
-        # 1. Distribuição de preços inicial
-        axes[0, 0].hist(self.features_data['avg_initial_price'], bins=50, alpha=0.7)
-        axes[0, 0].set_title('Distribuição de Preços Iniciais')
-        axes[0, 0].set_xlabel('Preço Médio Inicial')
-        axes[0, 0].set_ylabel('Frequência')
-        
-        # 2. Frequência de desconto vs Preço
-        axes[0, 1].scatter(self.features_data['avg_initial_price'], 
-                          self.features_data['discount_frequency'], alpha=0.6)
-        axes[0, 1].set_title('Preço vs Frequência de Desconto')
-        axes[0, 1].set_xlabel('Preço Médio Inicial')
-        axes[0, 1].set_ylabel('Frequência de Desconto')
-        
-        # 3. Distribuição de descontos máximos
-        axes[0, 2].hist(self.features_data['max_discount'], bins=30, alpha=0.7)
-        axes[0, 2].set_title('Distribuição de Descontos Máximos')
-        axes[0, 2].set_xlabel('Desconto Máximo (%)')
-        axes[0, 2].set_ylabel('Frequência')
-        
-        # 4. Análise temporal - Ano de lançamento
-        release_year_counts = self.features_data['release_year'].value_counts().sort_index()
-        axes[1, 0].plot(release_year_counts.index, release_year_counts.values)
-        axes[1, 0].set_title('Jogos por Ano de Lançamento')
-        axes[1, 0].set_xlabel('Ano de Lançamento')
-        axes[1, 0].set_ylabel('Número de Jogos')
-        
-        # 5. Correlação entre características
-        corr_features = ['avg_initial_price', 'discount_frequency', 'max_discount', 'price_volatility']
-        corr_matrix = self.features_data[corr_features].corr()
-        im = axes[1, 1].imshow(corr_matrix, cmap='coolwarm', aspect='auto')
-        axes[1, 1].set_title('Matriz de Correlação')
-        axes[1, 1].set_xticks(range(len(corr_features)))
-        axes[1, 1].set_yticks(range(len(corr_features)))
-        axes[1, 1].set_xticklabels(corr_features, rotation=45)
-        axes[1, 1].set_yticklabels(corr_features)
-        plt.colorbar(im, ax=axes[1, 1])
-        
-        # 6. Target variable distribution
-        target_counts = self.features_data['good_buy_time'].value_counts()
-        axes[1, 2].bar(['Momento Ruim', 'Bom Momento'], target_counts.values)
-        axes[1, 2].set_title('Distribuição da Variável Target')
-        axes[1, 2].set_ylabel('Número de Jogos')
-        
-        plt.tight_layout()
-        plt.savefig('steam_games_analysis.png', dpi=300, bbox_inches='tight')
-        plt.show()
+        executor = None if show else self._parallel()
+        if executor is None:
+            render_summary_chart(self.features_data, SUMMARY_FILENAME, show=show)
+            summary = None
+        else:
+            summary = executor.submit(render_summary_chart, self.features_data, SUMMARY_FILENAME)
+        
+        if charts_dir is not None:
+            names = self.app_info.drop_duplicates(subset=['appid']).set_index('appid')['name']
+            names = names[names.index.isin(self.price_store.appids)].to_dict()
+            charts = self._map_price_store(
+                partial(render_store_charts, output_dir=charts_dir),
+                fingerprints=load_manifest(charts_dir), names=names,
+            )
+            save_manifest(charts_dir, dict(zip(charts['appid'].tolist(), charts['fingerprint'])))
+            rendered = int(charts['rendered'].sum())
+            print(f"Gráficos de preço em {charts_dir}/: {rendered} gerados, {len(charts) - rendered} inalterados")
+        
+        if summary is not None:
+            summary.result()
         
     def save_processed_data(self):
         """Salvar dados processados"""
@@ -414,7 +401,17 @@ class SteamGameAnalysis:
         self.app_info.to_csv('processed_application_info.csv', index=False)
         
         # Salvar features engineered
-        self.features_data.to_csv('engineered_features.csv', index=False)
+        self.save_features()
+        
+        # Índice compacto para consultas "é um bom momento para comprar?"
+        save_buy_index(build_buy_index(self.price_store, self.features_data), INDEX_FILENAME)
+        
+        # Vizinhos mais próximos pelo perfil de desconto ("jogos que entram em promoção como este")
+        self._update_similarity_index()
+        
+        # Matriz (dia x app) mapeada em memória, lida por ``cli.py sales``, e as promoções gerais
+        build_price_matrix(self.price_store, SALE_MATRIX_DIRNAME)
+        self.storewide_sales.to_csv(os.path.join(SALE_MATRIX_DIRNAME, 'storewide_sales.csv'), index=False)
         
         # Salvar resumo do processamento
         summary = {
@@ -432,58 +429,207 @@ class SteamGameAnalysis:
         print(f"Arquivos criados:")
         print(f"  - processed_application_info.csv")
         print(f"  - engineered_features.csv")
+        print(f"  - {INDEX_FILENAME}")
+        print(f"  - {SALE_MATRIX_DIRNAME}/")
+        print(f"  - {SIMILARITY_DIRNAME}/")
         print(f"  - processing_summary.txt")
-        print(f"  - steam_games_analysis.png")
+        print(f"  - {METRICS_FILENAME}")
+        print(f"  - {SUMMARY_FILENAME}")
     
-    def run_complete_analysis(self):
-        """Executar análise completa"""
-        print("INICIANDO ANÁLISE COMPLETA DE DADOS STEAM")
-        print("=" * 50)
+    def _update_similarity_index(self):
+        """Levar os perfis de features_data ao índice de similaridade salvo, sem reconstruí-lo se possível"""
+        stats = update_similarity_index(self.features_data, SIMILARITY_DIRNAME)
+        if stats['rebuilt']:
+            print(f"Índice de similaridade reconstruído com {stats['apps']} jogos")
+        else:
+            print(f"Índice de similaridade: {stats['added']} jogos novos, {stats['updated']} atualizados "
+                  f"({stats['apps']} no total)")
+        
+    def save_features(self, path='engineered_features.csv', features=None):
+        """Gravar as features (padrão: features_data) com o target good_buy_time.
+        
+        Todos os modos (lote, streaming e incremental) gravam o mesmo
+        conjunto de colunas; o target é calculado aqui se ainda não existir.
+        """
+        features = self.features_data if features is None else features
+        if 'good_buy_time' not in features.columns:
+            features = features.assign(good_buy_time=self._create_target_variable(features))
+        features.to_csv(path, index=False)
+        return features
+    
+    def iter_feature_chunks(self, max_memory_mb=256, chunk_size=None, runs=None):
+        """Modo streaming: limpar, transformar e extrair features de um bloco de apps por vez.
+        
+        Cada bloco é lido, processado, devolvido e liberado antes do próximo,
+        de modo que a memória fica limitada a ``max_memory_mb`` (estimada pelo
+        tamanho dos CSVs) em vez de crescer com o catálogo inteiro. Os blocos
+        seguem a ordem dos appids, como no modo em lote. As promoções gerais
+        dependem de todos os apps e não entram nos blocos: com ``runs`` (uma
+        lista), os trechos de Discount de cada bloco são acrescentados a ela
+        para storewide_sale_features depois do último bloco; eles ocupam
+        memória além do limite, mas resumem cada app em poucas linhas.
+        """
+        if self.app_info is None:
+            self.app_info = self._read_app_info()
+        if 'release_year' not in self.app_info.columns:
+            self._clean_app_info()
+            self._transform_app_info()
+        
+        price_files = sorted(glob.glob(os.path.join(self.data_path, 'PriceHistory', '*.csv')),
+                             key=lambda path: int(os.path.basename(path).replace('.csv', '')))
+        for chunk_files in plan_file_chunks(price_files, max_memory_mb, chunk_size):
+            store = PriceStore.read_csv_files(chunk_files)
+            store = transform_price_store(clean_price_store(store))
+            features = compute_price_features(store, self.app_info).fillna(0)
+            if runs is not None:
+                runs.append(store_discount_runs(store))
+            del store
+            yield features
+    
+    def run_streaming_analysis(self, max_memory_mb=256, chunk_size=None):
+        """Gerar engineered_features.csv bloco a bloco, com memória limitada.
+        
+        A 1ª passada grava as features de cada bloco em um arquivo temporário;
+        a 2ª o relê em blocos acrescentando as colunas de promoções gerais e o
+        target good_buy_time, que só são conhecidos depois do último bloco.
+        """
+        print(f"=== MODO STREAMING (limite de {max_memory_mb} MB) ===")
+        
+        total_games = 0
+        runs, target_parts = [], []
+        tmp_path = 'engineered_features.csv.tmp'
+        with open(tmp_path, 'w', newline='') as f:
+            for i, features in enumerate(self.iter_feature_chunks(max_memory_mb, chunk_size, runs=runs)):
+                features.to_csv(f, index=False, header=(i == 0))
+                target_parts.append(features[TARGET_COLUMNS])
+                total_games += len(features)
+                print(f"Bloco {i + 1}: features de {len(features)} jogos")
+        
+        if total_games:
+            runs = pd.concat(runs, ignore_index=True)
+            self.storewide_sales = detect_storewide_sales(runs)
+            sale_features = storewide_sale_features(runs, self.storewide_sales)
+            # O target usa medianas de todos os jogos (ver _create_target_variable)
+            target = self._create_target_variable(pd.concat(target_parts, ignore_index=True)).to_numpy()
+            del runs, target_parts
+            with open('engineered_features.csv', 'w', newline='') as f:
+                chunks = pd.read_csv(tmp_path, chunksize=CHUNK_ROWS, float_precision='round_trip')
+                row = 0
+                for i, features in enumerate(chunks):
+                    features = features.join(sale_features, on='app_id').fillna(0)
+                    features['good_buy_time'] = target[row:row + len(features)]
+                    features.to_csv(f, index=False, header=(i == 0))
+                    row += len(features)
+            os.remove(tmp_path)
+            print(f"Promoções gerais detectadas: {len(self.storewide_sales)}")
+        else:
+            os.replace(tmp_path, 'engineered_features.csv')
+        
+        print(f"Features criadas para {total_games} jogos")
+        return total_games
+    
+    def run_out_of_core_split(self, features_path='engineered_features.csv', output_dir=SPLIT_DIRNAME,
+                              test_size=0.2, val_size=0.1, chunk_rows=CHUNK_ROWS):
+        """Divisão determinística e fora da memória a partir de um CSV de features.
+        
+        Cada jogo vai para treino, validação ou teste por um hash estável do
+        app_id, estratificado pelo target, o scaler é ajustado incrementalmente e os arrays normalizados
+        são gravados em float32 em ``output_dir`` (ver dataset_split).
+        """
+        print(f"=== DIVISÃO FORA DA MEMÓRIA ({features_path} -> {output_dir}/) ===")
         
-        # Etapa 1: Exploração
-        self.load_application_data()
-        self.load_price_history_sample(sample_size=100)  # Aumentar amostra
+        self.datasets = write_hash_split(iter_csv_chunks(features_path, chunk_rows), self._create_target_variable,
+                                         output_dir, test_size, val_size)
         
-        # Etapa 2: Limpeza
-        self.data_cleaning()
+        total = sum(len(self.datasets[f'y_{name}']) for name in SPLIT_NAMES)
+        print(f"Divisão dos dados:")
+        for label, name in zip(['Treino', 'Validação', 'Teste'], SPLIT_NAMES):
+            y = self.datasets[f'y_{name}']
+            print(f"  {label}: {len(y)} amostras ({len(y)/total:.1%}), {y.mean():.1%} bons momentos")
+        
+        return self.datasets
+    
+    def build_window_dataset(self, output_dir=WINDOW_DIRNAME, lookback=LOOKBACK, horizon=HORIZON):
+        """Amostras diárias com janela de preços e rótulo "preço menor nos próximos dias" (ver window_dataset)"""
+        print(f"\n=== GERANDO JANELAS DIÁRIAS ({lookback} dias de histórico, {horizon} à frente) ===")
         
-        # Etapa 3: Transformação
-        self.data_transformation()
+        dataset = build_window_dataset(self.price_store, output_dir, lookback, horizon)
+        
+        print(f"Amostras: {dataset['samples']} de {self.price_store.n_apps} apps em {output_dir}/")
+        print(f"  Preço menor nos próximos {horizon} dias: {dataset['y'].mean():.1%}")
+        
+        return dataset
+    
+    def run_incremental_update(self):
+        """Atualizar engineered_features.csv lendo apenas os dias novos de PriceHistory/"""
+        print("=== ATUALIZAÇÃO INCREMENTAL DE FEATURES ===")
         
-        # Etapa 4: Engenharia de Features
-        self.feature_engineering()
+        self.app_info = self._read_app_info()
+        self._clean_app_info()
+        self._transform_app_info()
         
-        # Etapa 5: Divisão dos dados
-        datasets = self.data_splitting()
+        # Agregados combináveis + manifesto da última data processada por appid
+        state_path = default_state_path(self.data_path)
+        state = IncrementalFeatureState.load(state_path)
+        update_stats = state.update(os.path.join(self.data_path, 'PriceHistory'))
+        state.save(state_path)
         
-        # Visualizações
-        self.generate_visualizations()
+        print(f"Linhas novas: {update_stats['new_rows']} em {update_stats['updated_apps']} apps "
+              f"({update_stats['reset_apps']} reprocessados do início)")
         
-        # Salvar resultados
-        self.save_processed_data()
+        self.features_data = self.save_features(features=state.features(self.app_info).fillna(0))
+        
+        print(f"Features atualizadas para {len(self.features_data)} jogos")
+        self._update_similarity_index()
+        
+        return self.features_data
+    
+    def run_complete_analysis(self, sample_size=None, test_size=0.2, val_size=0.1,
+                              checkpoint_dir=CHECKPOINT_DIRNAME):
+        """Executar análise completa, gravando as métricas das etapas em stage_metrics.jsonl.
+        
+        Com ``checkpoint_dir`` (padrão), etapas cujas entradas, parâmetros e
+        código não mudaram desde a última execução são puladas, e uma
+        execução interrompida retoma da última etapa concluída; use
+        ``checkpoint_dir=None`` para executar tudo do zero.
+        """
+        print("INICIANDO ANÁLISE COMPLETA DE DADOS STEAM")
+        print("=" * 50)
+        
+        params = {'sample_size': sample_size, 'test_size': test_size, 'val_size': val_size}
+        recorder = StageMetricsRecorder()
+        self.hooks.append(recorder)
+        try:
+            datasets = self.run_pipeline(checkpoint_dir=checkpoint_dir, **params)
+        finally:
+            self.hooks.remove(recorder)
+            self.close()
+            # Ao lado de processing_summary.txt, inclusive se uma etapa falhar
+            recorder.write(METRICS_FILENAME)
         
         print("\n" + "=" * 50)
         print("ANÁLISE COMPLETA FINALIZADA COM SUCESSO!")
         print("=" * 50)
         
         return datasets
+    
+    def run_pipeline(self, until=None, checkpoint_dir=CHECKPOINT_DIRNAME, **params):
+        """Executar as etapas em ordem até ``until`` (inclusive; padrão: todas).
+        
+        Etapas: exploração, limpeza, transformação, features, divisão,
+        visualizações e gravação dos resultados. ``params`` são repassados às
+        etapas que os aceitam (sample_size, test_size, val_size). Retorna os
+        datasets da divisão, se ela foi executada.
+        """
+        if checkpoint_dir is not None:
+            return StageCheckpoints(checkpoint_dir).run(self, until=until, **params)
+        for stage in pipeline_until(until):
+            self.run_stage(stage.name, **{name: params[name] for name in stage.params if name in params})
+        return self.datasets
 
-# Executar análise
+# Executar análise completa: ``python steam_data_processing.py [opções]`` é o
+# mesmo que ``python cli.py run [opções]``
 if __name__ == "__main__":
-    # Definir caminho dos dados
-    data_path = r"C:\Users\Gustavo\Documents\Projetos\Pryzor\Análise de dados"
-    
-    # Criar instância da análise
-    analyzer = SteamGameAnalysis(data_path)
-    
-    # Executar análise completa
-    datasets = analyzer.run_complete_analysis()
-    
-    # Exibir informações finais
-    if datasets:
-        print(f"\nDatasets criados:")
-        print(f"  Treino: {datasets['X_train'].shape}")
-        print(f"  Validação: {datasets['X_val'].shape}")
-        print(f"  Teste: {datasets['X_test'].shape}")
-        print(f"\nFeatures disponíveis: {len(datasets['feature_names'])}")
-        print("Dados prontos para modelagem!")
\ No newline at end of file
+    import sys
+    from cli import main
+    main(['run'] + sys.argv[1:])
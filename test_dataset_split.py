@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from dataset_split import TARGET_COLUMNS, assign_splits, write_hash_split
+
+
+def test_assign_splits_keeps_label_rate_in_every_split():
+    rng = np.random.default_rng(0)
+    app_ids = rng.choice(10**6, 5000, replace=False)
+    labels = (rng.random(len(app_ids)) < 0.3).astype(np.int8)
+    splits = assign_splits(app_ids, labels, test_size=0.2, val_size=0.1)
+    np.testing.assert_allclose(np.bincount(splits) / len(splits), [0.7, 0.1, 0.2], atol=1e-3)
+    for code in range(3):
+        assert abs(labels[splits == code].mean() - labels.mean()) < 2e-3
+
+    # Um app novo desloca no máximo um app da sua classe por fronteira
+    grown = assign_splits(np.append(app_ids, 10**6 + 1), np.append(labels, 1))[:len(app_ids)]
+    assert (grown != splits).sum() <= 2
+
+
+def test_write_hash_split_does_not_depend_on_chunking(tmp_path):
+    rng = np.random.default_rng(1)
+    features = pd.DataFrame({'app_id': np.arange(1, 301) * 10, 'price': rng.random(300) * 60})
+    for column in TARGET_COLUMNS:
+        features[column] = rng.random(300)
+    target_fn = lambda data: data['discount_frequency'] > 0.5
+
+    whole = write_hash_split(lambda: iter([features]), target_fn, str(tmp_path / 'whole'))
+    chunked = write_hash_split(lambda: (features[i:i + 70] for i in range(0, 300, 70)), target_fn,
+                               str(tmp_path / 'chunked'))
+    for name in ('train', 'val', 'test'):
+        np.testing.assert_array_equal(whole[f'app_id_{name}'], chunked[f'app_id_{name}'])
+        np.testing.assert_array_equal(whole[f'y_{name}'], chunked[f'y_{name}'])
+        np.testing.assert_allclose(whole[f'X_{name}'], chunked[f'X_{name}'], rtol=1e-6)
+        assert abs(np.mean(whole[f'y_{name}']) - np.mean(whole['y_train'])) < 0.02
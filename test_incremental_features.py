@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from incremental_features import IncrementalFeatureState
+from price_features import compute_price_features
+from price_store import PriceStore, clean_price_store, transform_price_store
+from sale_matrix import STOREWIDE_SALE_COLUMNS, detect_storewide_sales, store_discount_runs, storewide_sale_features
+
+APP_INFO = pd.DataFrame({
+    'appid': [1, 2, 3], 'type': ['game'] * 3, 'name': ['Um', 'Dois', 'Três'],
+    'freetoplay': [0, 0, 1], 'release_year': [2017, 2018, 2019],
+})
+
+
+def price_rows(app_id, days):
+    """Linhas diárias de um app, com uma promoção geral nos dias 30 a 34"""
+    rng = np.random.default_rng(app_id)
+    rows = []
+    for day, date in enumerate(pd.date_range('2019-04-07', periods=days)):
+        initial = 19.99 if day < 40 else 24.99
+        discount = 75 if 30 <= day < 35 else int(rng.random() < 0.1) * 20
+        rows.append(f'{date:%Y-%m-%d},{initial},{round(initial * (100 - discount) / 100, 2)},{discount}\n')
+    return rows
+
+
+HISTORIES = {1: price_rows(1, 60), 2: price_rows(2, 45), 3: price_rows(3, 12)}
+
+
+def write_prefix(price_dir, rows_per_app):
+    for app_id, rows in HISTORIES.items():
+        with open(price_dir / f'{app_id}.csv', 'w') as f:
+            f.write('Date,Initialprice,Finalprice,Discount\n')
+            f.writelines(rows[:rows_per_app])
+
+
+def full_rebuild(price_dir):
+    paths = sorted(str(path) for path in price_dir.glob('*.csv'))
+    store = transform_price_store(clean_price_store(PriceStore.read_csv_files(paths)))
+    runs = store_discount_runs(store)
+    features = compute_price_features(store, APP_INFO)
+    return features.join(storewide_sale_features(runs, detect_storewide_sales(runs)), on='app_id').fillna(0)
+
+
+def assert_same_features(incremental, full):
+    assert list(incremental.columns) == list(full.columns)
+    assert incremental['app_id'].tolist() == full['app_id'].tolist()
+    for column in full.columns:
+        if pd.api.types.is_numeric_dtype(full[column]):
+            np.testing.assert_allclose(incremental[column].to_numpy(dtype=float),
+                                       full[column].to_numpy(dtype=float), rtol=1e-9, atol=1e-9, err_msg=column)
+        else:
+            assert incremental[column].astype(str).tolist() == full[column].astype(str).tolist(), column
+
+
+def test_incremental_updates_match_full_rebuild(tmp_path):
+    price_dir = tmp_path / 'PriceHistory'
+    price_dir.mkdir()
+    state_path = str(tmp_path / 'state.npz')
+    for rows_per_app in (25, 32, 60):
+        # Os lotes cortam episódios de desconto e a promoção geral ao meio
+        write_prefix(price_dir, rows_per_app)
+        state = IncrementalFeatureState.load(state_path)
+        state.update(str(price_dir))
+        state.save(state_path)
+        incremental = state.features(APP_INFO).fillna(0)
+        assert_same_features(incremental, full_rebuild(price_dir))
+    assert incremental[STOREWIDE_SALE_COLUMNS].to_numpy().any()
+
+
+def test_rewritten_and_removed_files_are_reprocessed(tmp_path):
+    price_dir = tmp_path / 'PriceHistory'
+    price_dir.mkdir()
+    write_prefix(price_dir, 40)
+    state = IncrementalFeatureState()
+    state.update(str(price_dir))
+
+    rewritten = [row.replace(',0\n', ',5\n') for row in HISTORIES[1][:40]]
+    (price_dir / '1.csv').write_text('Date,Initialprice,Finalprice,Discount\n' + ''.join(rewritten))
+    (price_dir / '2.csv').unlink()
+    stats = state.update(str(price_dir))
+    assert stats['reset_apps'] == 1 and stats['removed_apps'] == 1
+    assert_same_features(state.features(APP_INFO).fillna(0), full_rebuild(price_dir))
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from price_features import FEATURE_COLUMNS, compute_price_features
+from price_store import PriceStore, clean_price_store, transform_price_store
+
+APP_INFO = pd.DataFrame({
+    'appid': [1, 2], 'type': ['game', 'game'], 'name': ['Curto', 'Longo'],
+    'freetoplay': [0, 0], 'release_year': [2018, 2019],
+})
+
+
+def write_history(path, days, discount_every=5):
+    rows = ['Date,Initialprice,Finalprice,Discount']
+    for day, date in enumerate(pd.date_range('2019-04-07', periods=days)):
+        discount = 50 if day % discount_every == 0 else 0
+        rows.append(f'{date:%Y-%m-%d},10.0,{10.0 * (100 - discount) / 100},{discount}')
+    path.write_text('\n'.join(rows) + '\n')
+    return str(path)
+
+
+def features_for(paths):
+    store = transform_price_store(clean_price_store(PriceStore.read_csv_files(paths)))
+    return compute_price_features(store, APP_INFO)
+
+
+def test_block_empty_after_cleaning(tmp_path):
+    # Um bloco cujo único arquivo tem no máximo 10 linhas fica sem apps após a limpeza
+    features = features_for([write_history(tmp_path / '1.csv', 10)])
+    assert features.empty
+    assert list(features.columns) == FEATURE_COLUMNS
+
+
+def test_empty_block_matches_columns_of_full_block(tmp_path):
+    short = write_history(tmp_path / '1.csv', 10)
+    long = write_history(tmp_path / '2.csv', 60)
+    features = features_for([short, long])
+    assert features['app_id'].tolist() == [2]
+    assert features['discount_episode_count'].iloc[0] == 12
+    assert list(features.columns) == list(features_for([short]).columns)
@@ -0,0 +1,196 @@
+import asyncio
+import time
+
+from price_updater import PRICE_HEADER, FileSource, HttpSource, PriceUpdater, SourceError, new_price_lines
+
+HISTORY = PRICE_HEADER + b''.join(
+    f'2019-04-{day:02d},9.99,{4.99 if day % 7 == 0 else 9.99},{50 if day % 7 == 0 else 0}\n'.encode()
+    for day in range(1, 29)
+)
+
+
+class FlakySource:
+    """Fonte que falha ``failures`` vezes por app antes de delegar a outra"""
+
+    def __init__(self, source, failures, retryable=True):
+        self.source = source
+        self.failures = failures
+        self.retryable = retryable
+        self.calls = {}
+
+    async def fetch(self, app_id, since=None):
+        self.calls[app_id] = self.calls.get(app_id, 0) + 1
+        if self.calls[app_id] <= self.failures:
+            raise SourceError(f'{app_id}: HTTP 503', retryable=self.retryable)
+        return await self.source.fetch(app_id, since)
+
+    async def close(self):
+        await self.source.close()
+
+
+class PriceServer:
+    """Servidor HTTP/1.1 local que responde ``/prices/<appid>.csv`` em chunked encoding.
+
+    Com ``close_after_response`` fecha a conexão depois de cada resposta sem
+    avisar (sem ``Connection: close``); ``throttled`` é o número de 429 que
+    cada caminho recebe antes do 200.
+    """
+
+    def __init__(self, bodies, close_after_response=False, throttled=0):
+        self.bodies = bodies
+        self.close_after_response = close_after_response
+        self.throttled = throttled
+        self.connections = 0
+        self.requests = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        return f'http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/prices'
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        while request_line := await reader.readline():
+            while await reader.readline() not in (b'\r\n', b''):
+                pass
+            path = request_line.split()[1].decode()
+            self.requests.append(path)
+            writer.write(self.response(path))
+            await writer.drain()
+            if self.close_after_response:
+                break
+        writer.close()
+
+    def response(self, path):
+        if self.requests.count(path) <= self.throttled:
+            return b'HTTP/1.1 429 Too Many Requests\r\nRetry-After: 1\r\nContent-Length: 0\r\n\r\n'
+        body = self.bodies.get(int(path.rsplit('/', 1)[1].split('.')[0]))
+        if body is None:
+            return b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n'
+        pieces = [body[i:i + 100] for i in range(0, len(body), 100)] + [b'']
+        return b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n' + b''.join(
+            f'{len(piece):x}\r\n'.encode() + piece + b'\r\n' for piece in pieces)
+
+
+def fetch_all(server, app_ids):
+    async def main():
+        source = HttpSource(await server.start(), pool_size=1)
+        try:
+            return [await source.fetch(app_id) for app_id in app_ids]
+        finally:
+            await source.close()
+            await server.stop()
+    return asyncio.run(main())
+
+
+def make_dirs(tmp_path, local_rows):
+    """Fonte com o histórico completo do app 10 e cópia local só com as primeiras linhas"""
+    source_dir, price_dir = tmp_path / 'source', tmp_path / 'PriceHistory'
+    source_dir.mkdir()
+    price_dir.mkdir()
+    (source_dir / '10.csv').write_bytes(HISTORY)
+    (price_dir / '10.csv').write_bytes(b''.join(HISTORY.splitlines(True)[:local_rows + 1]))
+    return source_dir, price_dir
+
+
+def test_file_source_round_trip(tmp_path):
+    source_dir, price_dir = make_dirs(tmp_path, 10)
+    stats = PriceUpdater(FileSource(str(source_dir)), str(price_dir)).run()
+    assert stats['updated_apps'] == 1 and stats['new_rows'] == 18
+    assert (price_dir / '10.csv').read_bytes() == HISTORY
+
+    # Nada novo: os arquivos ficam como estão
+    stats = PriceUpdater(FileSource(str(source_dir)), str(price_dir)).run()
+    assert stats['new_rows'] == 0
+    assert (price_dir / '10.csv').read_bytes() == HISTORY
+
+
+def test_partial_last_line_is_replaced(tmp_path):
+    source_dir, price_dir = make_dirs(tmp_path, 10)
+    with open(price_dir / '10.csv', 'ab') as f:
+        f.write(b'2019-04-11,9.9')
+    PriceUpdater(FileSource(str(source_dir)), str(price_dir)).run()
+    assert (price_dir / '10.csv').read_bytes() == HISTORY
+
+
+def test_new_and_missing_apps(tmp_path):
+    source_dir, price_dir = make_dirs(tmp_path, 10)
+    (price_dir / '10.csv').unlink()
+    stats = PriceUpdater(FileSource(str(source_dir)), str(price_dir)).run([10, 20])
+    assert stats['missing'] == [20]
+    assert (price_dir / '10.csv').read_bytes() == HISTORY
+    assert not (price_dir / '20.csv').exists()
+
+
+def test_retryable_errors_are_retried(tmp_path):
+    source_dir, price_dir = make_dirs(tmp_path, 10)
+    source = FlakySource(FileSource(str(source_dir)), failures=2)
+    stats = PriceUpdater(source, str(price_dir), retries=2, backoff=0).run()
+    assert source.calls[10] == 3
+    assert stats['failed'] == {}
+    assert (price_dir / '10.csv').read_bytes() == HISTORY
+
+
+def test_errors_after_last_retry_are_reported(tmp_path):
+    source_dir, price_dir = make_dirs(tmp_path, 10)
+    local = (price_dir / '10.csv').read_bytes()
+    source = FlakySource(FileSource(str(source_dir)), failures=5)
+    stats = PriceUpdater(source, str(price_dir), retries=2, backoff=0).run()
+    assert source.calls[10] == 3
+    assert stats['failed'] == {10: '10: HTTP 503'}
+    assert (price_dir / '10.csv').read_bytes() == local
+
+
+def test_non_retryable_errors_fail_at_once(tmp_path):
+    source_dir, price_dir = make_dirs(tmp_path, 10)
+    source = FlakySource(FileSource(str(source_dir)), failures=1, retryable=False)
+    stats = PriceUpdater(source, str(price_dir), retries=3, backoff=0).run()
+    assert source.calls[10] == 1
+    assert list(stats['failed']) == [10]
+
+
+def test_repeated_appids_are_fetched_once(tmp_path):
+    source_dir, price_dir = make_dirs(tmp_path, 10)
+    stats = PriceUpdater(FileSource(str(source_dir)), str(price_dir)).run([10, 10])
+    assert stats['apps'] == 1 and stats['new_rows'] == 18
+    assert (price_dir / '10.csv').read_bytes() == HISTORY
+
+
+def test_http_chunked_bodies_on_one_keep_alive_connection():
+    server = PriceServer({10: HISTORY, 20: HISTORY[:300]})
+    assert fetch_all(server, [10, 20, 30]) == [HISTORY, HISTORY[:300], None]
+    assert server.connections == 1
+
+
+def test_http_reopens_connection_closed_by_server():
+    server = PriceServer({10: HISTORY}, close_after_response=True)
+    assert fetch_all(server, [10, 10, 10]) == [HISTORY] * 3
+    assert server.connections == 3
+
+
+def test_http_429_is_retried_after_retry_after(tmp_path):
+    _, price_dir = make_dirs(tmp_path, 10)
+    server = PriceServer({10: HISTORY}, throttled=1)
+
+    async def main():
+        updater = PriceUpdater(HttpSource(await server.start()), str(price_dir), retries=2, backoff=0)
+        try:
+            return await updater.update()
+        finally:
+            await server.stop()
+
+    started = time.monotonic()
+    stats = asyncio.run(main())
+    assert time.monotonic() - started >= 1
+    assert server.requests == ['/prices/10.csv?since=2019-04-10'] * 2
+    assert stats['failed'] == {} and stats['new_rows'] == 18
+    assert (price_dir / '10.csv').read_bytes() == HISTORY
+
+
+def test_new_price_lines_skips_known_and_malformed_rows():
+    body = PRICE_HEADER + b'2019-04-01,1,1,0\r\n\n2019-04-02,1,0.5,50\n2019-04-03,1\n'
+    assert new_price_lines(body) == [b'2019-04-01,1,1,0\n', b'2019-04-02,1,0.5,50\n']
+    assert new_price_lines(body, '2019-04-01') == [b'2019-04-02,1,0.5,50\n']
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from price_store import PriceStore
+from sale_matrix import (
+    build_price_matrix, detect_storewide_sales, load_price_matrix, store_discount_runs, storewide_sale_features,
+)
+
+DATES = pd.date_range('2019-04-07', periods=40)
+
+
+def sale_store():
+    """Apps 1 a 5 em desconto nos dias 20 a 24 (promoção geral); o app 1 também nos dias 5 e 6; o 6 nunca"""
+    frames = []
+    for app_id in range(1, 7):
+        discount = np.zeros(len(DATES), dtype=int)
+        if app_id <= 5:
+            discount[20:25] = 50 if app_id != 2 else 75
+        if app_id == 1:
+            discount[5:7] = 10
+        frames.append(pd.DataFrame({
+            'appid': app_id, 'Date': DATES, 'Initialprice': 20.0,
+            'Finalprice': 20.0 * (100 - discount) / 100, 'Discount': discount,
+        }))
+    return PriceStore.from_frame(pd.concat(frames, ignore_index=True))
+
+
+def test_storewide_sale_is_detected_and_joined_per_app():
+    runs = store_discount_runs(sale_store())
+    sales = detect_storewide_sales(runs)
+    assert len(sales) == 1
+    sale = sales.iloc[0]
+    assert (sale['start'], sale['end'], sale['days']) == (DATES[20], DATES[24], 5)
+    assert sale['peak_rate'] == 5 / 6
+
+    features = storewide_sale_features(runs, sales)
+    assert features.index.tolist() == [1, 2, 3, 4, 5, 6]
+    np.testing.assert_allclose(features['storewide_sale_participation'], [1, 1, 1, 1, 1, 0])
+    np.testing.assert_allclose(features['storewide_sale_discount_share'], [5 / 7, 1, 1, 1, 1, 0])
+    np.testing.assert_allclose(features['avg_storewide_sale_discount'], [50, 75, 50, 50, 50, 0])
+
+
+def test_saved_matrix_finds_the_same_sales(tmp_path):
+    store = sale_store()
+    build_price_matrix(store, str(tmp_path))
+    matrix = load_price_matrix(str(tmp_path))
+    assert isinstance(matrix.discount, np.memmap)
+
+    sales = matrix.storewide_sales()
+    pd.testing.assert_frame_equal(sales, detect_storewide_sales(store_discount_runs(store)))
+    np.testing.assert_array_equal(matrix.sale_discounts(2, sales), [75])
+    np.testing.assert_array_equal(matrix.sale_discounts(6, sales), [0])
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from similarity_index import PROFILE_COLUMNS, SimilarityIndex, update_similarity_index
+
+
+def profile_features(app_ids, seed=0):
+    """Perfis aleatórios, com os apps 1 e 2 quase iguais"""
+    rng = np.random.default_rng(seed)
+    features = pd.DataFrame(rng.random((len(app_ids), len(PROFILE_COLUMNS))) * 50, columns=PROFILE_COLUMNS)
+    features.insert(0, 'app_id', app_ids)
+    if 1 in app_ids and 2 in app_ids:
+        features.loc[features['app_id'] == 2, PROFILE_COLUMNS] = (
+            features.loc[features['app_id'] == 1, PROFILE_COLUMNS].to_numpy() + 0.01
+        )
+    return features
+
+
+def test_query_finds_the_closest_profile():
+    index = SimilarityIndex.from_features(profile_features(np.arange(1, 101)))
+    neighbours, scores = index.similar_to([1, 2, 999], k=3)
+    assert neighbours[0, 0] == 2 and neighbours[1, 0] == 1
+    assert 1 not in neighbours[0] and scores[0, 0] > 0.99
+    assert (neighbours[2] == -1).all() and np.isnan(scores[2]).all()
+
+
+def test_add_matches_building_at_once():
+    features = profile_features(np.arange(1, 3001))
+    built = SimilarityIndex.from_features(features)
+    grown = SimilarityIndex(built.mean, built.scale, capacity=1)
+    for start in range(0, len(features), 700):
+        part = features[start:start + 700]
+        grown.add(part['app_id'], part[PROFILE_COLUMNS])
+    assert len(grown) == len(built) == 3000
+    np.testing.assert_array_equal(grown.vectors[:3000], built.vectors[:3000])
+    np.testing.assert_array_equal(grown.similar_to([5, 6], k=5)[0], built.similar_to([5, 6], k=5)[0])
+
+
+def test_load_save_round_trip_in_place(tmp_path):
+    directory = str(tmp_path / 'index')
+    features = profile_features(np.arange(1, 201))
+    SimilarityIndex.from_features(features).save(directory)
+
+    # Salvar por cima do índice que acabou de ser aberto
+    index = SimilarityIndex.load(directory)
+    new = profile_features(np.arange(201, 251), seed=1)
+    index.add(new['app_id'], new[PROFILE_COLUMNS])
+    index.save(directory)
+
+    reloaded = SimilarityIndex.load(directory)
+    assert len(reloaded) == 250 and 250 in reloaded
+    np.testing.assert_array_equal(reloaded.vectors[:250], index.vectors[:250])
+    np.testing.assert_array_equal(reloaded.similar_to([1, 240], k=4)[0], index.similar_to([1, 240], k=4)[0])
+    assert sorted(path.name for path in (tmp_path / 'index').iterdir()) == ['appids.npy', 'index.json', 'vectors.npy']
+
+
+def test_update_adds_new_and_changed_apps_without_rebuilding(tmp_path):
+    directory = str(tmp_path / 'index')
+    features = profile_features(np.arange(1, 101))
+    assert update_similarity_index(features, directory)['rebuilt']
+    scale = SimilarityIndex.load(directory).scale
+
+    features = pd.concat([features, profile_features(np.arange(101, 111), seed=2)], ignore_index=True)
+    features.loc[features['app_id'] == 50, 'avg_discount'] += 10
+    stats = update_similarity_index(features, directory)
+    assert stats == {'apps': 110, 'added': 10, 'updated': 1, 'rebuilt': False}
+    index = SimilarityIndex.load(directory)
+    np.testing.assert_array_equal(index.scale, scale)
+    row = features.index[features['app_id'] == 50]
+    np.testing.assert_allclose(index.vectors[49], index.normalize(features.loc[row, PROFILE_COLUMNS])[0])
+
+    # Apps que saíram das features: o índice é reconstruído
+    assert update_similarity_index(features[features['app_id'] != 3], directory)['rebuilt']
+    assert 3 not in SimilarityIndex.load(directory)
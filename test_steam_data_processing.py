@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from steam_data_processing import SteamGameAnalysis
+
+N_APPS = 12
+
+
+@pytest.fixture
+def data_path(tmp_path, monkeypatch):
+    """Catálogo pequeno com uma promoção geral e históricos de tamanhos diferentes"""
+    rng = np.random.default_rng(0)
+    data = tmp_path / 'data'
+    (data / 'PriceHistory').mkdir(parents=True)
+    pd.DataFrame({
+        'appid': np.arange(1, N_APPS + 1) * 10,
+        'type': 'game',
+        'name': [f'Jogo {i}' for i in range(N_APPS)],
+        'releasedate': '9-Jul-13',
+        'freetoplay': 0,
+    }).to_csv(data / 'applicationInformation.csv', index=False)
+    for i in range(N_APPS):
+        dates = pd.date_range('2019-04-07', periods=30 + 5 * i)
+        discount = np.where(rng.random(len(dates)) < 0.1 * (i % 4), 30, 0)
+        discount[20:24] = 60
+        initial = np.full(len(dates), 9.99 + i)
+        pd.DataFrame({
+            'Date': dates.strftime('%Y-%m-%d'), 'Initialprice': initial,
+            'Finalprice': np.round(initial * (100 - discount) / 100, 2), 'Discount': discount,
+        }).to_csv(data / 'PriceHistory' / f'{(i + 1) * 10}.csv', index=False)
+    monkeypatch.chdir(tmp_path)
+    return str(data)
+
+
+def batch_features(data_path):
+    analysis = SteamGameAnalysis(data_path, use_cache=False, quiet=True)
+    analysis.run_pipeline(until='feature_engineering', checkpoint_dir=None)
+    analysis.save_features()
+    return pd.read_csv('engineered_features.csv')
+
+
+def assert_same_csv(actual, expected):
+    assert list(actual.columns) == list(expected.columns)
+    assert actual['app_id'].tolist() == expected['app_id'].tolist()
+    for column in expected.columns:
+        if pd.api.types.is_numeric_dtype(expected[column]):
+            np.testing.assert_allclose(actual[column], expected[column], rtol=1e-9, atol=1e-9, err_msg=column)
+        else:
+            assert actual[column].tolist() == expected[column].tolist(), column
+
+
+def test_every_mode_writes_the_same_features(data_path):
+    batch = batch_features(data_path)
+    assert batch.columns[-1] == 'good_buy_time'
+    assert batch['storewide_sale_participation'].gt(0).any()
+
+    for chunk_size in (None, 5):
+        SteamGameAnalysis(data_path, use_cache=False).run_streaming_analysis(chunk_size=chunk_size)
+        assert_same_csv(pd.read_csv('engineered_features.csv'), batch)
+
+    SteamGameAnalysis(data_path).run_incremental_update()
+    assert_same_csv(pd.read_csv('engineered_features.csv'), batch)
+
+
+
+def test_iter_feature_chunks_yields_each_block_in_appid_order(data_path):
+    runs = []
+    chunks = SteamGameAnalysis(data_path, use_cache=False).iter_feature_chunks(chunk_size=5, runs=runs)
+    first = next(chunks)
+    # Só o primeiro bloco foi processado até aqui
+    assert first['app_id'].tolist() == [10, 20, 30, 40, 50]
+    assert len(runs) == 1
+    rest = list(chunks)
+    assert [chunk['app_id'].tolist() for chunk in rest] == [[60, 70, 80, 90, 100], [110, 120]]
+    assert len(runs) == 3
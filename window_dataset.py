@@ -0,0 +1,99 @@
+import json
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+WINDOW_DIRNAME = 'window_data'
+# Dias de histórico em cada amostra e dias à frente olhados pelo rótulo
+LOOKBACK = 30
+HORIZON = 30
+WINDOW_COLUMNS = ['Finalprice', 'Discount']
+BATCH_SAMPLES = 65536
+
+
+def forward_min(values, window):
+    """``out[i] = values[i:i + window].min()`` para cada início completo, em O(n).
+
+    Algoritmo de van Herk/Gil-Werman: com a série dividida em blocos de
+    ``window`` elementos, toda janela cobre o sufixo de um bloco e o prefixo
+    do seguinte, então basta o mínimo acumulado de cada bloco nos dois
+    sentidos, independente do tamanho da janela.
+    """
+    n = len(values)
+    if n < window:
+        return values[:0].copy()
+    blocks = -(-n // window)
+    padded = np.full(blocks * window, np.inf, dtype=values.dtype)
+    padded[:n] = values
+    padded = padded.reshape(blocks, window)
+    prefix = np.minimum.accumulate(padded, axis=1).ravel()
+    suffix = np.minimum.accumulate(padded[:, ::-1], axis=1)[:, ::-1].ravel()
+    return np.minimum(suffix[:n - window + 1], prefix[window - 1:n])
+
+
+def sample_positions(store, lookback=LOOKBACK, horizon=HORIZON):
+    """Linhas do store que viram amostras: com ``lookback`` dias antes (incluindo o
+    próprio) e ``horizon`` dias depois dentro do mesmo app"""
+    counts = store.counts()
+    app_index = np.repeat(np.arange(store.n_apps), counts)
+    position = np.arange(len(store)) - np.repeat(store.offsets[:-1], counts)
+    remaining = np.repeat(counts, counts) - position - 1
+    return np.flatnonzero((position >= lookback - 1) & (remaining >= horizon)), app_index
+
+
+def build_window_dataset(store, output_dir=WINDOW_DIRNAME, lookback=LOOKBACK, horizon=HORIZON,
+                         batch_samples=BATCH_SAMPLES):
+    """Gerar amostras diárias "comprar hoje ou esperar" para todos os apps do store.
+
+    Cada amostra é a janela dos últimos ``lookback`` dias de WINDOW_COLUMNS
+    e o rótulo diz se o preço final fica menor que o de hoje em algum dos
+    próximos ``horizon`` dias (1 = esperar). As séries são diárias, então
+    dias equivalem a linhas (os raros dias sem coleta não são preenchidos).
+    As janelas são views sobre as colunas contíguas do store, o rótulo vem
+    de um mínimo móvel à frente e tudo é gravado em lotes de
+    ``batch_samples`` em arrays .npy mapeados em memória.
+    """
+    positions, app_index = sample_positions(store, lookback, horizon)
+    final = np.ascontiguousarray(store.columns['Finalprice'])
+    # future_min[i]: menor preço nas linhas i + 1 .. i + horizon (só usado em posições válidas)
+    future_min = forward_min(final[1:], horizon)
+    windows = [sliding_window_view(np.ascontiguousarray(store.columns[name]), lookback)
+               for name in WINDOW_COLUMNS]
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    def create(name, dtype, *shape):
+        return np.lib.format.open_memmap(os.path.join(output_dir, name + '.npy'), mode='w+',
+                                         dtype=dtype, shape=shape)
+
+    n_samples = len(positions)
+    X = create('X', np.float32, n_samples, lookback, len(WINDOW_COLUMNS))
+    y = create('y', np.int8, n_samples)
+    app_ids = create('app_id', store.appids.dtype, n_samples)
+    dates = create('date', store.columns['Date'].dtype, n_samples)
+    for start in range(0, n_samples, batch_samples):
+        batch = slice(start, start + batch_samples)
+        rows = positions[batch]
+        for channel, view in enumerate(windows):
+            X[batch, :, channel] = view[rows - lookback + 1]
+        y[batch] = future_min[rows] < final[rows]
+        app_ids[batch] = store.appids[app_index[rows]]
+        dates[batch] = store.columns['Date'][rows]
+    for values in (X, y, app_ids, dates):
+        values.flush()
+    del X, y, app_ids, dates
+
+    with open(os.path.join(output_dir, 'windows.json'), 'w') as f:
+        json.dump({'lookback': lookback, 'horizon': horizon, 'columns': WINDOW_COLUMNS,
+                   'samples': n_samples}, f, indent=2)
+    return load_window_dataset(output_dir)
+
+
+def load_window_dataset(output_dir=WINDOW_DIRNAME):
+    """Arrays gerados por build_window_dataset, abertos por memory mapping"""
+    with open(os.path.join(output_dir, 'windows.json')) as f:
+        dataset = json.load(f)
+    for name in ('X', 'y', 'app_id', 'date'):
+        dataset[name] = np.load(os.path.join(output_dir, name + '.npy'), mmap_mode='r')
+    return dataset